@@ -7,8 +7,9 @@ logger = get_logger(env.DEBUG_MODE)
 
 def lambda_handler(event, context):
     logger.info("Iniciando aplicación")
-    initialize_lambda(event, context)
+    response = initialize_lambda(event, context)
     logger.info("Aplicación finalizada")
+    return response
 
 
 # Este bloque se ejecutará solo si se está ejecutando el script localmente
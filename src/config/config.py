@@ -16,10 +16,19 @@ class EnvironmentSettings(BaseSettings):
     DB_HOST: str = "localhost"
     DB_PORT: int = 5432
     DB_NAME: str = "test_db"
+    DB_POOL_STRATEGY: str = "single"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE_SECONDS: int = 300
+    DB_POOL_PRE_PING_IDLE_SECONDS: int = 60
+    DB_SCHEMA_VERSION_CHECK: bool = True
     DEBUG_MODE: bool = True
     SQS_URL_PRO_RESPONSE_TO_PROCESS: str = ""
     SQS_URL_EMAILS: str = ""
+    S3_OPTIMISTIC_EXISTENCE_CHECK: bool = False
     PARAMETER_STORE_FILE_CONFIG: str = "/gmf/process-responses/general-config"
+    PARAMETER_CACHE_TTL_SECONDS: int = 300
+    PARAMETER_CACHE_STALE_SECONDS: int = 600
     SPECIAL_START_NAME: str = ""
     SPECIAL_END_NAME: str = ""
     GENERAL_START_NAME: str = ""
@@ -59,6 +68,13 @@ class EnvironmentSettings(BaseSettings):
     CONST_TIPO_ARCHIVO_GENERAL_REINTEGROS: str = ""
     PARAMETER_STORE_TRANSVERSAL: str = ""
     CONST_COD_ERROR_TECHNICAL: str = ""
+    MAX_CONCURRENT_RECORDS: int = 1
+    ZIP_EXTRACTION_MODE: str = "memory"
+    ZIP_STREAM_BUFFER_SIZE: int = 8 * 1024 * 1024
+    ZIP_DISK_THRESHOLD_BYTES: int = 128 * 1024 * 1024
+    ZIP_DOWNLOAD_CONCURRENCY: int = 4
+    ZIP_TMP_DIR: str = "/tmp"
+    ZIP_UPLOAD_CONCURRENCY: int = 4
 
     class Config:
         env_file = ".env"
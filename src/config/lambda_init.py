@@ -1,6 +1,6 @@
 from .config import env
 from src.services.database_service import DataAccessLayer
-from src.core.archivo_controller import process_sqs_message
+from src.core.archivo_controller import process_sqs_message, process_sqs_message_concurrently
 from src.utils.logger_utils import get_logger
 
 if env.APP_ENV == "local":
@@ -10,6 +10,9 @@ if env.APP_ENV == "local":
 def initialize_lambda(event, context):
     """
     Inicializa la Lambda y procesa el mensaje.
+
+    :return: Respuesta de fallos parciales del lote (ReportBatchItemFailures) con los
+             'messageId' de los registros que deben reintentarse.
     """
     # Obtener el logger dentro de la función para asegurar que use el mock
     log = get_logger(env.DEBUG_MODE)
@@ -21,10 +24,20 @@ def initialize_lambda(event, context):
 
         # Inicializar la conexión a la base de datos y procesar el mensaje
         dal = DataAccessLayer()
-        with dal.session_scope() as session:
-            process_sqs_message(event, session)
+        # Lambda elimina de la cola los registros que no se reportan como fallidos
+        if env.MAX_CONCURRENT_RECORDS > 1:
+            failed_message_ids = process_sqs_message_concurrently(event, dal, env.MAX_CONCURRENT_RECORDS)
+        else:
+            with dal.session_scope() as session:
+                failed_message_ids = process_sqs_message(event, session)
 
+        dal.log_pool_metrics()
         log.info("Proceso de Lambda completado")
+        return {
+            "batchItemFailures": [
+                {"itemIdentifier": message_id} for message_id in failed_message_ids
+            ]
+        }
     except Exception as e:
         log.error(f"Error al inicializar la Lambda: {e}")
         raise e
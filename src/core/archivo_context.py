@@ -0,0 +1,66 @@
+from typing import Callable, Optional
+from src.core.validator import ParsedFilename
+from src.repositories.archivo_repository import ArchivoResumen
+
+
+class ArchivoContext:
+    """
+    Contexto de archivos de un mensaje. Guarda la clasificación del nombre del archivo y los
+    resúmenes de CGD_ARCHIVOS consultados durante el procesamiento del mensaje, para que el
+    nombre se evalúe y cada registro se lea de la base de datos una sola vez, aunque lo
+    necesiten varias etapas (validación, estados, descompresión, errores).
+    """
+
+    def __init__(self):
+        self._archivos = {}
+        self._parsed_filename: Optional[ParsedFilename] = None
+
+    def get(self, acg_nombre_archivo: str, loader: Callable[[str], Optional[ArchivoResumen]]) -> Optional[ArchivoResumen]:
+        """
+        Obtiene el registro del archivo; solo la primera vez se consulta con el loader.
+
+        :param acg_nombre_archivo: Nombre del archivo (ACG_NOMBRE_ARCHIVO).
+        :param loader: Función que consulta el registro en la base de datos.
+        :return: ArchivoResumen o None si no existe.
+        """
+        key = str(acg_nombre_archivo)
+        if key not in self._archivos:
+            self._archivos[key] = loader(key)
+        return self._archivos[key]
+
+    def get_parsed_filename(self, filename: str, parser: Callable[[str], ParsedFilename]) -> ParsedFilename:
+        """
+        Obtiene la clasificación del nombre del archivo del mensaje; solo se evalúa una vez.
+
+        :param filename: Nombre del archivo del mensaje.
+        :param parser: Función que clasifica el nombre (ArchivoValidator.parse_filename).
+        :return: ParsedFilename del archivo.
+        """
+        if self._parsed_filename is None or self._parsed_filename.filename != filename:
+            self._parsed_filename = parser(filename)
+        return self._parsed_filename
+
+    def set(self, archivo: ArchivoResumen):
+        """
+        Registra en el contexto un archivo recién insertado o actualizado.
+        """
+        self._archivos[str(archivo.acg_nombre_archivo)] = archivo
+
+    def update(self, acg_nombre_archivo: str, **cambios):
+        """
+        Refleja en el contexto cambios ya guardados en la base de datos. Si el archivo no se ha
+        consultado durante el mensaje no hay nada que actualizar.
+
+        :param acg_nombre_archivo: Nombre del archivo en CGD_ARCHIVOS.
+        :param cambios: Columnas actualizadas y sus nuevos valores.
+        """
+        archivo = self._archivos.get(str(acg_nombre_archivo))
+        if archivo is not None:
+            self.set(archivo._replace(**cambios))
+
+    def clear(self):
+        """
+        Descarta los registros del contexto, al iniciar un mensaje o tras descartar sus cambios.
+        """
+        self._archivos.clear()
+        self._parsed_filename = None
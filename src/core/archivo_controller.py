@@ -1,10 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
 from src.services.archivo_service import ArchivoService
+from src.core.process_event import SQSEventEnvelope
+from src.services.database_service import DataAccessLayer
+from src.utils.logger_utils import get_logger
+from src.config.config import env
 from sqlalchemy.orm import Session
 
+logger = get_logger(env.DEBUG_MODE)
 
-def process_sqs_message(event, db: Session):
+
+def process_sqs_message(event, db: Session) -> list[str]:
     """
     Controlador para procesar mensajes de SQS y llamar al servicio de negocio.
+
+    :return: Lista con los 'messageId' de los registros que fallaron.
     """
     archivo_service = ArchivoService(db)
-    archivo_service.validar_y_procesar_archivo(event)
+    return archivo_service.validar_y_procesar_archivo(event)
+
+
+def process_sqs_message_concurrently(event, dal: DataAccessLayer, max_workers: int) -> list[str]:
+    """
+    Controlador para procesar concurrentemente los registros de un lote de SQS en un pool
+    de hilos acotado. Cada hilo utiliza su propia sesión de base de datos.
+
+    :param event: Evento de SQS con los registros del lote.
+    :param dal: Capa de acceso a datos de la que se obtienen las sesiones de cada hilo.
+    :param max_workers: Número máximo de registros procesados en paralelo.
+    :return: Lista con los 'messageId' de los registros que fallaron.
+    """
+    records = event.get("Records", [])
+    if not records:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(records))) as executor:
+        results = list(executor.map(lambda record: _process_record(record, dal), records))
+
+    return [message_id for message_id, processed in results if not processed]
+
+
+def _process_record(record, dal: DataAccessLayer) -> tuple[str, bool]:
+    """
+    Procesa un único registro del lote con una sesión de base de datos propia.
+
+    :return: Tupla con el 'messageId' del registro y si se procesó correctamente.
+    """
+    envelope = SQSEventEnvelope(record)
+    message_id = envelope.message_id
+    try:
+        with dal.new_session_scope() as session:
+            archivo_service = ArchivoService(session)
+            return message_id, archivo_service.procesar_mensaje(envelope)
+    except Exception as e:
+        logger.error(f"Error al procesar el registro {message_id} en paralelo: {e}")
+        return message_id, False
@@ -1,122 +1,143 @@
+import copy
 import json
 import os
-import re
 from src.config.config import env, logger
-from src.core.validator import ArchivoValidator
+from src.core.validator import ArchivoValidator, ParsedFilename
 
 
-def extract_filename_from_body(body: str) -> str:
-    """
-    Extrae solo el nombre del archivo del cuerpo del mensaje, eliminando el prefijo del directorio.
-    """
-    event_data = json.loads(body)
-    file_key = event_data["Records"][0]["s3"]["object"]["key"]
-    filename = os.path.basename(file_key)
-    return filename
-
-
-def extract_bucket_from_body(body: str) -> str:
-    """
-    Extrae el nombre del bucket del cuerpo del mensaje.
-    """
-    event_data = json.loads(body)
-    bucket_name = event_data["Records"][0]["s3"]["bucket"]["name"]
-    return bucket_name
-
-
-def extract_date_from_filename(filename: str) -> str:
-    """
-    Extrae la fecha en formato 'YYYYMMDD' de un nombre de archivo específico.
-
-    Args:
-        filename (str): El nombre del archivo del cual extraer la fecha.
-
-    Returns:
-        str: La fecha extraída en formato 'YYYYMMDD', o una cadena vacía si no se encuentra.
-    """
-    # Define la expresión regular para extraer la fecha
-    prefix = env.CONST_PRE_SPECIAL_FILE
-    pattern = rf'{prefix}_TUTGMF\d{{8}}(\d{{8}})-\d{{4}}\.zip$'
-    match = re.search(pattern, filename)
-
-    if match:
-        # Devuelve la fecha extraída
-        return match.group(1)
-
-    # Si no se encuentra coincidencia, devuelve una cadena vacía
-    return ''
-
-
-def create_file_id(filename: str):
+def create_file_id(parsed: ParsedFilename):
     """
     Crea un identificador único para un archivo.
 
-    Returns:
-        str: Un identificador único para un archivo.
+    :param parsed: Nombre del archivo clasificado con ArchivoValidator.parse_filename.
+    :return: Un identificador único para un archivo.
     """
-    archivo_validator = ArchivoValidator()
-    date = extract_date_from_filename(filename)
+    date = parsed.fecha
 
     if not date:
         logger.error("Fecha no encontrada en el nombre del archivo",
-                     extra={"filename": filename})
+                     extra={"event_filename": parsed.filename})
         return
 
     componente1 = env.CONST_PLATAFORMA_ORIGEN
     componente2 = env.CONST_TIPO_ARCHIVO_ESPECIAL
-    componente3 = archivo_validator.special_end.zfill(4)
+    componente3 = ArchivoValidator().special_end.zfill(4)
 
     return int(f"{date}{componente1}{componente2}{componente3}")
 
 
-def build_acg_name_if_general_file(acg_nombre_archivo: str) -> str:
-    """
-    Esta Function se encarga de quitar el prefijo env.CONST_PRE_GENERAL_FILE,
-    al nombre del archivo.
-    """
-    acg_nombre_archivo = acg_nombre_archivo.replace(env.CONST_PRE_GENERAL_FILE, "")
-    return acg_nombre_archivo.lstrip("_")
-
-
-def extract_consecutivo_plataforma_origen(filename: str) -> str:
-    """
-    Extrae el consecutivo de la plataforma de origen del filename.
-    Ejemplo: RE_ESP_TUTGMF0001003920241002-0001.zip, me quedo con 0001
-    """
-    # Define la expresión regular para extraer el consecutivo de la plataforma de origen
-    prefix = env.CONST_PRE_SPECIAL_FILE
-    pattern = rf'{prefix}_TUTGMF\d{{8}}\d{{8}}-(\d{{4}})\.zip$'
-    match = re.search(pattern, filename)
-
-    return match.group(1) if match else ''
+_NO_DECODIFICADO = object()
 
 
-def extract_and_validate_event_data(event, required_keys=None):
+class SQSEventEnvelope:
     """
-    Extrae y valida los datos de un evento.
+    Envoltorio de un registro de SQS cuyo body es una notificación de S3.
+    El body se decodifica una única vez, la primera vez que se necesita, y los datos
+    del objeto y de reprocesamiento se exponen como propiedades.
 
-    :param event: El evento recibido, con formato esperado de AWS SQS.
-    :param required_keys: Lista de claves requeridas para validar el contenido del body.
-    :return: Lista de diccionarios con los datos extraídos o una lista vacía si hay errores.
+    Una notificación puede traer varios objetos en body["Records"]; cada envoltorio
+    representa uno de ellos, indicado por s3_index (ver split).
     """
-    records_data = []
-    required_keys = required_keys or []
 
-    for record in event.get("Records", []):
-        body = record.get("body", "{}")
+    __slots__ = ("message_id", "receipt_handle", "attributes", "s3_index", "_raw_body", "_body")
+
+    def __init__(self, record: dict, s3_index: int = 0):
+        """
+        :param record: Registro de SQS tal como llega en event["Records"].
+        :param s3_index: Posición del objeto de S3 dentro de la notificación.
+        """
+        self.message_id = record.get("messageId")
+        self.receipt_handle = record.get("receiptHandle")
+        self.attributes = record.get("attributes") or {}
+        self.s3_index = s3_index
+        self._raw_body = record.get("body", "{}")
+        self._body = _NO_DECODIFICADO
+
+    @property
+    def body(self) -> dict:
+        """Body del mensaje decodificado; un diccionario vacío si no es un JSON válido."""
+        if self._body is _NO_DECODIFICADO:
+            try:
+                body = json.loads(self._raw_body) if isinstance(self._raw_body, str) else self._raw_body
+            except json.JSONDecodeError as e:
+                logger.error(f"Error al decodificar el body del evento: {e}")
+                body = None
+            self._body = body if isinstance(body, dict) else {}
+        return self._body
+
+    @property
+    def _s3(self) -> dict:
+        """Sección 's3' del objeto de la notificación que representa este envoltorio."""
         try:
-            body_dict = json.loads(body)
-        except json.JSONDecodeError as e:
-            logger.error(f"Error al decodificar el body del evento: {e}")
-            continue
-
-        if all(key in body_dict for key in required_keys):
-            records_data.append(body_dict)
-        else:
-            missing_keys = [key for key in required_keys if key not in body_dict]
-            logger.warning(
-                f"Faltan claves requeridas en el body del evento: {missing_keys}",
-                extra={"body": body_dict},
-            )
-
-    return records_data
+            return self.body["Records"][self.s3_index]["s3"] or {}
+        except (KeyError, IndexError, TypeError):
+            return {}
+
+    @property
+    def bucket(self):
+        return (self._s3.get("bucket") or {}).get("name")
+
+    @property
+    def key(self):
+        return (self._s3.get("object") or {}).get("key")
+
+    @property
+    def size(self):
+        return (self._s3.get("object") or {}).get("size")
+
+    @property
+    def etag(self):
+        return (self._s3.get("object") or {}).get("eTag")
+
+    @property
+    def file_name(self):
+        """Nombre del archivo sin el prefijo del directorio."""
+        return os.path.basename(self.key) if self.key else None
+
+    @property
+    def is_processing(self) -> bool:
+        return bool(self.body.get("is_processing", False))
+
+    @property
+    def file_id(self):
+        return self.body.get("file_id")
+
+    @property
+    def response_processing_id(self):
+        return self.body.get("response_processing_id")
+
+    @property
+    def receive_count(self) -> int:
+        """Número aproximado de veces que SQS ha entregado el mensaje."""
+        return int(self.attributes.get("ApproximateReceiveCount", 1))
+
+    @property
+    def is_split_unit(self) -> bool:
+        """Indica si el envoltorio es uno de varios objetos de S3 del mismo mensaje (ver split)."""
+        s3_records = self.body.get("Records")
+        return isinstance(s3_records, list) and len(s3_records) > 1
+
+    def has_keys(self, *keys) -> bool:
+        """Indica si el body contiene todas las claves indicadas."""
+        return all(key in self.body for key in keys)
+
+    def split(self) -> list["SQSEventEnvelope"]:
+        """
+        Separa la notificación en un envoltorio por cada objeto de S3 que contiene.
+        Todos comparten el body ya decodificado y el receipt handle del mensaje.
+        """
+        s3_records = self.body.get("Records")
+        if not isinstance(s3_records, list) or len(s3_records) <= 1:
+            return [self]
+
+        units = []
+        for index in range(len(s3_records)):
+            unit = copy.copy(self)
+            unit.s3_index = index
+            units.append(unit)
+        return units
+
+    def unit_body(self) -> dict:
+        """Body del mensaje reducido al objeto de S3 que representa este envoltorio."""
+        s3_records = self.body.get("Records") or []
+        return {**self.body, "Records": s3_records[self.s3_index:self.s3_index + 1]}
@@ -2,6 +2,8 @@ import os.path
 import re
 import json
 from datetime import datetime
+from functools import lru_cache
+from typing import NamedTuple, Optional, Pattern
 from botocore.exceptions import ClientError
 from src.services.aws_clients_service import AWSClients
 from src.utils.logger_utils import get_logger
@@ -10,14 +12,58 @@ from src.config.config import env
 logger = get_logger(env.DEBUG_MODE)
 
 
+class FilenamePatterns(NamedTuple):
+    """
+    Expresiones regulares compiladas para una versión de la configuración de nombres de archivo.
+    """
+    special: Pattern
+    general: Pattern
+    special_name: Pattern
+
+
+class ParsedFilename(NamedTuple):
+    """
+    Resultado de clasificar un nombre de archivo de respuesta con una única evaluación de los patrones.
+    La validez de la fecha no se incluye porque depende del momento en que se consulta.
+    """
+    filename: str
+    tipo_respuesta: Optional[str]
+    es_especial: bool
+    es_general: bool
+    es_reintegro: bool
+    fecha: str
+    consecutivo: str
+    acg_nombre_archivo: str
+
+
+@lru_cache(maxsize=16)
+def compile_filename_patterns(special_start: str, special_end: str, general_start: str,
+                              pre_special_file: str) -> FilenamePatterns:
+    """
+    Compila los patrones de nombres de archivo una sola vez por cada versión de la configuración.
+    """
+    return FilenamePatterns(
+        special=re.compile(f"^{special_start}(\\d{{8}})-{special_end}$"),
+        general=re.compile(f"^{general_start}(\\d{{8}})-\\d{{4}}(-R)?$"),
+        special_name=compile_special_name_pattern(pre_special_file),
+    )
+
+
+def compile_special_name_pattern(pre_special_file: str) -> Pattern:
+    """
+    Compila el patrón del nombre completo de un archivo especial, del que se extraen la fecha
+    y el consecutivo de la plataforma de origen.
+    Ejemplo: RE_ESP_TUTGMF0001003920241002-0001.zip
+    """
+    return re.compile(rf'{pre_special_file}_TUTGMF\d{{8}}(\d{{8}})-(\d{{4}})\.zip$')
+
+
 class ArchivoValidator:
     """
     Clase para validar archivos en el sistema.
     """
 
     def __init__(self):
-        # Inicializa el cliente SSM solo una vez
-        self.ssm_client = AWSClients.get_ssm_client()
         (
             self.special_start,
             self.special_end,
@@ -32,8 +78,7 @@ class ArchivoValidator:
         parameter_name = env.PARAMETER_STORE_FILE_CONFIG
 
         try:
-            response = self.ssm_client.get_parameter(Name=parameter_name, WithDecryption=True)
-            parameter_data = json.loads(response['Parameter']['Value'])
+            parameter_data = self._get_parameter_data(parameter_name)
 
             special_start = parameter_data.get(env.SPECIAL_START_NAME, "")
             special_end = parameter_data.get(env.SPECIAL_END_NAME, "")
@@ -49,16 +94,20 @@ class ArchivoValidator:
             logger.error(f"Error al obtener el parámetro {parameter_name}: {e}")
             return "", "", "", {}
 
+    @staticmethod
+    def _get_parameter_data(parameter_name: str) -> dict:
+        """
+        Obtiene el contenido JSON de un parámetro de Parameter Store a través de la caché compartida.
+        """
+        return json.loads(AWSClients.get_cached_parameter(parameter_name))
+
     @staticmethod
     def get_retry_parameters(parameter_name: str) -> dict:
         """
         Obtiene los parámetros de configuración de reintentos desde Parameter Store.
         """
         try:
-            ssm_client = AWSClients.get_ssm_client()
-            response = ssm_client.get_parameter(Name=parameter_name, WithDecryption=True)
-            parameter_data = json.loads(response['Parameter']['Value'])
-            return parameter_data
+            return ArchivoValidator._get_parameter_data(parameter_name)
         except ClientError as e:
             logger.error(f"Error al obtener el parámetro  de reintento {parameter_name}: {e}")
             return {"number-retries": "5", "time-between-retry": "900"}
@@ -88,25 +137,65 @@ class ArchivoValidator:
             logger.error(f"Error en el formato de fecha {fecha_str}.")
             return False
 
-    def is_special_file(self, filename: str) -> bool:
+    def get_filename_patterns(self) -> FilenamePatterns:
         """
-        Verifica si el archivo cumple con la estructura definida para archivos especiales
-        y que la fecha en el nombre no sea mayor a la fecha actual.
+        Obtiene los patrones compilados para la configuración actual del validador.
+        """
+        return compile_filename_patterns(
+            self.special_start, self.special_end, self.general_start, env.CONST_PRE_SPECIAL_FILE
+        )
+
+    def parse_filename(self, filename: str) -> ParsedFilename:
         """
+        Clasifica el nombre de un archivo de respuesta evaluando cada patrón una sola vez.
+        """
+        patterns = self.get_filename_patterns()
         # Remueve el sufijo .zip si está presente
-        if filename.endswith(".zip"):
-            filename = filename[:-4]
+        stem = filename[:-4] if filename.endswith(".zip") else filename
+
+        special_match = patterns.special.match(stem)
+        general_match = patterns.general.match(stem)
+        special_name_match = patterns.special_name.search(filename)
 
-        # Definir el patrón de archivo especial
-        expected_pattern = f"^{self.special_start}(\\d{{8}})-{self.special_end}$"
+        if special_match:
+            fecha = special_match.group(1)
+        elif general_match:
+            fecha = general_match.group(1)
+        else:
+            fecha = special_name_match.group(1) if special_name_match else ""
+
+        tipo_respuesta = self._get_tipo_respuesta(filename)
+        acg_nombre_archivo = filename.split(".")[0]
+        if not self.is_special_prefix(filename):
+            acg_nombre_archivo = acg_nombre_archivo.replace(env.CONST_PRE_GENERAL_FILE, "").lstrip("_")
+
+        return ParsedFilename(
+            filename=filename,
+            tipo_respuesta=tipo_respuesta,
+            es_especial=special_match is not None,
+            es_general=general_match is not None,
+            es_reintegro=tipo_respuesta == env.CONST_TIPO_ARCHIVO_GENERAL_REINTEGROS,
+            fecha=fecha,
+            consecutivo=special_name_match.group(2) if special_name_match else "",
+            acg_nombre_archivo=acg_nombre_archivo,
+        )
 
-        match = re.match(expected_pattern, filename)
-        if not match:
+    def is_special_file(self, filename: str, parsed: Optional[ParsedFilename] = None) -> bool:
+        """
+        Verifica si el archivo cumple con la estructura definida para archivos especiales
+        y que la fecha en el nombre no sea mayor a la fecha actual.
+
+        :param filename: Nombre del archivo.
+        :param parsed: Nombre ya clasificado con parse_filename; si no se indica, se clasifica aquí.
+        """
+        parsed = parsed or self.parse_filename(filename)
+
+        if not parsed.es_especial:
             logger.debug(f"El archivo {filename} no cumple con la estructura de un archivo especial.")
             return False
 
-        # Extraer la fecha del nombre de archivo y validar que no sea mayor a la fecha actual
-        fecha_str = match.group(1)
+        # Validar que la fecha del nombre de archivo no sea mayor a la fecha actual
+        fecha_str = parsed.fecha
         if not self.is_valid_date_in_filename(fecha_str):
             logger.debug(f"La fecha {fecha_str} en el archivo {filename} es mayor a la fecha actual.")
             return False
@@ -118,25 +207,24 @@ class ArchivoValidator:
                      }})
         return True
 
-    def validate_filename_structure_for_general_file(self, filename: str) -> bool:
+    def validate_filename_structure_for_general_file(
+            self, filename: str, parsed: Optional[ParsedFilename] = None) -> bool:
         """
         Verifica si el archivo cumple con la estructura del nombre definida para archivos generales.
         Ahora también acepta nombres de archivo que terminan en '-R'.
-        """
-        # Remueve el sufijo .zip si está presente
-        if filename.endswith(".zip"):
-            filename = filename[:-4]
 
-        # Definir el patrón de archivo general, permitiendo '-R' opcionalmente
-        expected_pattern = f"^{self.general_start}(\\d{{8}})-\\d{{4}}(-R)?$"
+        :param filename: Nombre del archivo.
+        :param parsed: Nombre ya clasificado con parse_filename; si no se indica, se clasifica aquí.
+        """
+        parsed = parsed or self.parse_filename(filename)
 
-        match = re.match(expected_pattern, filename)
-        if not match:
+        if not parsed.es_general:
+            expected_pattern = self.get_filename_patterns().general.pattern
             logger.debug(f"El archivo {filename} no cumple con el patrón de estructura general: {expected_pattern}")
             return False
 
-        # Extraer la fecha del nombre de archivo y validar que no sea mayor a la fecha actual
-        fecha_str = match.group(1)
+        # Validar que la fecha del nombre de archivo no sea mayor a la fecha actual
+        fecha_str = parsed.fecha
         if not self.is_valid_date_in_filename(fecha_str):
             logger.debug(f"La fecha {fecha_str} en el archivo {filename} es mayor a la fecha actual.")
             return False
@@ -175,8 +263,7 @@ class ArchivoValidator:
         parameter_name = env.PARAMETER_STORE_FILE_CONFIG
 
         try:
-            response = self.ssm_client.get_parameter(Name=parameter_name, WithDecryption=True)
-            parameter_data = json.loads(response['Parameter']['Value'])
+            parameter_data = self._get_parameter_data(parameter_name)
             valid_states = parameter_data.get(env.VALID_STATES_FILES, [])
             logger.debug(f"estados válidos: {valid_states}")
             return valid_states
@@ -198,9 +285,22 @@ class ArchivoValidator:
         """
         return state != env.CONST_ESTADO_PROCESSED
 
-    def get_type_response(self, filename: str) -> str:
+    def get_type_response(self, filename: str, parsed: Optional[ParsedFilename] = None) -> str:
         """
         Obtiene el tipo de respuesta del archivo.
+
+        :param filename: Nombre del archivo.
+        :param parsed: Nombre ya clasificado con parse_filename; si se indica, no se vuelve a evaluar.
+        """
+        tipo_respuesta = parsed.tipo_respuesta if parsed else self._get_tipo_respuesta(filename)
+        if tipo_respuesta is None:
+            logger.error("El archivo no cumple con ninguna estructura de tipo de respuesta.",
+                         extra={"event_filename": {"filename": filename}})
+        return tipo_respuesta
+
+    def _get_tipo_respuesta(self, filename: str) -> Optional[str]:
+        """
+        Determina el tipo de respuesta a partir del prefijo y la terminación del nombre del archivo.
         """
         if self.is_special_prefix(filename):
             return env.CONST_TIPO_ARCHIVO_ESPECIAL
@@ -208,9 +308,7 @@ class ArchivoValidator:
             return env.CONST_TIPO_ARCHIVO_GENERAL_REINTEGROS
         elif filename.startswith(env.CONST_PRE_GENERAL_FILE):
             return env.CONST_TIPO_ARCHIVO_GENERAL
-        else:
-            logger.error("El archivo no cumple con ninguna estructura de tipo de respuesta.",
-                         extra={"event_filename": {"filename": filename}})
+        return None
 
     def is_valid_extracted_filename(self, extracted_filename: str, tipo_respuesta: str,
                                     acg_nombre_archivo: str) -> bool:
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Numeric, String, CHAR, SmallInteger, Date, TIMESTAMP, DECIMAL, ForeignKey, BigInteger
+from sqlalchemy import Column, Numeric, String, CHAR, SmallInteger, Date, TIMESTAMP, DECIMAL, ForeignKey, BigInteger, \
+    Index
 from .base import Base
 from datetime import datetime
 from sqlalchemy.orm import relationship
@@ -48,6 +49,11 @@ class CGDArchivo(Base):
     estados = relationship("CGDArchivoEstado", back_populates="archivo")
     catalogo_error = relationship("CGDCatalogoErrores", back_populates="archivos")
 
+    # Índice para las búsquedas por ACG_NOMBRE_ARCHIVO; también cubre el filtro por TIPO_ARCHIVO
+    __table_args__ = (
+        Index("ix_cgd_archivos_acg_nombre_archivo_tipo_archivo", "acg_nombre_archivo", "tipo_archivo"),
+    )
+
 
 def __repr__(self):
     return (f"<CGDArchivo(id_archivo={self.id_archivo}, "
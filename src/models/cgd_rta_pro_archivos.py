@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, VARCHAR, BigInteger, ForeignKeyConstraint, Integer
+from sqlalchemy import Column, ForeignKey, VARCHAR, BigInteger, ForeignKeyConstraint, Integer, Index
 from sqlalchemy.orm import relationship
 
 
@@ -22,9 +22,10 @@ class CGDRtaProArchivos(Base):
 
     catalogo_error = relationship("CGDCatalogoErrores", back_populates="rta_pro_archivos")
 
-    # Define la clave foránea compuesta
+    # Define la clave foránea compuesta y el índice de archivos pendientes por ID_ARCHIVO
     __table_args__ = (
         ForeignKeyConstraint(['id_archivo', 'id_rta_procesamiento'],
                              ['cgd_rta_procesamiento.id_archivo',
                               'cgd_rta_procesamiento.id_rta_procesamiento']),
+        Index('ix_cgd_rta_pro_archivos_id_archivo_estado', 'id_archivo', 'estado'),
     )
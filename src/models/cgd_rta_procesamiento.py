@@ -1,5 +1,5 @@
 from sqlalchemy import CHAR, VARCHAR, Column, ForeignKey, Numeric, TIMESTAMP, Integer, PrimaryKeyConstraint, BigInteger, \
-    Identity
+    Identity, Index
 from .base import Base
 
 
@@ -16,7 +16,9 @@ class CGDRtaProcesamiento(Base):
     codigo_error = Column(VARCHAR(30), ForeignKey("cgd_catalogo_errores.codigo_error"))
     detalle_error = Column(VARCHAR(2000))
 
-    # Define la clave primaria compuesta
+    # Define la clave primaria compuesta; también resuelve la última respuesta por ID_ARCHIVO.
+    # El índice cubre la última respuesta por ID_ARCHIVO y NOMBRE_ARCHIVO_ZIP.
     __table_args__ = (
         PrimaryKeyConstraint('id_archivo', 'id_rta_procesamiento'),
+        Index('ix_cgd_rta_procesamiento_id_archivo_zip', 'id_archivo', 'nombre_archivo_zip', 'id_rta_procesamiento'),
     )
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, TIMESTAMP
+from datetime import datetime
+from .base import Base
+
+# Versión del esquema que esperan los modelos; se incrementa al agregar tablas o índices
+SCHEMA_VERSION = 1
+
+
+class CGDSchemaVersion(Base):
+    __tablename__ = "cgd_schema_version"
+
+    version = Column("version", Integer, primary_key=True)
+    fecha_aplicacion = Column("fecha_aplicacion", TIMESTAMP, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f"<CGDSchemaVersion(version={self.version}, fecha_aplicacion={self.fecha_aplicacion})>"
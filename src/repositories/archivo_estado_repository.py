@@ -27,10 +27,10 @@ class ArchivoEstadoRepository:
 
         try:
             self.db.add(nuevo_estado)
-            self.db.commit()
+            self.db.flush()
             self.db.refresh(nuevo_estado)
         except IntegrityError as e:
-            self.db.rollback()
+            # La unidad de trabajo decide si se descartan los cambios pendientes
             if 'duplicate key value violates unique constraint' in str(e.orig):
                 conflict_detail = str(e.orig).split('DETAIL: ')[-1]
                 logger.error(f"Error de clave duplicada: {conflict_detail}")
@@ -1,8 +1,33 @@
-from typing import Type, Optional, Any
+from datetime import datetime
+from typing import Type, Optional, Any, NamedTuple
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from src.models.cgd_archivo import CGDArchivo, CGDArchivoEstado
 
 
+class ArchivoResumen(NamedTuple):
+    """
+    Columnas de CGD_ARCHIVOS que usa el procesamiento de respuestas. Se consultan sin cargar
+    la entidad completa, que incluye columnas de texto extensas que el procesamiento no necesita.
+    """
+    id_archivo: int
+    acg_nombre_archivo: str
+    estado: str
+    fecha_recepcion: datetime
+    tipo_archivo: str
+    contador_intentos_cargue: int
+
+    @classmethod
+    def from_archivo(cls, archivo: CGDArchivo) -> "ArchivoResumen":
+        """
+        Construye el resumen a partir de una entidad CGDArchivo.
+        """
+        return cls(*(getattr(archivo, field) for field in cls._fields))
+
+
+ARCHIVO_RESUMEN_COLUMNS = tuple(getattr(CGDArchivo, field) for field in ArchivoResumen._fields)
+
+
 class ArchivoRepository:
     """
     Clase que define el repositorio (capa de abstracción a la base de datos) para la entidad 'Archivo'.
@@ -29,6 +54,18 @@ class ArchivoRepository:
             print(f"Error al buscar archivo por nombre: {e}")
 
 
+    def get_archivo_resumen_by_nombre_archivo(self, nombre_archivo: str) -> Optional[ArchivoResumen]:
+        """
+        Obtiene solo las columnas de ArchivoResumen de un archivo por su nombre.
+
+        :param nombre_archivo: Nombre del archivo a buscar.
+        :return: ArchivoResumen o None si no se encuentra.
+        """
+        row = self.db.query(*ARCHIVO_RESUMEN_COLUMNS).filter(
+            CGDArchivo.acg_nombre_archivo == str(nombre_archivo)
+        ).first()
+        return ArchivoResumen(*row) if row else None
+
     def check_file_exists(self, nombre_archivo: str) -> bool:
         """
         Verifica si un archivo existe en la base de datos.
@@ -56,22 +93,25 @@ class ArchivoRepository:
         archivo = self.get_archivo_by_nombre_archivo(nombre_archivo)
         archivo.estado = estado
         archivo.contador_intentos_cargue = contador_intentos_cargue
-        self.db.commit()
+        self.db.flush()
 
-    def check_special_file_exists(self, acg_nombre_archivo: str, tipo_archivo: str) -> bool:
+    def update_estado_archivo_by_id(
+            self,
+            id_archivo: int,
+            estado: str,
+            contador_intentos_cargue: int) -> None:
         """
-        Verifica si un archivo especial existe en la base de datos.
+        Actualiza el estado de un archivo por su ID con una sentencia UPDATE, sin cargar la entidad.
 
-        :param acg_nombre_archivo: Nombre del archivo a buscar.
-        :param tipo_archivo: Tipo de archivo a buscar.
-        :return: True si existe, False si no.
+        :param id_archivo: ID del archivo a actualizar.
+        :param estado: Nuevo estado del archivo.
+        :param contador_intentos_cargue: Contador de intentos de cargue.
         """
-        archivo = self.db.query(CGDArchivo).filter(
-            CGDArchivo.acg_nombre_archivo == str(acg_nombre_archivo),
-            CGDArchivo.tipo_archivo == str(tipo_archivo)
-        ).first()
-
-        return archivo is not None
+        self.db.execute(
+            update(CGDArchivo)
+            .where(CGDArchivo.id_archivo == id_archivo)
+            .values(estado=estado, contador_intentos_cargue=contador_intentos_cargue)
+        )
 
     def insert_archivo(self, archivo: CGDArchivo) -> None:
         """
@@ -80,4 +120,4 @@ class ArchivoRepository:
         :param archivo: Instancia de CGDArchivo a insertar.
         """
         self.db.add(archivo)
-        self.db.commit()
+        self.db.flush()
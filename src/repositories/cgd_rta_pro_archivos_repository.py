@@ -1,3 +1,4 @@
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
 from src.models.cgd_rta_pro_archivos import CGDRtaProArchivos
 from src.config.config import env
@@ -11,13 +12,15 @@ class CGDRtaProArchivosRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def insert(self, archivo: CGDRtaProArchivos):
+    def insert_many(self, archivos: list[dict]):
         """
-        Inserta un registro en la tabla 'CGD_RTA_PRO_ARCHIVOS'.
+        Inserta varios registros en la tabla 'CGD_RTA_PRO_ARCHIVOS' con una sola sentencia INSERT.
+
+        :param archivos: Lista de diccionarios con los valores de cada registro.
         """
-        self.db.add(archivo)
-        self.db.commit()
-        self.db.refresh(archivo)
+        if not archivos:
+            return
+        self.db.execute(insert(CGDRtaProArchivos).values(archivos))
 
     def get_pending_files_by_id_archivo(self, id_archivo: int):
         """
@@ -28,18 +31,26 @@ class CGDRtaProArchivosRepository:
             CGDRtaProArchivos.estado == env.CONST_ESTADO_INIT_PENDING
         ).all()
 
-    def update_estado_to_enviado(self, id_archivo: int, nombre_archivo: str):
-        """
-        Actualiza el estado de un archivo a 'ENVIADO'.
+    def update_estados_to_enviado(self, id_archivo: int, nombres_archivos: list[str]):
         """
-        archivo = self.db.query(CGDRtaProArchivos).filter(
-            CGDRtaProArchivos.id_archivo == id_archivo,
-            CGDRtaProArchivos.nombre_archivo == nombre_archivo
-        ).first()
+        Actualiza a 'ENVIADO' el estado de varios archivos pendientes de un 'ID_ARCHIVO' con una sola
+        sentencia UPDATE. Solo cambian los archivos en 'PENDIENTE_INICIO', los mismos que consulta
+        get_pending_files_by_id_archivo, y no los de intentos anteriores con el mismo nombre.
 
-        if archivo:
-            archivo.estado = env.CONST_ESTADO_SEND
-            self.db.commit()
+        :param id_archivo: ID del archivo.
+        :param nombres_archivos: Nombres de los archivos a actualizar.
+        """
+        if not nombres_archivos:
+            return
+        self.db.execute(
+            update(CGDRtaProArchivos)
+            .where(
+                CGDRtaProArchivos.id_archivo == id_archivo,
+                CGDRtaProArchivos.nombre_archivo.in_(nombres_archivos),
+                CGDRtaProArchivos.estado == env.CONST_ESTADO_INIT_PENDING,
+            )
+            .values(estado=env.CONST_ESTADO_SEND)
+        )
 
     def get_files_loaded_for_response(self, id_archivo: int, id_rta_procesamiento: int) -> list:
         """
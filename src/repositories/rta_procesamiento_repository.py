@@ -2,85 +2,102 @@ from src.models.cgd_rta_procesamiento import CGDRtaProcesamiento
 from src.models.cgd_rta_pro_archivos import CGDRtaProArchivos
 from .archivo_repository import ArchivoRepository
 from datetime import datetime, timezone, timedelta
-from sqlalchemy.orm import Session
+from typing import NamedTuple, Optional
+from sqlalchemy import func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
 from src.core.validator import ArchivoValidator
 from src.config.config import env
+from src.utils.logger_utils import get_logger
+
+logger = get_logger(env.DEBUG_MODE)
+
+# Intentos de asignar el siguiente ID_RTA_PROCESAMIENTO si otro consumidor tomó el mismo ID
+RTA_PROCESAMIENTO_INSERT_MAX_ATTEMPTS = 3
 
 
 class ProcessingResponseNotFoundError(Exception):
     pass
 
 
+class RtaProcesamientoResumen(NamedTuple):
+    """
+    Columnas de la última respuesta de procesamiento que usa el flujo de un mensaje.
+    """
+    id_rta_procesamiento: int
+    estado: str
+    contador_intentos_cargue: int
+
+
 class RtaProcesamientoRepository:
     def __init__(self, db: Session):
         self.db = db
         self.archivo_repository = ArchivoRepository(db)
         self.archivo_validator = ArchivoValidator()
 
-    def get_last_contador_intentos_cargue(self, id_archivo: int) -> int:
-        """
-        Obtiene el último contador de intentos de cargue de una respuesta de procesamiento.
-
-        :param id_archivo: ID del archivo.
-        :return: Último contador de intentos de cargue.
-        """
-        # Obtiene la última respuesta de procesamiento
-        last_entry = self.db.query(CGDRtaProcesamiento) \
-            .filter(CGDRtaProcesamiento.id_archivo == id_archivo) \
-            .order_by(CGDRtaProcesamiento.id_rta_procesamiento.desc()) \
-            .first()
-
-        return last_entry.contador_intentos_cargue if last_entry else 0
-
-    def insert_rta_procesamiento(
+    def insert_next_rta_procesamiento(
             self,
             id_archivo: int,
-            id_rta_procesamiento: int,
             nombre_archivo_zip: str,
             tipo_respuesta: str,
-            estado: str,
-            contador_intentos_cargue: int,
-            codigo_error: str = None,
-            detalle_error: str = None) -> None:
+            estado: str) -> RtaProcesamientoResumen:
         """
-        Inserta una nueva respuesta de procesamiento en la tabla 'cgd_rta_procesamiento'.
+        Inserta una nueva respuesta de procesamiento asignando en la base de datos el siguiente
+        ID_RTA_PROCESAMIENTO y el siguiente contador de intentos de cargue del archivo, con una única
+        sentencia INSERT ... SELECT ... RETURNING.
+
+        Si otro consumidor inserta a la vez el mismo ID, la sentencia se repite dentro de un
+        savepoint, sin descartar el resto de la transacción.
 
         :param id_archivo: ID del archivo.
-        :param id_rta_procesamiento: ID de la respuesta de procesamiento.
         :param nombre_archivo_zip: Nombre del archivo ZIP.
         :param tipo_respuesta: Tipo de respuesta.
         :param estado: Estado de la respuesta.
-        :param contador_intentos_cargue: Contador de intentos de cargue.
-        :param codigo_error: Código de error. Por defecto, es None.
-        :param detalle_error: Detalle del error. Por defecto, es None.
-
+        :return: RtaProcesamientoResumen con el ID y el contador asignados.
         """
-        # Definir la zona horaria de Colombia (UTC-5)
         colombia_tz = timezone(timedelta(hours=-5))
         fecha_recepcion = datetime.now(colombia_tz)
 
-        nueva_rta_procesamiento = CGDRtaProcesamiento(
-            id_archivo=id_archivo,
-            id_rta_procesamiento=id_rta_procesamiento,
-            nombre_archivo_zip=nombre_archivo_zip,
-            tipo_respuesta=tipo_respuesta,
-            fecha_recepcion=fecha_recepcion,
-            estado=estado,
-            contador_intentos_cargue=contador_intentos_cargue,
-            codigo_error=codigo_error,
-            detalle_error=detalle_error
+        ultima = aliased(CGDRtaProcesamiento)
+        last_contador = (
+            select(ultima.contador_intentos_cargue)
+            .where(ultima.id_archivo == id_archivo)
+            .order_by(ultima.id_rta_procesamiento.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        siguiente = select(
+            literal(id_archivo, CGDRtaProcesamiento.id_archivo.type),
+            func.coalesce(func.max(CGDRtaProcesamiento.id_rta_procesamiento), 0) + 1,
+            literal(nombre_archivo_zip, CGDRtaProcesamiento.nombre_archivo_zip.type),
+            literal(tipo_respuesta, CGDRtaProcesamiento.tipo_respuesta.type),
+            literal(fecha_recepcion, CGDRtaProcesamiento.fecha_recepcion.type),
+            literal(estado, CGDRtaProcesamiento.estado.type),
+            func.coalesce(last_contador, 0) + 1,
+        ).where(CGDRtaProcesamiento.id_archivo == id_archivo)
+
+        stmt = insert(CGDRtaProcesamiento).from_select(
+            ["id_archivo", "id_rta_procesamiento", "nombre_archivo_zip", "tipo_respuesta",
+             "fecha_recepcion", "estado", "contador_intentos_cargue"],
+            siguiente,
+        ).returning(
+            CGDRtaProcesamiento.id_rta_procesamiento,
+            CGDRtaProcesamiento.estado,
+            CGDRtaProcesamiento.contador_intentos_cargue,
         )
 
-        try:
-            # Agrega y confirma la nueva respuesta de procesamiento en la base de datos
-            self.db.add(nueva_rta_procesamiento)
-            self.db.commit()
-            self.db.refresh(nueva_rta_procesamiento)
-
-        except Exception as e:
-            # Revertir los cambios para mantener la consistencia en la base de datos
-            self.db.rollback()
-            raise e
+        for attempt in range(1, RTA_PROCESAMIENTO_INSERT_MAX_ATTEMPTS + 1):
+            try:
+                with self.db.begin_nested():
+                    row = self.db.execute(stmt).first()
+                return RtaProcesamientoResumen(*row)
+            except IntegrityError:
+                if attempt == RTA_PROCESAMIENTO_INSERT_MAX_ATTEMPTS:
+                    raise
+                logger.warning(
+                    f"ID_RTA_PROCESAMIENTO en uso para el archivo con ID {id_archivo}; "
+                    f"reintento {attempt} de {RTA_PROCESAMIENTO_INSERT_MAX_ATTEMPTS - 1}"
+                )
 
     def update_state_rta_procesamiento(
             self,
@@ -101,41 +118,100 @@ class RtaProcesamientoRepository:
 
         if last_entry:
             last_entry.estado = estado
-            self.db.commit()
+            self.db.flush()
         else:
             raise ProcessingResponseNotFoundError(
                 f"No se encontró una respuesta de procesamiento para el archivo con ID {id_archivo}")
 
-    def get_tipo_respuesta(self, id_archivo: int) -> str:
+    def get_latest_rta_procesamiento(
+            self,
+            id_archivo: int,
+            nombre_archivo_zip: str = None) -> Optional[RtaProcesamientoResumen]:
         """
-        Obtiene el tipo de respuesta de una respuesta de procesamiento.
+        Obtiene en una sola consulta la última respuesta de procesamiento de un archivo,
+        opcionalmente filtrada por el nombre del archivo ZIP.
 
         :param id_archivo: ID del archivo.
-        :return: Tipo de respuesta.
+        :param nombre_archivo_zip: Nombre del archivo ZIP. Por defecto, es None.
+        :return: RtaProcesamientoResumen o None si no existe.
         """
-        # Obtiene la última respuesta de procesamiento
-        last_entry = self.db.query(CGDRtaProcesamiento) \
-            .filter(CGDRtaProcesamiento.id_archivo == id_archivo) \
-            .order_by(CGDRtaProcesamiento.id_rta_procesamiento.desc()) \
-            .first()
+        query = self.db.query(
+            CGDRtaProcesamiento.id_rta_procesamiento,
+            CGDRtaProcesamiento.estado,
+            CGDRtaProcesamiento.contador_intentos_cargue,
+        ).filter(CGDRtaProcesamiento.id_archivo == id_archivo)
+        if nombre_archivo_zip is not None:
+            query = query.filter(CGDRtaProcesamiento.nombre_archivo_zip == nombre_archivo_zip)
+        row = query.order_by(CGDRtaProcesamiento.id_rta_procesamiento.desc()).first()
+        return RtaProcesamientoResumen(*row) if row else None
 
-        return last_entry.tipo_respuesta if last_entry else None
+    def update_state_rta_procesamiento_by_id(self, id_archivo: int, id_rta_procesamiento: int, estado: str) -> None:
+        """
+        Actualiza el estado de una respuesta de procesamiento ya identificada, sin volver a consultarla.
+
+        :param id_archivo: ID del archivo.
+        :param id_rta_procesamiento: ID de la respuesta de procesamiento.
+        :param estado: Estado de la respuesta.
+        """
+        self.db.execute(
+            update(CGDRtaProcesamiento)
+            .where(
+                CGDRtaProcesamiento.id_archivo == id_archivo,
+                CGDRtaProcesamiento.id_rta_procesamiento == id_rta_procesamiento,
+            )
+            .values(estado=estado)
+        )
 
-    def is_estado_enviado(self, id_archivo: int, nombre_archivo_zip: str) -> bool:
+    def restart_last_rta_procesamiento(self, id_archivo: int, estado: str) -> RtaProcesamientoResumen:
         """
-        Verifica si el estado de la respuesta de procesamiento es 'ENVIADO'.
+        Cambia el estado de la última respuesta de procesamiento e incrementa su contador de intentos
+        de cargue con una única sentencia UPDATE ... RETURNING.
 
         :param id_archivo: ID del archivo.
-        :param nombre_archivo_zip: Nombre del archivo ZIP.
-        :return: True si el estado es 'ENVIADO', False en caso contrario.
+        :param estado: Nuevo estado de la respuesta.
+        :return: RtaProcesamientoResumen con los valores actualizados.
+        """
+        last_id = (
+            select(func.max(CGDRtaProcesamiento.id_rta_procesamiento))
+            .where(CGDRtaProcesamiento.id_archivo == id_archivo)
+            .scalar_subquery()
+        )
+        row = self.db.execute(
+            update(CGDRtaProcesamiento)
+            .where(
+                CGDRtaProcesamiento.id_archivo == id_archivo,
+                CGDRtaProcesamiento.id_rta_procesamiento == last_id,
+            )
+            .values(
+                estado=estado,
+                contador_intentos_cargue=CGDRtaProcesamiento.contador_intentos_cargue + 1,
+            )
+            .returning(
+                CGDRtaProcesamiento.id_rta_procesamiento,
+                CGDRtaProcesamiento.estado,
+                CGDRtaProcesamiento.contador_intentos_cargue,
+            )
+        ).first()
+
+        if row is None:
+            raise ProcessingResponseNotFoundError(
+                f"No se encontró una respuesta de procesamiento para el archivo con ID {id_archivo}")
+        return RtaProcesamientoResumen(*row)
+
+    def get_tipo_respuesta(self, id_archivo: int) -> str:
+        """
+        Obtiene el tipo de respuesta de una respuesta de procesamiento.
+
+        :param id_archivo: ID del archivo.
+        :return: Tipo de respuesta.
         """
         # Obtiene la última respuesta de procesamiento
         last_entry = self.db.query(CGDRtaProcesamiento) \
-            .filter(CGDRtaProcesamiento.id_archivo == id_archivo,
-                    CGDRtaProcesamiento.nombre_archivo_zip == nombre_archivo_zip) \
+            .filter(CGDRtaProcesamiento.id_archivo == id_archivo) \
             .order_by(CGDRtaProcesamiento.id_rta_procesamiento.desc()) \
             .first()
-        return last_entry.estado == env.CONST_ESTADO_SEND if last_entry else False
+
+        return last_entry.tipo_respuesta if last_entry else None
 
     def get_last_rta_procesamiento_without_archivos(self, id_archivo: int, nombre_archivo_zip: str) -> int:
         """
@@ -156,47 +232,3 @@ class RtaProcesamientoRepository:
         ).first()
 
         return result.id_rta_procesamiento if result else None
-
-    def get_id_rta_procesamiento_by_id_archivo(self, id_archivo: int, nombre_archivo_zip: str) -> int:
-        """
-        Obtiene el id_rta_procesamiento de la tabla CGD_RTA_PROCESAMIENTO basado en
-        el id_archivo y nombre_archivo_zip.
-        """
-
-        result = self.db.query(CGDRtaProcesamiento.id_rta_procesamiento).filter(
-            CGDRtaProcesamiento.id_archivo == id_archivo,
-            CGDRtaProcesamiento.nombre_archivo_zip == nombre_archivo_zip).order_by(
-            CGDRtaProcesamiento.id_rta_procesamiento.desc()).first()
-
-        return result.id_rta_procesamiento if result else None
-
-    def get_last_rta_procesamiento(self, id_archivo: int):
-        """
-        Obtiene el último id_rta_procesamiento para un id_archivo dado.
-
-        Args:
-            id_archivo (int): El id_archivo para el que obtener el último id_rta_procesamiento.
-
-        Returns:
-            CGDRtaProcesamiento: El último registro de id_rta_procesamiento para el id_archivo dado.
-        """
-        # Realizamos una consulta para obtener el último id_rta_procesamiento para el id_archivo
-        last_rta_procesamiento = self.db.query(CGDRtaProcesamiento).filter(
-            CGDRtaProcesamiento.id_archivo == id_archivo
-        ).order_by(CGDRtaProcesamiento.id_rta_procesamiento.desc()).first()
-
-        return last_rta_procesamiento
-
-    # actualizar el contador de intentos de cargue
-    def update_contador_intentos_cargue(self, id_archivo: int, contador_intentos_cargue: int):
-        """
-        Actualiza el contador de intentos de cargue de una respuesta de procesamiento.
-
-        """
-        last_entry = self.get_last_rta_procesamiento(id_archivo)
-
-        last_entry.contador_intentos_cargue = contador_intentos_cargue
-
-        # Confirmamos los cambios en la base de datos
-        self.db.commit()
-        self.db.refresh(last_entry)
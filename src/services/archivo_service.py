@@ -2,24 +2,30 @@ from datetime import datetime
 
 from hamcrest import is_in
 
-from src.repositories.archivo_repository import ArchivoRepository
-from src.services.s3_service import S3Utils
+from src.repositories.archivo_repository import ArchivoRepository, ArchivoResumen
+from src.services.s3_service import S3Utils, S3ObjectNotFoundError
 from src.core.process_event import (
-    extract_filename_from_body,
-    extract_bucket_from_body,
-    extract_date_from_filename,
     create_file_id,
-    build_acg_name_if_general_file,
-    extract_and_validate_event_data,
+    SQSEventEnvelope,
+)
+from src.utils.sqs_utils import (
+    send_message_to_sqs,
+    send_message_to_sqs_with_delay,
+    change_message_visibility,
+    MAX_SQS_DELAY_SECONDS,
 )
-from src.utils.sqs_utils import delete_message_from_sqs, send_message_to_sqs, send_message_to_sqs_with_delay
 from src.core.validator import ArchivoValidator
+from src.core.archivo_context import ArchivoContext
 from src.utils.logger_utils import get_logger
 from sqlalchemy.orm import Session
+from src.services.database_service import UnitOfWork
 from src.config.config import env
 from .error_handling_service import ErrorHandlingService
 from src.repositories.archivo_estado_repository import ArchivoEstadoRepository
-from src.repositories.rta_procesamiento_repository import RtaProcesamientoRepository
+from src.repositories.rta_procesamiento_repository import (
+    RtaProcesamientoRepository,
+    ProcessingResponseNotFoundError,
+)
 from src.repositories.cgd_rta_pro_archivos_repository import CGDRtaProArchivosRepository
 from ..models.cgd_archivo import CGDArchivo
 from .cgd_rta_pro_archivo_service import CGDRtaProArchivosService
@@ -32,61 +38,167 @@ logger = get_logger(env.DEBUG_MODE)
 
 class ArchivoService:
     def __init__(self, db: Session):
+        self.db = db
+        self.unit_of_work = UnitOfWork(db)
         self.s3_utils = S3Utils(db)
         self.archivo_validator = ArchivoValidator()
         self.archivo_repository = ArchivoRepository(db)
-        self.error_handling_service = ErrorHandlingService(db)
+        # Registros de CGD_ARCHIVOS del mensaje en curso, compartidos con el manejo de errores
+        self.archivo_context = ArchivoContext()
+        self.error_handling_service = ErrorHandlingService(db, self.archivo_context)
         self.estado_archivo_repository = ArchivoEstadoRepository(db)
         self.rta_procesamiento_repository = RtaProcesamientoRepository(db)
         self.rta_pro_archivos_repository = CGDRtaProArchivosRepository(db)
         self.cgd_rta_pro_archivos_service = CGDRtaProArchivosService(db)
+        # Tamaño y eTag de los .zip informados en los eventos de S3, por nombre de archivo
+        self.object_sizes = {}
+        self.object_etags = {}
 
         # obtener parametros de reintentos
         retries_config = self.archivo_validator.get_retry_parameters(env.PARAMETER_STORE_TRANSVERSAL)
         self.max_retries = int(retries_config.get("number-retries", 5))
         self.retry_delay = int(retries_config.get("time-between-retry", 900))
 
-    def validar_y_procesar_archivo(self, event):
-        """Valida y procesa el archivo recibido."""
+    def validar_y_procesar_archivo(self, event) -> list[str]:
+        """
+        Valida y procesa todos los registros recibidos en el lote de SQS.
+        Cada registro se procesa de forma aislada, de modo que un error en uno
+        de ellos no impide el procesamiento de los demás.
+
+        :return: Lista con los 'messageId' de los registros que fallaron y deben reintentarse.
+        """
+        failed_message_ids = []
+        for record in event.get("Records", []):
+            envelope = SQSEventEnvelope(record)
+            if not self.procesar_mensaje(envelope):
+                failed_message_ids.append(envelope.message_id)
+        return failed_message_ids
+
+    def procesar_mensaje(self, envelope: SQSEventEnvelope) -> bool:
+        """
+        Procesa cada uno de los objetos de S3 notificados en un mensaje de SQS como una
+        unidad de trabajo independiente.
+
+        Si el mensaje trae varios objetos, las unidades que fallen se reenvían a la cola
+        como mensajes individuales, de modo que el reintento no repita las demás
+        unidades y el mensaje original se dé por consumido.
+
+        :return: True si el mensaje se consumió, False si debe reintentarse completo.
+        """
+        units = envelope.split()
+        if len(units) == 1:
+            return self.procesar_registro(units[0])
+
+        logger.info(f"El mensaje {envelope.message_id} contiene {len(units)} archivos.")
+        consumed = True
+        # Los archivos originales movidos por las unidades se eliminan en un solo lote
+        with self.s3_utils.batch_deletes():
+            for unit in units:
+                if self.procesar_registro(unit):
+                    continue
+                delay = min(self.retry_delay, MAX_SQS_DELAY_SECONDS)
+                if not send_message_to_sqs_with_delay(
+                        env.SQS_URL_PRO_RESPONSE_TO_PROCESS, unit.unit_body(), unit.file_name, delay
+                ):
+                    consumed = False
+        return consumed
+
+    def procesar_registro(self, envelope: SQSEventEnvelope) -> bool:
+        """
+        Valida y procesa el archivo de un único registro del lote.
+
+        :param envelope: Registro de SQS con el body ya decodificado.
+        :return: True si el registro se consumió (procesado o rechazado), False si debe reintentarse.
+        """
+        file_name, bucket, receipt_handle = None, None, None
+        self.archivo_context.clear()
         try:
-            file_name, bucket, receipt_handle, acg_nombre_archivo = self.extract_event_details(event)
+            file_name, bucket, receipt_handle, acg_nombre_archivo = self.extract_event_details(envelope)
+            if envelope.size is not None:
+                self.object_sizes[file_name] = envelope.size
+            if envelope.etag is not None:
+                self.object_etags[file_name] = envelope.etag
 
             if not self.validate_event_data(file_name, bucket, receipt_handle):
-                return
+                return True
 
             if not self.validate_file_existence_in_bucket(file_name, bucket, receipt_handle):
-                return
+                return True
 
-            if self.validate_is_reprocessing(event):
-                self._handle_reprocessing(event, file_name, bucket, receipt_handle, acg_nombre_archivo)
+            if self.validate_is_reprocessing(envelope):
+                self._handle_reprocessing(envelope, file_name, bucket, receipt_handle, acg_nombre_archivo)
             else:
                 self._handle_new_file(file_name, bucket, receipt_handle, acg_nombre_archivo)
 
-            return
+            self.unit_of_work.checkpoint(f"registro {file_name} procesado")
+            return True
+
+        except S3ObjectNotFoundError:
+            # El archivo ya no está en el bucket: mismo tratamiento que si no existiera al validar
+            self.unit_of_work.rollback()
+            self.archivo_context.clear()
+            logger.error(
+                "El archivo NO existe en el bucket ===> Se eliminara el mensaje de la cola",
+                extra={"event_filename": file_name}
+            )
+            return True
+
+        except SystemExit:
+            # Las validaciones que abortan el procesamiento solo afectan al registro actual
+            self.unit_of_work.rollback()
+            self.archivo_context.clear()
+            logger.error(
+                "Se interrumpió el procesamiento del registro; se reportará como fallido.",
+                extra={"event_filename": file_name},
+            )
+            return False
 
         except Exception:
-            self._handle_exception(event, file_name, bucket, receipt_handle)
+            # Descartar los cambios pendientes del registro fallido para no afectar al resto del lote
+            self.unit_of_work.rollback()
+            self.archivo_context.clear()
+            try:
+                consumed = self._handle_exception(envelope, file_name, bucket, receipt_handle)
+                if consumed:
+                    self.unit_of_work.checkpoint(f"registro {file_name} rechazado")
+                return consumed
+            except (Exception, SystemExit) as e:
+                logger.error(
+                    f"Error al manejar la excepción del registro; se reportará como fallido: {e}",
+                    extra={"event_filename": file_name},
+                )
+                return False
 
     # =======================================================================
     #                          FUNCIONES AUXILIARES
     # =======================================================================
 
-    def extract_event_details(self, event):
-        """Extrae los detalles del evento necesarios para el procesamiento."""
-        for record in event["Records"]:
-            receipt_handle = record.get("receiptHandle")
-            body = record.get("body", {})
-            file_name = extract_filename_from_body(body)
-            bucket_name = extract_bucket_from_body(body)
-            acg_nombre_archivo = file_name.split(".")[0]
-            return file_name, bucket_name, receipt_handle, acg_nombre_archivo
+    def get_archivo(self, acg_nombre_archivo):
+        """Obtiene el resumen del archivo en CGD_ARCHIVOS; se consulta una sola vez por mensaje."""
+        return self.archivo_context.get(
+            acg_nombre_archivo, self.archivo_repository.get_archivo_resumen_by_nombre_archivo
+        )
+
+    def parse_filename(self, file_name):
+        """Clasifica el nombre del archivo del mensaje; se evalúa una sola vez por mensaje."""
+        return self.archivo_context.get_parsed_filename(file_name, self.archivo_validator.parse_filename)
+
+    def update_estado_archivo(self, acg_nombre_archivo, estado, contador_intentos_cargue):
+        """Actualiza el estado del archivo por su ID y refleja el cambio en el contexto del mensaje."""
+        archivo = self.get_archivo(acg_nombre_archivo)
+        self.archivo_repository.update_estado_archivo_by_id(archivo.id_archivo, estado, contador_intentos_cargue)
+        self.archivo_context.set(archivo._replace(estado=estado, contador_intentos_cargue=contador_intentos_cargue))
+
+    @staticmethod
+    def extract_event_details(envelope: SQSEventEnvelope):
+        """Extrae de un registro SQS los detalles necesarios para el procesamiento."""
+        file_name = envelope.file_name
+        acg_nombre_archivo = file_name.split(".")[0] if file_name else None
+        return file_name, envelope.bucket, envelope.receipt_handle, acg_nombre_archivo
 
     def validate_event_data(self, file_name, bucket_name, receipt_handle):
         """Valida que el evento contenga el nombre del archivo y el bucket."""
         if not file_name or not bucket_name:
-            delete_message_from_sqs(
-                receipt_handle, env.SQS_URL_PRO_RESPONSE_TO_PROCESS, file_name
-            )
             logger.error(
                 "Nombre de archivo o bucket faltante en el evento; mensaje eliminado."
             )
@@ -97,16 +209,24 @@ class ArchivoService:
         return True
 
     def validate_file_existence_in_bucket(self, file_name, bucket_name, receipt_handle):
-        """Valida que el archivo exista en el bucket especificado."""
+        """
+        Valida que el archivo exista en el bucket especificado.
+        Con S3_OPTIMISTIC_EXISTENCE_CHECK se confía en los metadatos del evento de S3 y se omite
+        la consulta HEAD; si el archivo ya no existe, la copia a 'Procesando' lo detecta.
+        """
+        if env.S3_OPTIMISTIC_EXISTENCE_CHECK and file_name in self.object_etags:
+            logger.debug(
+                "Se omite la validación de existencia; se usan los metadatos del evento de S3",
+                extra={"event_filename": file_name}
+            )
+            return True
+
         file_key = f"{env.DIR_RECEPTION_FILES}/{file_name}"
         if not self.s3_utils.check_file_exists_in_s3(bucket_name, file_key):
             logger.error(
                 "El archivo NO existe en el bucket ===> Se eliminara el mensaje de la cola",
                 extra={"event_filename": file_name}
             )
-            delete_message_from_sqs(
-                receipt_handle, env.SQS_URL_PRO_RESPONSE_TO_PROCESS, file_name
-            )
             return False
         logger.debug(
             "El archivo SI existe en el bucket",
@@ -117,7 +237,7 @@ class ArchivoService:
     def process_special_file(
             self, file_name, bucket, receipt_handle, acg_nombre_archivo):
         """Proceso de manejo de archivos especiales."""
-        if self.archivo_validator.is_special_file(file_name):
+        if self.archivo_validator.is_special_file(file_name, parsed=self.parse_filename(file_name)):
             # Verificar si el archivo especial ya existe en la base de datos
             if self.check_existing_special_file(acg_nombre_archivo):
                 estado = self.validar_estado_special_file(
@@ -151,10 +271,9 @@ class ArchivoService:
             self.handle_invalid_special_file(file_name, bucket, receipt_handle)
 
     def check_existing_special_file(self, acg_nombre_archivo) -> bool:
-        """Valida si el archivo especial existe en la base de datos."""
-        exists = self.archivo_repository.check_special_file_exists(
-            acg_nombre_archivo, env.CONST_TIPO_ARCHIVO_ESPECIAL
-        )
+        """Valida si el archivo especial existe en la base de datos, con el registro ya consultado para el mensaje."""
+        archivo = self.get_archivo(acg_nombre_archivo)
+        exists = archivo is not None and archivo.tipo_archivo == env.CONST_TIPO_ARCHIVO_ESPECIAL
         if exists:
             logger.warning(
                 "El archivo especial ya existe en la base de datos",
@@ -164,7 +283,7 @@ class ArchivoService:
 
     def validar_estado_special_file(self, acg_nombre_archivo, bucket, receipt_handle):
         # obtener el estado del archivo especial desde la base de datos
-        estado = self.archivo_repository.get_archivo_by_nombre_archivo(
+        estado = self.get_archivo(
             acg_nombre_archivo
         ).estado
         file_name = acg_nombre_archivo + ".zip"
@@ -197,7 +316,7 @@ class ArchivoService:
     # pendiente eliminar y elimuinar los test correspondientes.
     def get_estado_archivo(self, acg_nombre_archivo):
         """Obtiene el estado del archivo."""
-        estado = self.archivo_repository.get_archivo_by_nombre_archivo(
+        estado = self.get_archivo(
             acg_nombre_archivo
         ).estado
         logger.debug(
@@ -207,10 +326,15 @@ class ArchivoService:
 
     def move_file_and_update_state(self, bucket, file_name, acg_nombre_archivo):
         """Mueve el archivo y actualiza su estado."""
-        new_file_key = self.s3_utils.move_file_to_procesando(bucket, file_name)
-        self.archivo_repository.update_estado_archivo(
-            acg_nombre_archivo, env.CONST_ESTADO_LOAD_RTA_PROCESSING, 0
+        new_file_key = self.s3_utils.move_file_to_procesando(
+            bucket,
+            file_name,
+            etag=self.object_etags.get(file_name),
+            size=self.object_sizes.get(file_name),
         )
+        self.update_estado_archivo(acg_nombre_archivo, env.CONST_ESTADO_LOAD_RTA_PROCESSING, 0)
+        # El archivo ya salió de 'Recibidos': su estado se confirma junto con el movimiento
+        self.unit_of_work.checkpoint(f"{file_name} movido a Procesando")
         logger.debug(
             f"Se actualiza el estado del archivo a {env.CONST_ESTADO_LOAD_RTA_PROCESSING}",
             extra={"event_filename": file_name},
@@ -219,18 +343,9 @@ class ArchivoService:
 
     def insert_file_states_and_rta_processing(self, acg_nombre_archivo, estado, file_name):
         """Inserta los estados del archivo en la base de datos."""
-        archivo_id = self.archivo_repository.get_archivo_by_nombre_archivo(
-            acg_nombre_archivo
-        ).id_archivo
-        fecha_cambio_estado = self.archivo_repository.get_archivo_by_nombre_archivo(
-            acg_nombre_archivo
-        ).fecha_recepcion
-        last_counter = (
-                self.rta_procesamiento_repository.get_last_contador_intentos_cargue(
-                    int(archivo_id)
-                )
-                + 1
-        )
+        archivo = self.get_archivo(acg_nombre_archivo)
+        archivo_id = archivo.id_archivo
+        fecha_cambio_estado = archivo.fecha_recepcion
         # Insertar en CGD_ARCHIVO_ESTADOS
         self.estado_archivo_repository.insert_estado_archivo(
             id_archivo=int(archivo_id),
@@ -243,34 +358,18 @@ class ArchivoService:
             extra={"event_filename": file_name},
         )
 
-        next_id_rta_procesamiento = self.get_next_id_rta_procesamiento(int(archivo_id))
-
-        # Insertar en CGD_RTA_PROCESAMIENTO
-        type_response = self.archivo_validator.get_type_response(file_name)
-        self.rta_procesamiento_repository.insert_rta_procesamiento(
+        # Insertar en CGD_RTA_PROCESAMIENTO; el ID y el contador se asignan en la base de datos
+        type_response = self.archivo_validator.get_type_response(file_name, parsed=self.parse_filename(file_name))
+        self.rta_procesamiento_repository.insert_next_rta_procesamiento(
             id_archivo=int(archivo_id),
-            id_rta_procesamiento=next_id_rta_procesamiento,
             nombre_archivo_zip=file_name,
             tipo_respuesta=type_response,
             estado=env.CONST_ESTADO_INICIADO,
-            contador_intentos_cargue=last_counter,
         )
         logger.debug(
             f"Se inserta la respuesta de procesamiento del archivo especial {file_name} en CGD_RTA_PROCESAMIENTO"
         )
 
-    def get_next_id_rta_procesamiento(self, id_archivo):
-        """Obtiene el siguiente id_rta_procesamiento para un id_archivo dado."""
-        # Obtener el último id_rta_procesamiento para el archivo con id_archivo dado
-        last_rta = self.rta_procesamiento_repository.get_last_rta_procesamiento(id_archivo)
-
-        # Si no existe ningún registro, empezar desde 1
-        if last_rta is None:
-            return 1
-        else:
-
-            return last_rta.id_rta_procesamiento + 1
-
     def unzip_file(
             self,
             bucket,
@@ -285,6 +384,7 @@ class ArchivoService:
         Descomprime un archivo
         """
         try:
+            file_name = new_file_key.split("/")[-1]
             destination_folder = self.s3_utils.unzip_file_in_s3(
                 bucket,
                 new_file_key,
@@ -293,8 +393,8 @@ class ArchivoService:
                 new_counter,
                 receipt_handle,
                 error_handling_service,
+                object_size=self.object_sizes.get(file_name),
             )
-            file_name = new_file_key.split("/")[-1]
 
             if destination_folder:
                 self.process_sqs_response(
@@ -303,6 +403,8 @@ class ArchivoService:
                     receipt_handle,
                     destination_folder,
                 )
+        except ProcessingResponseNotFoundError:
+            raise
         except Exception:
             logger.error(
                 f"Error al descomprimir el archivo {new_file_key} en S3",
@@ -311,31 +413,30 @@ class ArchivoService:
 
     def process_sqs_response(self, archivo_id, file_name, receipt_handle, destination_folder=None):
         """Manejo de la respuesta SQS."""
-        if self.rta_procesamiento_repository.is_estado_enviado(
-                int(archivo_id), file_name
-        ):
-            delete_message_from_sqs(
-                receipt_handle, env.SQS_URL_PRO_RESPONSE_TO_PROCESS, file_name
-            )
-        else:
-            id_rta_procesamiento = self.rta_procesamiento_repository.get_id_rta_procesamiento_by_id_archivo(
-                int(archivo_id), file_name
+        # Una sola consulta da el estado y el ID de la última respuesta del archivo ZIP
+        last_rta = self.rta_procesamiento_repository.get_latest_rta_procesamiento(
+            int(archivo_id), file_name
+        )
+        if last_rta is None:
+            # Sin respuesta de procesamiento no hay ID que enviar; el registro se reporta como fallido
+            raise ProcessingResponseNotFoundError(
+                f"No existe respuesta de procesamiento para el archivo {file_name} (ID {archivo_id})"
             )
+        if last_rta.estado != env.CONST_ESTADO_SEND:
+            # El consolidador lee la respuesta de procesamiento, que debe estar confirmada antes del envío
+            self.unit_of_work.checkpoint(f"antes de enviar {file_name} a consolidación")
             message_body = {
                 "file_id": int(archivo_id),
                 "bucket_name": env.S3_BUCKET_NAME,
                 "folder_name": destination_folder,
-                "response_processing_id": int(id_rta_procesamiento),
+                "response_processing_id": int(last_rta.id_rta_procesamiento),
             }
             send_message_to_sqs(
                 env.SQS_URL_PRO_RESPONSE_TO_CONSOLIDATE, message_body, file_name
             )
-            self.rta_procesamiento_repository.update_state_rta_procesamiento(
-                id_archivo=int(archivo_id), estado=env.CONST_ESTADO_SEND
+            self.rta_procesamiento_repository.update_state_rta_procesamiento_by_id(
+                int(archivo_id), last_rta.id_rta_procesamiento, env.CONST_ESTADO_SEND
             )
-        delete_message_from_sqs(
-            receipt_handle, env.SQS_URL_PRO_RESPONSE_TO_PROCESS, file_name
-        )
 
     def handle_invalid_special_file(self, file_name, bucket, receipt_handle):
         """Maneja archivos especiales con formato incorrecto."""
@@ -357,11 +458,12 @@ class ArchivoService:
     ):
         """Proceso de manejo de archivos generales."""
         # 1. Validar la estructura del nombre del archivo
-        if self.archivo_validator.validate_filename_structure_for_general_file(file_name):
-            # 2. Construir el acg_nombre_archivo sin el prefijo ni la extensión para poder buscarlo en la base de datos
-            acg_nombre_archivo = build_acg_name_if_general_file(acg_nombre_archivo)
+        parsed = self.parse_filename(file_name)
+        if self.archivo_validator.validate_filename_structure_for_general_file(file_name, parsed=parsed):
+            # 2. El acg_nombre_archivo sin el prefijo ni la extensión permite buscarlo en la base de datos
+            acg_nombre_archivo = parsed.acg_nombre_archivo
             # 3. Verificar si el archivo existe en la base de datos
-            if not self.archivo_repository.check_file_exists(acg_nombre_archivo):
+            if self.get_archivo(acg_nombre_archivo) is None:
                 error_message = (
                     "El archivo NO existe en la base de datos\n"
                     "===> Se eliminara el mensaje de la cola ... \n"
@@ -390,7 +492,7 @@ class ArchivoService:
                 )
 
                 # Obtener y validar el estado del archivo
-                estado_archivo = self.archivo_repository.get_archivo_by_nombre_archivo(
+                estado_archivo = self.get_archivo(
                     acg_nombre_archivo
                 ).estado
                 if not self.archivo_validator.is_valid_state(estado_archivo):
@@ -418,14 +520,15 @@ class ArchivoService:
         # Obtener la hora de Colombia (UTC-5)
         colombia_tz = timezone(timedelta(hours=-5))
         current_time = datetime.now(colombia_tz)
+        parsed = self.parse_filename(filename)
 
         new_archivo = CGDArchivo(
-            id_archivo=create_file_id(filename),
+            id_archivo=create_file_id(parsed),
             acg_nombre_archivo=acg_nombre_archivo,
             tipo_archivo=env.CONST_TIPO_ARCHIVO_ESPECIAL,
             estado=env.CONST_ESTADO_SEND,
             plataforma_origen=env.CONST_PLATAFORMA_ORIGEN,
-            fecha_nombre_archivo=extract_date_from_filename(filename),
+            fecha_nombre_archivo=parsed.fecha,
             fecha_recepcion=current_time,
             contador_intentos_cargue=0,
             contador_intentos_generacion=0,
@@ -435,6 +538,7 @@ class ArchivoService:
             fecha_ciclo=datetime.now(),
         )
         self.archivo_repository.insert_archivo(new_archivo)
+        self.archivo_context.set(ArchivoResumen.from_archivo(new_archivo))
         logger.debug(
             "Se inserta el archivo especial en la base de datos",
             extra={"event_filename": filename}
@@ -456,7 +560,7 @@ class ArchivoService:
         self.insert_file_states_and_rta_processing(acg_nombre_archivo, estado_archivo, file_name)
 
         # Descomprimir el archivo
-        archivo_id = self.archivo_repository.get_archivo_by_nombre_archivo(acg_nombre_archivo).id_archivo
+        archivo_id = self.get_archivo(acg_nombre_archivo).id_archivo
         self.unzip_file(
             bucket,
             new_file_key,
@@ -467,43 +571,41 @@ class ArchivoService:
             self.error_handling_service,
         )
 
-    def validate_is_reprocessing(self, event):
+    def validate_is_reprocessing(self, envelope: SQSEventEnvelope):
         """
         Valida si el archivo es un re-procesamiento.
         valida si en el evento se encuentra la clave is_processing con valor True.
         """
-        records_data = extract_and_validate_event_data(event, required_keys=["is_processing"])
-        for record in records_data:
-            if record.get("is_processing", False):
-                logger.warning("El archivo es un re-procesamiento.")
-                return True
+        if envelope.is_processing:
+            logger.warning("El archivo es un re-procesamiento.")
+            return True
         return False
 
-    def validate_file_id_and_response_processing_id(self, event):
+    def validate_file_id_and_response_processing_id(self, envelope: SQSEventEnvelope):
         """
         Valida si el evento contiene el file_id y el response_processing_id.
         """
-        records_data = extract_and_validate_event_data(event, required_keys=["file_id", "response_processing_id"])
-        for record in records_data:
-            file_id = record.get("file_id")
-            response_processing_id = record.get("response_processing_id")
-            # Validar explícitamente si los valores son None o inválidos
-            if not file_id or not response_processing_id:
-                logger.warning(
-                    "El evento no contiene valores válidos para file_id o response_processing_id.",
-                    extra={"file_id": file_id, "response_processing_id": response_processing_id},
-                )
-                return False
-        return bool(records_data)
+        if not envelope.has_keys("file_id", "response_processing_id"):
+            return False
+
+        file_id = envelope.file_id
+        response_processing_id = envelope.response_processing_id
+        # Validar explícitamente si los valores son None o inválidos
+        if not file_id or not response_processing_id:
+            logger.warning(
+                "El evento no contiene valores válidos para file_id o response_processing_id.",
+                extra={"file_id": file_id, "response_processing_id": response_processing_id},
+            )
+            return False
+        return True
 
-    def handle_reprocessing_with_ids(self, event, acg_nombre_archivo):
+    def handle_reprocessing_with_ids(self, envelope: SQSEventEnvelope, acg_nombre_archivo):
         """
         Maneja el re-procesamiento de un archivo que ya se encuentra registrado en la base de datos.
         """
-        records_data = extract_and_validate_event_data(event, required_keys=["file_id", "response_processing_id"])
-        for record in records_data:
-            file_id = record.get("file_id")
-            acg_nombre_archivo = build_acg_name_if_general_file(acg_nombre_archivo)
+        if envelope.has_keys("file_id", "response_processing_id"):
+            file_id = envelope.file_id
+            acg_nombre_archivo = self.parse_filename(envelope.file_name).acg_nombre_archivo
 
             # obtener el estado del archivo
             estado = self.get_estado_archivo(acg_nombre_archivo)
@@ -521,33 +623,21 @@ class ArchivoService:
             )
 
             # Actualizar el estado del archivo en CGD_ARCHIVO.
-            self.archivo_repository.update_estado_archivo(
-                acg_nombre_archivo, env.CONST_ESTADO_LOAD_RTA_PROCESSING, 0
-            )
-            last_counter = (
-                    self.rta_procesamiento_repository.get_last_contador_intentos_cargue(
-                        int(file_id)
-                    )
-                    + 1
-            )
-            # Actualizar el estado de la respuesta de procesamiento
-            self.rta_procesamiento_repository.update_state_rta_procesamiento(
+            self.update_estado_archivo(acg_nombre_archivo, env.CONST_ESTADO_LOAD_RTA_PROCESSING, 0)
+            # Reinicia la última respuesta de procesamiento e incrementa su contador en una sola sentencia
+            self.rta_procesamiento_repository.restart_last_rta_procesamiento(
                 int(file_id), env.CONST_ESTADO_INICIADO
             )
-            self.rta_procesamiento_repository.update_contador_intentos_cargue(
-                int(file_id), last_counter
-            )
 
-    def process_existing_files(self, event, receipt_handle, file_name):
+    def process_existing_files(self, envelope: SQSEventEnvelope, receipt_handle, file_name):
         """
         Procesa los archivos existentes asociados a los ID_ARCHIVO y ID_RTA_PROCESAMIENTO específicos.
 
-        :param event: Evento con los detalles de los archivos y respuestas de procesamiento.
+        :param envelope: Registro con los detalles de los archivos y respuestas de procesamiento.
         """
-        records_data = extract_and_validate_event_data(event, required_keys=["file_id", "response_processing_id"])
-        for record in records_data:
-            file_id = record.get("file_id")
-            response_processing_id = record.get("response_processing_id")
+        if envelope.has_keys("file_id", "response_processing_id"):
+            file_id = envelope.file_id
+            response_processing_id = envelope.response_processing_id
 
             # Obtener los registros asociados a los IDs
             loaded_files = self.rta_pro_archivos_repository.get_files_loaded_for_response(
@@ -561,16 +651,13 @@ class ArchivoService:
                     extra={"file_id": file_id, "response_processing_id": response_processing_id},
                 )
 
-                # Reutilizar la lógica de envío de mensajes para cada archivo encontrado
-                for file in loaded_files:
+                # Reutilizar la lógica de envío de mensajes una vez por cada ID_ARCHIVO encontrado
+                for id_archivo in dict.fromkeys(file.id_archivo for file in loaded_files):
                     self.cgd_rta_pro_archivos_service.send_pending_files_to_queue_by_id(
-                        id_archivo=file.id_archivo,
+                        id_archivo=id_archivo,
                         queue_url=env.SQS_URL_PRO_RESPONSE_TO_CONSOLIDATE,
                         destination_folder=env.DIR_PROCESSED_FILES,
                     )
-                delete_message_from_sqs(
-                    receipt_handle, env.SQS_URL_PRO_RESPONSE_TO_PROCESS, file_name
-                )
                 return True
 
     # funcion para validar si se lograron descomprimir los archivos
@@ -592,18 +679,18 @@ class ArchivoService:
     # ==========================================================================
     #                    FUNCIONES PRIVADAS AUXILIARES
     # ==========================================================================
-    def _handle_reprocessing(self, event, file_name, bucket, receipt_handle, acg_nombre_archivo):
+    def _handle_reprocessing(self, envelope: SQSEventEnvelope, file_name, bucket, receipt_handle, acg_nombre_archivo):
         """Maneja el reprocesamiento de archivos."""
-        if self.validate_file_id_and_response_processing_id(event):
+        if self.validate_file_id_and_response_processing_id(envelope):
             logger.debug("*** El archivo es un re-procesamiento y ya se encuentra registrado en la base de datos.***")
-            self.handle_reprocessing_with_ids(event, acg_nombre_archivo)
+            self.handle_reprocessing_with_ids(envelope, acg_nombre_archivo)
 
-            if self.process_existing_files(event, receipt_handle, file_name):
+            if self.process_existing_files(envelope, receipt_handle, file_name):
                 return
 
             if not self.validate_unzip_files(bucket, file_name):
                 new_file_key = self.move_file_and_update_state(bucket, file_name, acg_nombre_archivo)
-                archivo_id = self.archivo_repository.get_archivo_by_nombre_archivo(acg_nombre_archivo).id_archivo
+                archivo_id = self.get_archivo(acg_nombre_archivo).id_archivo
 
                 self.unzip_file(
                     bucket,
@@ -619,37 +706,44 @@ class ArchivoService:
 
     def _handle_new_file(self, file_name, bucket, receipt_handle, acg_nombre_archivo):
         """Maneja el procesamiento de archivos nuevos."""
-        if self.archivo_validator.is_special_prefix(file_name):
+        if self.parse_filename(file_name).tipo_respuesta == env.CONST_TIPO_ARCHIVO_ESPECIAL:
             self.process_special_file(file_name, bucket, receipt_handle, acg_nombre_archivo)
         else:
             self.process_general_file(file_name, bucket, receipt_handle, acg_nombre_archivo)
 
-    def _handle_exception(self, event, file_name, bucket, receipt_handle):
-        """Maneja las excepciones y reintentos."""
-        retry_count = event.get("retry_count", 0) + 1
+    def _handle_exception(self, envelope: SQSEventEnvelope, file_name, bucket, receipt_handle) -> bool:
+        """
+        Maneja las excepciones y reintentos del registro.
+        Mientras no se supere el número máximo de reintentos, el registro se reporta como
+        fallido y su reintento se difiere ampliando la visibilidad del mensaje en la cola.
+        Las unidades de un mensaje con varios objetos se reenvían con retraso como mensajes
+        propios, por lo que no cambian la visibilidad del mensaje original que comparten.
+
+        :return: True si el registro se da por consumido, False si debe reintentarse.
+        """
+        retry_count = envelope.receive_count
 
         if retry_count < self.max_retries:
-            logger.info("Reenviando mensaje a la cola con un retraso de 15 minutos.")
-            new_message = {**event, "retry_count": retry_count}
-            send_message_to_sqs_with_delay(
-                queue_url=env.SQS_URL_PRO_RESPONSE_TO_PROCESS,
-                message_body=new_message,
-                filename=file_name,
-                delay_seconds=900,
-            )
-        else:
-            logger.error(
-                "Error al procesar el archivo; se superó el número máximo de reintentos.",
+            logger.info(
+                f"El registro se reintentará con un retraso de {self.retry_delay} segundos.",
                 extra={"event_filename": file_name},
             )
-            self.error_handling_service.handle_error_master(
-                id_plantilla=env.CONST_ID_PLANTILLA_EMAIL,
-                filekey=f"{env.DIR_RECEPTION_FILES}/{file_name}",
-                bucket=bucket,
-                receipt_handle=receipt_handle,
-                codigo_error=env.CONST_COD_ERROR_TECHNICAL,
-                filename=file_name,
-            )
+            if receipt_handle and not envelope.is_split_unit:
+                change_message_visibility(
+                    receipt_handle, env.SQS_URL_PRO_RESPONSE_TO_PROCESS, file_name, self.retry_delay
+                )
+            return False
 
-        if receipt_handle:
-            delete_message_from_sqs(receipt_handle, env.SQS_URL_PRO_RESPONSE_TO_PROCESS, file_name)
+        logger.error(
+            "Error al procesar el archivo; se superó el número máximo de reintentos.",
+            extra={"event_filename": file_name},
+        )
+        self.error_handling_service.handle_error_master(
+            id_plantilla=env.CONST_ID_PLANTILLA_EMAIL,
+            filekey=f"{env.DIR_RECEPTION_FILES}/{file_name}",
+            bucket=bucket,
+            receipt_handle=receipt_handle,
+            codigo_error=env.CONST_COD_ERROR_TECHNICAL,
+            filename=file_name,
+        )
+        return True
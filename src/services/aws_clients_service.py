@@ -1,19 +1,29 @@
 import json
 import os
+import threading
 import boto3
 from botocore.exceptions import ClientError
 from src.utils.logger_utils import get_logger
 from src.utils.singleton import SingletonMeta
+from src.utils.ttl_cache import TTLCache
 from src.config.config import env
 
 logger = get_logger(env.DEBUG_MODE)
 
+# Caché de configuración remota (Parameter Store y Secrets Manager) compartida por el contenedor
+remote_config_cache = TTLCache(
+    ttl_seconds=env.PARAMETER_CACHE_TTL_SECONDS,
+    stale_seconds=env.PARAMETER_CACHE_STALE_SECONDS,
+)
+
 
 class AWSClients(metaclass=SingletonMeta):
     _ssm_client = None
     _secrets_client = None
     _s3_client = None
     _sqs_client = None
+    # boto3 no garantiza que la creación de clientes desde la sesión por defecto sea segura entre hilos
+    _client_lock = threading.Lock()
 
     @classmethod
     def get_secrets_manager_client(cls):
@@ -46,11 +56,12 @@ class AWSClients(metaclass=SingletonMeta):
             endpoint_url = "http://localhost:4566"
             logger.debug("Conectando a LocalStack para servicio: %s", service_name)
 
-        return boto3.client(
-            service_name,
-            region_name="us-east-1",
-            endpoint_url=endpoint_url
-        )
+        with AWSClients._client_lock:
+            return boto3.client(
+                service_name,
+                region_name="us-east-1",
+                endpoint_url=endpoint_url
+            )
 
     @staticmethod
     def get_secret(secret_name: str) -> dict:
@@ -75,3 +86,40 @@ class AWSClients(metaclass=SingletonMeta):
         except ClientError as e:
             logger.error("Error al obtener el parámetro %s: %s", parameter_name, e)
             return ""
+
+    @staticmethod
+    def get_cached_parameter(parameter_name: str, force_refresh: bool = False) -> str:
+        """
+        Obtiene el valor de un parámetro de Parameter Store a través de la caché de configuración.
+        Los errores de SSM no se almacenan en caché y se propagan como ClientError.
+
+        :param parameter_name: Nombre del parámetro.
+        :param force_refresh: Si es True, ignora el valor en caché y lo consulta de nuevo.
+        """
+
+        def load_parameter():
+            client = AWSClients.get_ssm_client()
+            parameter_response = client.get_parameter(Name=parameter_name, WithDecryption=True)
+            logger.debug("Parámetro obtenido desde Parameter Store: %s", parameter_name)
+            return parameter_response["Parameter"]["Value"]
+
+        return remote_config_cache.get(("parameter", parameter_name), load_parameter, force_refresh)
+
+    @staticmethod
+    def get_cached_secret(secret_name: str, force_refresh: bool = False) -> dict:
+        """
+        Obtiene un secreto de Secrets Manager a través de la caché de configuración.
+        Los errores de Secrets Manager no se almacenan en caché y se propagan como ClientError.
+
+        :param secret_name: Nombre del secreto.
+        :param force_refresh: Si es True, ignora el valor en caché y lo consulta de nuevo,
+            por ejemplo tras un fallo de autenticación por rotación de credenciales.
+        """
+
+        def load_secret():
+            client = AWSClients.get_secrets_manager_client()
+            get_secret_value_response = client.get_secret_value(SecretId=secret_name)
+            logger.debug("Secreto obtenido desde Secrets Manager: %s", secret_name)
+            return json.loads(get_secret_value_response["SecretString"])
+
+        return remote_config_cache.get(("secret", secret_name), load_secret, force_refresh)
@@ -1,9 +1,9 @@
 from sqlalchemy.orm import Session
-from src.models.cgd_rta_pro_archivos import CGDRtaProArchivos
 from src.utils.logger_utils import get_logger
 from src.config.config import env
 from src.repositories.cgd_rta_pro_archivos_repository import CGDRtaProArchivosRepository
-from src.utils.sqs_utils import send_message_to_sqs
+from src.services.database_service import UnitOfWork
+from src.utils.sqs_utils import send_messages_to_sqs_in_batches
 
 logger = get_logger(env.DEBUG_MODE)
 
@@ -15,6 +15,7 @@ class CGDRtaProArchivosService:
 
     def __init__(self, db: Session):
         self.db = db
+        self.unit_of_work = UnitOfWork(db)
         self.cgd_rta_pro_archivos_repository = CGDRtaProArchivosRepository(db)
 
     def register_extracted_files(
@@ -24,21 +25,22 @@ class CGDRtaProArchivosService:
             extracted_files: list[str],
     ):
         """
-        Registra los archivos descomprimidos en la tabla CGD_RTA_PRO_ARCHIVOS.
+        Registra los archivos descomprimidos en la tabla CGD_RTA_PRO_ARCHIVOS con una sola sentencia.
         """
+        new_entries = []
         for file_name in extracted_files:
             tipo_archivo_rta = file_name.rsplit("-", 1)[-1].replace(".txt", "")
             nombre_archivo_txt = file_name.split("/")[-1]
 
-            new_entry = CGDRtaProArchivos(
-                id_archivo=id_archivo,
-                id_rta_procesamiento=id_rta_procesamiento,
-                nombre_archivo=nombre_archivo_txt,
-                tipo_archivo_rta=tipo_archivo_rta,
-                estado=env.CONST_ESTADO_INIT_PENDING,
-                contador_intentos_cargue=0,
-            )
-            self.cgd_rta_pro_archivos_repository.insert(new_entry)
+            new_entries.append({
+                "id_archivo": id_archivo,
+                "id_rta_procesamiento": id_rta_procesamiento,
+                "nombre_archivo": nombre_archivo_txt,
+                "tipo_archivo_rta": tipo_archivo_rta,
+                "estado": env.CONST_ESTADO_INIT_PENDING,
+                "contador_intentos_cargue": 0,
+            })
+        self.cgd_rta_pro_archivos_repository.insert_many(new_entries)
 
         logger.info("Archivos descomprimidos registrados en CGD_RTA_PRO_ARCHIVOS")
 
@@ -50,18 +52,32 @@ class CGDRtaProArchivosService:
         :param queue_url: La URL de la cola SQS donde se enviarán los mensajes.
         :param destination_folder: La carpeta de destino donde se moverán los archivos.
         """
+        # Los consumidores de la cola leen estos registros: se confirman antes de publicar los mensajes
+        self.unit_of_work.checkpoint(f"antes de publicar los archivos del ID {id_archivo}")
         pending_files = self.cgd_rta_pro_archivos_repository.get_pending_files_by_id_archivo(id_archivo)
 
-        for file in pending_files:
-            message_body = {
-                "bucket_name": env.S3_BUCKET_NAME,
-                "folder_name": destination_folder.rstrip("/"),
-                "file_name": file.nombre_archivo,
-                "file_id": int(file.id_archivo),
-                "response_processing_id": int(file.id_rta_procesamiento),
-            }
-            send_message_to_sqs(queue_url, message_body, file.nombre_archivo)
+        messages = [
+            (
+                {
+                    "bucket_name": env.S3_BUCKET_NAME,
+                    "folder_name": destination_folder.rstrip("/"),
+                    "file_name": file.nombre_archivo,
+                    "file_id": int(file.id_archivo),
+                    "response_processing_id": int(file.id_rta_procesamiento),
+                },
+                file.nombre_archivo,
+            )
+            for file in pending_files
+        ]
+        results = send_messages_to_sqs_in_batches(queue_url, messages)
 
-            self.cgd_rta_pro_archivos_repository.update_estado_to_enviado(file.id_archivo, file.nombre_archivo)
+        # Solo los archivos cuyo mensaje se envió pasan a 'ENVIADO'
+        sent_files = []
+        for file, sent in zip(pending_files, results):
+            if sent:
+                sent_files.append(file.nombre_archivo)
+            else:
+                logger.error(f"No se envió el mensaje del archivo {file.nombre_archivo}; se mantiene su estado.")
+        self.cgd_rta_pro_archivos_repository.update_estados_to_enviado(id_archivo, sent_files)
 
         logger.debug(f"Estado actualizado a 'ENVIADO' para archivo con ID {id_archivo}")
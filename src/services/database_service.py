@@ -1,7 +1,11 @@
+import threading
+import time
 from contextlib import contextmanager
+from sqlalchemy import event, func, select
 from sqlalchemy.engine import create_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import DisconnectionError, SQLAlchemyError
+from sqlalchemy.pool import NullPool, QueuePool
 from sqlalchemy.orm.session import Session
 from src.services.aws_clients_service import AWSClients
 from dotenv import load_dotenv
@@ -9,6 +13,11 @@ from src.config.config import env
 from src.utils.logger_utils import get_logger
 from src.utils.singleton import SingletonMeta
 from src.models.base import Base
+from src.models import (  # noqa: F401 - registra todas las tablas en Base.metadata
+    cgd_archivo, cgd_correo_parametro, cgd_correos_plantilla, cgd_error_catalogo, cgd_rta_pro_archivos,
+    cgd_rta_procesamiento,
+)
+from src.models.cgd_schema_version import CGDSchemaVersion, SCHEMA_VERSION
 
 # Carga las variables de entorno
 load_dotenv()
@@ -16,6 +25,188 @@ load_dotenv()
 logger = get_logger(env.DEBUG_MODE)
 
 
+def is_authentication_error(error: Exception) -> bool:
+    """
+    Indica si un error de conexión a la base de datos se debe a credenciales inválidas,
+    por ejemplo tras la rotación del secreto.
+    """
+    return "authentication failed" in str(error).lower()
+
+
+class PoolCheckoutMetrics:
+    """
+    Métricas del tiempo de espera al obtener conexiones del pool, acumuladas hasta su registro en el log.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Reinicia las métricas acumuladas.
+        """
+        self.checkouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, wait_seconds: float):
+        """
+        Registra la espera de una conexión obtenida del pool.
+
+        :param wait_seconds: Segundos que tardó la obtención de la conexión.
+        """
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_seconds += wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """
+        Obtiene las métricas acumuladas.
+
+        :param reset: Si es True, reinicia las métricas después de leerlas.
+        :return: Diccionario con el número de conexiones obtenidas y las esperas total y máxima.
+        """
+        with self._lock:
+            metrics = {
+                "checkouts": self.checkouts,
+                "total_wait_seconds": self.total_wait_seconds,
+                "max_wait_seconds": self.max_wait_seconds,
+            }
+            if reset:
+                self.reset()
+        return metrics
+
+
+pool_checkout_metrics = PoolCheckoutMetrics()
+
+
+class _TimedCheckoutMixin:
+    """
+    Mide en pool_checkout_metrics el tiempo que tarda cada obtención de conexión del pool,
+    incluida la apertura de conexiones nuevas.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_metrics.record(time.perf_counter() - start)
+
+
+class TimedNullPool(_TimedCheckoutMixin, NullPool):
+    pass
+
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+def get_pool_options(strategy: str) -> dict:
+    """
+    Obtiene los argumentos del pool de conexiones para create_engine según la estrategia configurada.
+
+    - null: sin pool propio; cada sesión abre y cierra su conexión. Para usar detrás de un
+      pooler externo como RDS Proxy o PgBouncer.
+    - single: una conexión persistente por contenedor, con conexiones adicionales solo para los
+      registros procesados en paralelo, y reciclada tras DB_POOL_RECYCLE_SECONDS.
+    - queue: pool de DB_POOL_SIZE conexiones más DB_MAX_OVERFLOW adicionales.
+
+    :param strategy: Estrategia del pool (null | single | queue).
+    :return: Argumentos del pool para create_engine.
+    """
+    strategy = strategy.lower()
+    if strategy == "null":
+        return {"poolclass": TimedNullPool}
+    if strategy == "single":
+        return {
+            "poolclass": TimedQueuePool,
+            "pool_size": 1,
+            "max_overflow": max(0, env.MAX_CONCURRENT_RECORDS - 1),
+            "pool_recycle": env.DB_POOL_RECYCLE_SECONDS,
+        }
+    if strategy == "queue":
+        return {
+            "poolclass": TimedQueuePool,
+            "pool_size": env.DB_POOL_SIZE,
+            "max_overflow": env.DB_MAX_OVERFLOW,
+            "pool_recycle": env.DB_POOL_RECYCLE_SECONDS,
+        }
+    raise ValueError(f"Estrategia de pool de conexiones no soportada: {strategy}")
+
+
+def mark_connection_idle(dbapi_connection, connection_record):
+    """
+    Registra el momento en que la conexión vuelve al pool.
+    """
+    connection_record.info["idle_since"] = time.monotonic()
+
+
+def ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+    """
+    Valida con SELECT 1 la conexión que estuvo inactiva en el pool al menos
+    DB_POOL_PRE_PING_IDLE_SECONDS; las conexiones usadas recientemente no hacen el viaje adicional.
+    Si la conexión ya no es válida, el pool la descarta y obtiene otra.
+    """
+    idle_since = connection_record.info.get("idle_since")
+    if idle_since is None or time.monotonic() - idle_since < env.DB_POOL_PRE_PING_IDLE_SECONDS:
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("SELECT 1")
+    except Exception as e:
+        logger.warning("Conexión inactiva del pool descartada: %s", e)
+        raise DisconnectionError(str(e)) from e
+    finally:
+        cursor.close()
+
+
+def bootstrap_schema(engine) -> None:
+    """
+    Crea las tablas e índices que falten y registra la versión del esquema. Se ejecuta de forma
+    explícita (bootstrap_db.py), no en el arranque de la Lambda.
+
+    :param engine: Engine de la base de datos.
+    """
+    Base.metadata.create_all(engine)
+    # create_all solo crea los índices de las tablas nuevas; los de tablas existentes se crean aparte
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+    with engine.begin() as conn:
+        current = conn.execute(select(func.max(CGDSchemaVersion.version))).scalar()
+        if current is None or current < SCHEMA_VERSION:
+            conn.execute(CGDSchemaVersion.__table__.insert().values(version=SCHEMA_VERSION))
+    logger.info(f"Esquema de base de datos en la versión {SCHEMA_VERSION}")
+
+
+def check_schema_version(engine) -> bool:
+    """
+    Verifica con una sola consulta que la base de datos tenga la versión de esquema que esperan
+    los modelos. No crea ni modifica tablas; si la versión no coincide, solo lo registra en el log.
+
+    :param engine: Engine de la base de datos.
+    :return: True si el esquema está en la versión esperada o en una posterior, False en caso contrario.
+    """
+    try:
+        with engine.connect() as conn:
+            current = conn.execute(select(func.max(CGDSchemaVersion.version))).scalar()
+    except SQLAlchemyError as e:
+        logger.warning(f"No fue posible verificar la versión del esquema; ejecute bootstrap_db.py: {e}")
+        return False
+
+    if current is None or current < SCHEMA_VERSION:
+        logger.warning(
+            f"El esquema de la base de datos está en la versión {current} y se esperaba la "
+            f"{SCHEMA_VERSION}; ejecute bootstrap_db.py"
+        )
+        return False
+    return True
+
+
 class DataAccessLayer(metaclass=SingletonMeta):
     """
     Clase para manejar la conexión a la base de datos
@@ -28,7 +219,7 @@ class DataAccessLayer(metaclass=SingletonMeta):
         las otras credenciales de la base de datos se obtienen de las variables de entorno.
         """
         try:
-            secrets = AWSClients.get_secret(env.SECRETS_DB)
+            secrets = AWSClients.get_cached_secret(env.SECRETS_DB)
             db_user = secrets.get("USERNAME")
             db_password = secrets.get("PASSWORD")
             db_host = env.DB_HOST
@@ -38,26 +229,47 @@ class DataAccessLayer(metaclass=SingletonMeta):
             sql_database_url = f'postgresql+psycopg2://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}'
             self.engine = create_engine(
                 sql_database_url,
-                pool_pre_ping=True,
-                pool_size=5,
-                max_overflow=10
+                **get_pool_options(env.DB_POOL_STRATEGY)
             )
+            event.listen(self.engine, "do_connect", self._connect_with_current_credentials)
+            event.listen(self.engine, "checkin", mark_connection_idle)
+            event.listen(self.engine, "checkout", ping_if_idle)
 
-            self.session: Session = sessionmaker(
+            self.session_factory = sessionmaker(
                 autocommit=False,
                 autoflush=False,
                 bind=self.engine,
                 expire_on_commit=False
-            )()
+            )
+            self.session: Session = self.session_factory()
 
-            # create tables
-            Base.metadata.create_all(self.engine)
+            # El esquema se crea con bootstrap_db.py; en el arranque solo se verifica su versión
+            if env.DB_SCHEMA_VERSION_CHECK:
+                check_schema_version(self.engine)
 
             logger.info("Conexión a la base de datos establecida")
         except Exception as e:
             logger.error("Error al establecer la conexión a la base de datos: %s", e)
             raise
 
+    @staticmethod
+    def _connect_with_current_credentials(dialect, conn_rec, cargs, cparams):
+        """
+        Abre cada nueva conexión del pool con las credenciales vigentes en la caché de secretos.
+        Si la autenticación falla, refresca el secreto desde Secrets Manager y reintenta una vez.
+        """
+        secrets = AWSClients.get_cached_secret(env.SECRETS_DB)
+        cparams.update(user=secrets.get("USERNAME"), password=secrets.get("PASSWORD"))
+        try:
+            return dialect.connect(*cargs, **cparams)
+        except Exception as e:
+            if not is_authentication_error(e):
+                raise
+            logger.warning("Falló la autenticación en la base de datos; se refrescan las credenciales.")
+            secrets = AWSClients.get_cached_secret(env.SECRETS_DB, force_refresh=True)
+            cparams.update(user=secrets.get("USERNAME"), password=secrets.get("PASSWORD"))
+            return dialect.connect(*cargs, **cparams)
+
     @contextmanager
     def session_scope(self):
         """
@@ -73,8 +285,66 @@ class DataAccessLayer(metaclass=SingletonMeta):
         finally:
             session.close()
 
+    @contextmanager
+    def new_session_scope(self):
+        """
+        Maneja el ciclo de vida de una sesión nueva e independiente, obtenida del pool
+        de conexiones del engine. Pensada para los hilos que procesan registros en paralelo.
+        """
+        session = self.session_factory()
+        try:
+            yield session
+            session.commit()
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    @staticmethod
+    def log_pool_metrics():
+        """
+        Registra en el log las métricas de espera del pool de conexiones y las reinicia.
+        """
+        metrics = pool_checkout_metrics.snapshot(reset=True)
+        logger.debug(
+            f"Pool de conexiones ({env.DB_POOL_STRATEGY}): {metrics['checkouts']} conexiones obtenidas, "
+            f"espera total {metrics['total_wait_seconds']:.3f}s, espera máxima {metrics['max_wait_seconds']:.3f}s"
+        )
+        return metrics
+
     def close_session(self):
         """
         Cierra la sesión
         """
         self.session.close()
+
+
+class UnitOfWork:
+    """
+    Unidad de trabajo sobre una sesión de base de datos. Los repositorios solo envían sus
+    cambios con flush y la confirmación se realiza en los puntos de control del procesamiento
+    de cada archivo, en lugar de una confirmación por sentencia.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def checkpoint(self, reason: str):
+        """
+        Confirma los cambios pendientes de la sesión.
+
+        :param reason: Descripción del punto de control, para el log.
+        """
+        try:
+            self.session.commit()
+            logger.debug(f"Punto de control confirmado: {reason}")
+        except SQLAlchemyError:
+            self.session.rollback()
+            raise
+
+    def rollback(self):
+        """
+        Descarta los cambios pendientes desde el último punto de control.
+        """
+        self.session.rollback()
@@ -1,11 +1,13 @@
 from src.repositories.catalogo_error_repository import CatalogoErrorRepository
 from src.repositories.correo_parametro_repository import CorreoParametroRepository
-from src.utils.sqs_utils import send_message_to_sqs, build_email_message, delete_message_from_sqs
+from src.utils.sqs_utils import send_message_to_sqs, build_email_message
 from src.services.s3_service import S3Utils
 from src.utils.logger_utils import get_logger
 from src.config.config import env
 from sqlalchemy.orm import Session
 from src.core.validator import ArchivoValidator
+from src.core.archivo_context import ArchivoContext
+from src.services.database_service import UnitOfWork
 from src.repositories.rta_procesamiento_repository import RtaProcesamientoRepository
 from src.repositories.archivo_repository import ArchivoRepository
 
@@ -13,13 +15,15 @@ logger = get_logger(env.DEBUG_MODE)
 
 
 class ErrorHandlingService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, archivo_context: ArchivoContext = None):
+        self.unit_of_work = UnitOfWork(db)
         self.catalogo_error_repository = CatalogoErrorRepository(db)
         self.correo_parametro_repository = CorreoParametroRepository(db)
         self.s3_utils = S3Utils(db)
         self.archivo_validator = ArchivoValidator()
         self.rta_procesamiento_repository = RtaProcesamientoRepository(db)
         self.archivo_repository = ArchivoRepository(db)
+        self.archivo_context = archivo_context or ArchivoContext()
 
     def handle_error_master(
             self,
@@ -32,7 +36,6 @@ class ErrorHandlingService:
         """
         Realiza el manejo completo de un error de archivo:
         - Mueve el archivo a 'rechazados'
-        - Elimina el mensaje de la cola
         - Válida que el archivo no esté en estado 'procesado'
         - Envía un mensaje de error a la cola de SQS "emails-to-send"
         - Registra el error en el log.
@@ -41,15 +44,9 @@ class ErrorHandlingService:
         #            MOVER EL ARCHIVO A LA CARPETA DE RECHAZADOS
         # ================================================================
         self.s3_utils.move_file_to_rechazados(bucket, filekey)
+        # El archivo ya salió de su carpeta: el estado de rechazo se confirma junto con el movimiento
+        self.unit_of_work.checkpoint(f"{filename} movido a Rechazados")
 
-        # ================================================
-        #            ELIMINAR EL MENSAJE DE LA COLA
-        # ================================================
-        delete_message_from_sqs(
-            queue_url=env.SQS_URL_PRO_RESPONSE_TO_PROCESS,
-            receipt_handle=receipt_handle,
-            filename=filename
-        )
         # Obtener datos del error
         error = self.catalogo_error_repository.get_error_by_code(codigo_error)
         if not error:
@@ -102,11 +99,16 @@ class ErrorHandlingService:
         )
 
         # Actualiza el estado del archivo a PROCESAMIENTO_RECHAZADO
-        self.archivo_repository.update_estado_archivo(
-            file_name,
+        self.archivo_repository.update_estado_archivo_by_id(
+            id_archivo,
             env.CONST_ESTADO_PROCESAMIENTO_RECHAZADO,
             contador_intentos_cargue=contador_intentos_cargue,
         )
+        self.archivo_context.update(
+            file_name,
+            estado=env.CONST_ESTADO_PROCESAMIENTO_RECHAZADO,
+            contador_intentos_cargue=contador_intentos_cargue,
+        )
 
         # Llama a handle_error_master para enviar el mensaje de error
         self.handle_error_master(
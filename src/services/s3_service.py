@@ -1,7 +1,11 @@
+import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from io import BytesIO
-from zipfile import ZipFile, BadZipFile
+from typing import NamedTuple
+from zipfile import ZipFile, ZipInfo, BadZipFile
 from botocore.exceptions import ClientError
 from src.services.aws_clients_service import AWSClients
 from src.utils.logger_utils import get_logger
@@ -11,6 +15,48 @@ from sqlalchemy.orm import Session
 from src.repositories.archivo_repository import ArchivoRepository
 from src.core.validator import ArchivoValidator
 from src.services.cgd_rta_pro_archivo_service import CGDRtaProArchivosService
+from src.services.database_service import UnitOfWork
+from boto3.s3.transfer import TransferConfig
+from src.utils.s3_stream_utils import (
+    open_s3_object_stream,
+    open_s3_object_on_disk,
+    build_bounded_transfer_config,
+)
+
+ZIP_EXTRACTION_MODE_MEMORY = "memory"
+ZIP_EXTRACTION_MODE_STREAM = "stream"
+ZIP_EXTRACTION_MODE_DISK = "disk"
+ZIP_EXTRACTION_MODE_AUTO = "auto"
+
+# Tamaño máximo de un objeto que se puede copiar con una sola llamada a copy_object
+S3_MAX_COPY_OBJECT_SIZE = 5 * 1024 * 1024 * 1024
+# Máximo de claves por llamada a delete_objects
+S3_MAX_DELETE_OBJECTS = 1000
+# Códigos de error de una copia cuyo origen no existe o no coincide con el eTag esperado
+S3_NOT_FOUND_ERROR_CODES = ("NoSuchKey", "404", "PreconditionFailed", "412")
+
+
+class S3ObjectNotFoundError(Exception):
+    """
+    Excepción lanzada cuando el objeto de origen de una operación en S3 no existe.
+    """
+
+    def __init__(self, bucket_name: str, key: str):
+        self.bucket_name = bucket_name
+        self.key = key
+        super().__init__(f"El objeto {key} no existe en el bucket {bucket_name}.")
+
+
+class ZipManifestEntry(NamedTuple):
+    """
+    Datos de un archivo contenido en el .zip, obtenidos del directorio central sin descomprimirlo.
+    """
+    filename: str
+    key: str
+    file_size: int
+    crc: int
+    suffix: str
+    info: ZipInfo
 
 
 class S3Utils:
@@ -22,10 +68,13 @@ class S3Utils:
     def __init__(self, db: Session):
         self.s3 = AWSClients.get_s3_client()
         self.logger = get_logger(env.DEBUG_MODE)
+        self.unit_of_work = UnitOfWork(db)
         self.rta_procesamiento_repository = RtaProcesamientoRepository(db)
         self.archivo_repository = ArchivoRepository(db)
         self.validator = ArchivoValidator()
         self.cgd_rta_pro_archivos_service = CGDRtaProArchivosService(db)
+        self._defer_deletes = False
+        self._pending_deletes = {}
 
     def check_file_exists_in_s3(self, bucket_name: str, file_key: str) -> bool:
         """
@@ -39,6 +88,90 @@ class S3Utils:
                 return False
             raise
 
+    def move_object(self, bucket_name: str, source_key: str, destination_key: str,
+                    etag: str = None, size: int = None) -> str:
+        """
+        Mueve un objeto dentro del bucket con una copia del lado del servidor seguida de la
+        eliminación del origen. La copia falla si el origen no existe (o si no coincide con el
+        eTag indicado), por lo que no se requiere una consulta HEAD previa. Los objetos de más
+        de 5 GB se copian con una copia multiparte administrada.
+
+        :param bucket_name: El nombre del bucket de S3.
+        :param source_key: La clave del objeto de origen.
+        :param destination_key: La clave de destino.
+        :param etag: eTag del objeto según el evento de S3; si se indica, la copia es condicional.
+        :param size: Tamaño del objeto según el evento de S3.
+        :return: La clave de destino.
+        :raises S3ObjectNotFoundError: Si el objeto de origen no existe o cambió.
+        """
+        copy_source = {'Bucket': bucket_name, 'Key': source_key}
+        copy_args = {'CopySourceIfMatch': etag} if etag else {}
+
+        try:
+            if size is not None and size > S3_MAX_COPY_OBJECT_SIZE:
+                self.copy_large_object(copy_source, bucket_name, destination_key, copy_args)
+            else:
+                try:
+                    self.s3.copy_object(Bucket=bucket_name, CopySource=copy_source, Key=destination_key, **copy_args)
+                except ClientError as e:
+                    # copy_object no admite objetos de más de 5 GB
+                    if e.response['Error']['Code'] != "InvalidRequest":
+                        raise
+                    self.copy_large_object(copy_source, bucket_name, destination_key, copy_args)
+        except ClientError as e:
+            if e.response['Error']['Code'] in S3_NOT_FOUND_ERROR_CODES:
+                raise S3ObjectNotFoundError(bucket_name, source_key) from e
+            raise
+
+        if self._defer_deletes:
+            self._pending_deletes.setdefault(bucket_name, []).append(source_key)
+        else:
+            self.s3.delete_object(Bucket=bucket_name, Key=source_key)
+        return destination_key
+
+    def copy_large_object(self, copy_source: dict, bucket_name: str, destination_key: str, copy_args: dict):
+        """
+        Copia un objeto con la copia multiparte administrada de boto3 (UploadPartCopy).
+        """
+        self.s3.copy(copy_source, bucket_name, destination_key, ExtraArgs=copy_args or None)
+
+    @contextmanager
+    def batch_deletes(self):
+        """
+        Acumula las eliminaciones de origen de move_object dentro del bloque y las envía al
+        final con delete_objects.
+        """
+        self._defer_deletes = True
+        try:
+            yield
+        finally:
+            self._defer_deletes = False
+            self.flush_pending_deletes()
+
+    def flush_pending_deletes(self) -> list:
+        """
+        Elimina los objetos de origen acumulados, en lotes de hasta 1000 claves por llamada.
+
+        :return: Lista de claves que no se pudieron eliminar.
+        """
+        failed_keys = []
+        pending_deletes, self._pending_deletes = self._pending_deletes, {}
+        for bucket_name, keys in pending_deletes.items():
+            for start in range(0, len(keys), S3_MAX_DELETE_OBJECTS):
+                batch = keys[start:start + S3_MAX_DELETE_OBJECTS]
+                try:
+                    response = self.s3.delete_objects(
+                        Bucket=bucket_name,
+                        Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True},
+                    )
+                    failed_keys.extend(error['Key'] for error in response.get('Errors', []))
+                except ClientError as e:
+                    self.logger.error(f"Error al eliminar los archivos originales en lote: {e}")
+                    failed_keys.extend(batch)
+        if failed_keys:
+            self.logger.error(f"No se pudieron eliminar los archivos originales: {failed_keys}")
+        return failed_keys
+
     def move_file_to_rechazados(self, bucket_name: str, source_key: str) -> str:
         """
         Mueve el archivo a la carpeta 'Rechazados/AAAAMM/' dentro del mismo bucket,
@@ -49,35 +182,28 @@ class S3Utils:
         year_month_folder = current_date.strftime("%Y%m")
         destination_key = f"{env.DIR_REJECTED_FILES}/{year_month_folder}/{source_key.rsplit('/', 1)[-1]}"
 
-        # Verificar si el archivo existe antes de moverlo
-        if not self.check_file_exists_in_s3(bucket_name, source_key):
-            self.logger.error(
-                f"El archivo {source_key} no existe en el bucket {bucket_name}. No se puede mover a Rechazados.",
-                extra={"event_filename": source_key.replace(env.DIR_RECEPTION_FILES + "/", "")})
-            sys.exit(1)
-
         try:
-            self.s3.copy_object(
-                Bucket=bucket_name,
-                CopySource={'Bucket': bucket_name, 'Key': source_key},
-                Key=destination_key
-            )
+            self.move_object(bucket_name, source_key, destination_key)
             self.logger.debug("Archivo movido a la carpeta Rechazados",
                               extra={"event_filename": source_key.replace(env.DIR_RECEPTION_FILES + "/", "")})
-
-            self.s3.delete_object(Bucket=bucket_name, Key=source_key)
-            self.logger.debug("Archivo original eliminado",
-                              extra={"event_filename": source_key.replace(env.DIR_RECEPTION_FILES + "/", "")})
-
             return destination_key
 
+        except S3ObjectNotFoundError:
+            self.logger.error(
+                f"El archivo {source_key} no existe en el bucket {bucket_name}. No se puede mover a Rechazados.",
+                extra={"event_filename": source_key.replace(env.DIR_RECEPTION_FILES + "/", "")})
+            raise
+
         except ClientError as e:
             self.logger.error("Error al mover el archivo a Rechazados: %s", e)
 
-    def move_file_to_procesando(self, bucket_name: str, file_name: str) -> str:
+    def move_file_to_procesando(self, bucket_name: str, file_name: str, etag: str = None, size: int = None) -> str:
         """
         Mueve el archivo a la carpeta 'Procesando/YYYYMM/' dentro del mismo bucket,
+        :param etag: eTag del archivo según el evento de S3; si se indica, la copia es condicional.
+        :param size: Tamaño del archivo según el evento de S3.
         :returns: La clave de destino del archivo.
+        :raises S3ObjectNotFoundError: Si el archivo ya no existe en 'Recibidos' o cambió.
         """
         source_key = f"{env.DIR_RECEPTION_FILES}/{file_name}"
 
@@ -89,20 +215,9 @@ class S3Utils:
         destination_key = f"{env.DIR_PROCESSING_FILES}/{year_month_folder}/{file_name}"
 
         try:
-            # Copiar el archivo a la nueva ubicación
-            self.s3.copy_object(
-                Bucket=bucket_name,
-                CopySource={'Bucket': bucket_name, 'Key': source_key},
-                Key=destination_key
-            )
+            self.move_object(bucket_name, source_key, destination_key, etag=etag, size=size)
             self.logger.debug("Archivo movido a la carpeta Procesando",
                               extra={"event_filename": file_name})
-
-            # Eliminar el archivo original de la carpeta Recibidos
-            self.s3.delete_object(Bucket=bucket_name, Key=source_key)
-            self.logger.debug("Archivo original eliminado",
-                              extra={"event_filename": file_name})
-
             return destination_key
 
         except ClientError as e:
@@ -117,7 +232,8 @@ class S3Utils:
             nombre_archivo: str,
             contador_intentos_cargue: int,
             receipt_handle: str,
-            error_handling_service
+            error_handling_service,
+            object_size: int = None,
     ):
         """
         Descomprime un archivo .zip en S3 y sube el contenido descomprimido a una carpeta
@@ -130,6 +246,7 @@ class S3Utils:
         :param contador_intentos_cargue: El contador de intentos de cargue del archivo.
         :param receipt_handle: El identificador del mensaje en la cola de SQS.
         :param error_handling_service: Instancia de ErrorHandlingService para manejar errores.
+        :param object_size: Tamaño del .zip según el evento de S3, usado en el modo 'auto'.
         """
 
         # Obtener el tipo de respuesta del archivo.
@@ -142,13 +259,11 @@ class S3Utils:
         destination_folder = f"{base_folder}/{zip_filename}_{timestamp}/"
 
         try:
-            zip_obj = self.s3.get_object(Bucket=bucket_name, Key=file_key)
-            with ZipFile(BytesIO(zip_obj['Body'].read())) as zip_file:
-                extracted_files = []
-                for file_info in zip_file.infolist():
-                    # Crear la clave S3 para cada archivo descomprimido
-                    extracted_file_key = f"{destination_folder}{file_info.filename}"
-                    extracted_files.append(extracted_file_key)
+            extraction_mode = self.resolve_zip_extraction_mode(bucket_name, file_key, object_size)
+            with self.open_zip_file(bucket_name, file_key, extraction_mode) as zip_file:
+                # Construir el manifiesto del .zip en una sola pasada por el directorio central
+                manifest = self.build_zip_manifest(zip_file, destination_folder)
+                extracted_files = [entry.key for entry in manifest]
 
                 # validar si la cantidad de archivos descomprimidos es igual a la cantidad esperada
                 contador_archivos_descomprimidos = self.validar_cantidad_archivos_descomprimidos(
@@ -168,11 +283,12 @@ class S3Utils:
                         codigo_error=env.CONST_COD_ERROR_UNEXPECTED_FILE_COUNT,
                         id_plantilla=env.CONST_ID_PLANTILLA_CORREO_ERROR_DECOMPRESION,
                     )
+                    return None
 
-                # validar la estructura del nombre de cada archivo descomprimido
-                for file_info in zip_file.infolist():
+                # validar la estructura del nombre de cada archivo antes de subir cualquiera de ellos
+                for entry in manifest:
                     is_valid = self.validator.validar_archivos_in_zip(
-                        file_info.filename, tipo_respuesta, nombre_archivo
+                        entry.filename, tipo_respuesta, nombre_archivo
                     )
                     if not is_valid:
                         # nombre con extensión .zip para el log.
@@ -192,25 +308,13 @@ class S3Utils:
                             codigo_error=env.CONST_COD_ERROR_INVALID_FILE_SUFFIX,
                             id_plantilla=env.CONST_ID_PLANTILLA_CORREO_ERROR_DECOMPRESION,
                         )
+                        return None
 
-                    else:
-                        # Leer el contenido del archivo extraído
-                        with zip_file.open(file_info) as extracted_file:
-                            # Subir el archivo descomprimido a S3
-                            self.logger.debug(
-                                f"Archivos extraídos: {[file_info.filename for file_info in zip_file.infolist()]}")
-                            extracted_file_key = f"{destination_folder}{file_info.filename}"
-                            self.s3.upload_fileobj(
-                                extracted_file,
-                                Bucket=bucket_name,
-                                Key=extracted_file_key
-                            )
-                            self.logger.debug(f"Archivo descomprimido subido a S3: {extracted_file_key}")
-
-            # Eliminar el archivo .zip original
-            self.s3.delete_object(Bucket=bucket_name, Key=file_key)
-            self.logger.debug(f"Archivo .zip original eliminado: {file_key}")
-            self.logger.info(f"Descompresión completada para {file_key} en {destination_folder}")
+                # Solo un manifiesto completamente válido se sube a S3
+                self.logger.debug(f"Archivos extraídos: {[entry.filename for entry in manifest]}")
+                self.upload_extracted_files(
+                    zip_file, [entry.info for entry in manifest], bucket_name, destination_folder, extraction_mode
+                )
 
             # Registrar los archivos descomprimidos en la tabla CGD_RTA_PRO_ARCHIVOS
             zip_filename = file_key.rsplit("/", 1)[-1]
@@ -218,13 +322,18 @@ class S3Utils:
                 id_archivo,
                 zip_filename,
             )
-            # Registrar los archivos descomprimidos en la tabla CGD_RTA_PRO_ARCHIVOS
             self.cgd_rta_pro_archivos_service.register_extracted_files(
                 id_archivo=id_archivo,
                 id_rta_procesamiento=id_rta_procesamiento,
                 extracted_files=extracted_files,
             )
 
+            # Eliminar el archivo .zip original y confirmar el registro de los archivos descomprimidos
+            self.s3.delete_object(Bucket=bucket_name, Key=file_key)
+            self.unit_of_work.checkpoint(f"{file_key} descomprimido y eliminado")
+            self.logger.debug(f"Archivo .zip original eliminado: {file_key}")
+            self.logger.info(f"Descompresión completada para {file_key} en {destination_folder}")
+
             # Enviar mensajes a la cola para cada archivo descomprimido
             self.cgd_rta_pro_archivos_service.send_pending_files_to_queue_by_id(
                 id_archivo=id_archivo,
@@ -262,6 +371,127 @@ class S3Utils:
             self.logger.error("Error al descomprimir el archivo .zip", extra={"event_filename": nombre_archivo})
             return None
 
+    @staticmethod
+    def build_zip_manifest(zip_file: ZipFile, destination_folder: str) -> list:
+        """
+        Recorre una sola vez el directorio central del .zip y construye su manifiesto.
+
+        :param zip_file: Archivo .zip abierto.
+        :param destination_folder: Carpeta de destino de los archivos descomprimidos.
+        :return: Lista de ZipManifestEntry en el orden del .zip.
+        """
+        return [
+            ZipManifestEntry(
+                filename=file_info.filename,
+                key=f"{destination_folder}{file_info.filename}",
+                file_size=file_info.file_size,
+                crc=file_info.CRC,
+                suffix=os.path.splitext(file_info.filename)[0].rsplit("-", 1)[-1],
+                info=file_info,
+            )
+            for file_info in zip_file.infolist()
+        ]
+
+    def resolve_zip_extraction_mode(self, bucket_name: str, file_key: str, object_size: int = None) -> str:
+        """
+        Determina el modo de descompresión. En modo 'auto' se usa 'disk' cuando el .zip supera
+        ZIP_DISK_THRESHOLD_BYTES y 'memory' en caso contrario; el tamaño se toma del evento de S3
+        y solo si no se conoce se consulta con HEAD.
+        """
+        if env.ZIP_EXTRACTION_MODE != ZIP_EXTRACTION_MODE_AUTO:
+            return env.ZIP_EXTRACTION_MODE
+
+        if object_size is None:
+            object_size = self.s3.head_object(Bucket=bucket_name, Key=file_key)["ContentLength"]
+
+        if object_size > env.ZIP_DISK_THRESHOLD_BYTES:
+            return ZIP_EXTRACTION_MODE_DISK
+        return ZIP_EXTRACTION_MODE_MEMORY
+
+    @contextmanager
+    def open_zip_file(self, bucket_name: str, file_key: str, extraction_mode: str = ZIP_EXTRACTION_MODE_MEMORY):
+        """
+        Abre un archivo .zip de S3 según el modo de descompresión:
+        - memory: descarga el archivo completo en memoria.
+        - stream: lee el directorio central y cada archivo contenido con GET por rangos,
+          con un consumo de memoria acotado por ZIP_STREAM_BUFFER_SIZE.
+        - disk: descarga el archivo a ZIP_TMP_DIR con partes en paralelo y lo lee mapeado en memoria.
+        """
+        if extraction_mode == ZIP_EXTRACTION_MODE_STREAM:
+            self.logger.debug(f"Descomprimiendo {file_key} en modo stream")
+            with open_s3_object_stream(self.s3, bucket_name, file_key, env.ZIP_STREAM_BUFFER_SIZE) as stream:
+                with ZipFile(stream) as zip_file:
+                    yield zip_file
+        elif extraction_mode == ZIP_EXTRACTION_MODE_DISK:
+            self.logger.debug(f"Descomprimiendo {file_key} en modo disk")
+            download_config = TransferConfig(max_concurrency=env.ZIP_DOWNLOAD_CONCURRENCY)
+            with open_s3_object_on_disk(self.s3, bucket_name, file_key, env.ZIP_TMP_DIR, download_config) as mapped:
+                with ZipFile(mapped) as zip_file:
+                    yield zip_file
+        else:
+            zip_obj = self.s3.get_object(Bucket=bucket_name, Key=file_key)
+            with ZipFile(BytesIO(zip_obj['Body'].read())) as zip_file:
+                yield zip_file
+
+    def upload_extracted_files(self, zip_file: ZipFile, members: list, bucket_name: str,
+                               destination_folder: str, extraction_mode: str = ZIP_EXTRACTION_MODE_MEMORY) -> list:
+        """
+        Sube a S3 los archivos contenidos en el .zip con un máximo de ZIP_UPLOAD_CONCURRENCY
+        cargas simultáneas, de modo que el tiempo total lo determina el archivo más grande.
+
+        :param zip_file: Archivo .zip abierto.
+        :param members: Archivos del .zip (ZipInfo) que se deben subir.
+        :param bucket_name: El nombre del bucket de S3.
+        :param destination_folder: Carpeta de destino de los archivos descomprimidos.
+        :param extraction_mode: Modo de descompresión con el que se abrió el .zip.
+        :return: Lista de tuplas (clave, error) en el mismo orden de members; error es None si la carga fue exitosa.
+        :raises Exception: El primer error de carga, una vez terminadas todas las cargas.
+        """
+        if not members:
+            return []
+
+        def upload_member(file_info):
+            extracted_file_key = f"{destination_folder}{file_info.filename}"
+            try:
+                with zip_file.open(file_info) as extracted_file:
+                    self.upload_extracted_file(extracted_file, bucket_name, extracted_file_key, extraction_mode)
+                self.logger.debug(f"Archivo descomprimido subido a S3: {extracted_file_key}")
+                return extracted_file_key, None
+            except Exception as e:
+                self.logger.error(f"Error al subir el archivo descomprimido {extracted_file_key}: {str(e)}")
+                return extracted_file_key, e
+
+        max_workers = max(1, min(env.ZIP_UPLOAD_CONCURRENCY, len(members)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # map conserva el orden de los archivos del .zip
+            results = list(executor.map(upload_member, members))
+
+        errors = [error for _, error in results if error is not None]
+        if errors:
+            raise errors[0]
+        return results
+
+    def upload_extracted_file(self, extracted_file, bucket_name: str, extracted_file_key: str,
+                              extraction_mode: str = ZIP_EXTRACTION_MODE_MEMORY):
+        """
+        Sube a S3 el contenido de un archivo extraído del .zip a medida que se descomprime.
+        En los modos stream y disk la carga multiparte usa partes del tamaño de
+        ZIP_STREAM_BUFFER_SIZE, subidas de una en una, para acotar la memoria.
+        """
+        if extraction_mode in (ZIP_EXTRACTION_MODE_STREAM, ZIP_EXTRACTION_MODE_DISK):
+            self.s3.upload_fileobj(
+                extracted_file,
+                Bucket=bucket_name,
+                Key=extracted_file_key,
+                Config=build_bounded_transfer_config(env.ZIP_STREAM_BUFFER_SIZE),
+            )
+        else:
+            self.s3.upload_fileobj(
+                extracted_file,
+                Bucket=bucket_name,
+                Key=extracted_file_key
+            )
+
     def get_cantidad_de_archivos_esperados_en_el_zip(self, id_archivo, nombre_archivo):
         tipo_respuesta = self.rta_procesamiento_repository.get_tipo_respuesta(id_archivo)
         expected_file_count = {
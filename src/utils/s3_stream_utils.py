@@ -0,0 +1,156 @@
+import io
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from boto3.s3.transfer import TransferConfig
+
+# Tamaño mínimo de una parte en una carga multiparte de S3 (excepto la última)
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class S3RangeReader(io.RawIOBase):
+    """
+    Lector de solo lectura, con posicionamiento, sobre un objeto de S3. Los bytes se obtienen
+    bajo demanda con GET por rangos, de modo que el objeto nunca se descarga completo.
+    """
+
+    def __init__(self, s3_client, bucket_name: str, key: str, size: int = None, max_request_size: int = None):
+        """
+        :param s3_client: Cliente de S3.
+        :param bucket_name: Nombre del bucket.
+        :param key: Clave del objeto.
+        :param size: Tamaño del objeto en bytes; si no se indica, se consulta con HEAD.
+        :param max_request_size: Máximo de bytes solicitados en cada GET por rangos.
+        """
+        super().__init__()
+        self._s3 = s3_client
+        self._bucket_name = bucket_name
+        self._key = key
+        self._max_request_size = max_request_size
+        if size is None:
+            size = s3_client.head_object(Bucket=bucket_name, Key=key)["ContentLength"]
+        self._size = size
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._size + offset
+        else:
+            raise ValueError(f"Valor de whence no soportado: {whence}")
+
+        if position < 0:
+            raise ValueError(f"Posición inválida: {position}")
+        self._position = position
+        return position
+
+    def readinto(self, buffer) -> int:
+        if self._position >= self._size or len(buffer) == 0:
+            return 0
+
+        request_size = len(buffer)
+        if self._max_request_size:
+            request_size = min(request_size, self._max_request_size)
+        end = min(self._position + request_size, self._size) - 1
+        response = self._s3.get_object(
+            Bucket=self._bucket_name,
+            Key=self._key,
+            Range=f"bytes={self._position}-{end}",
+        )
+        data = response["Body"].read()
+        read_size = len(data)
+        buffer[:read_size] = data
+        self._position += read_size
+        return read_size
+
+
+def open_s3_object_stream(s3_client, bucket_name: str, key: str, buffer_size: int,
+                          size: int = None) -> io.BufferedReader:
+    """
+    Abre un objeto de S3 como un archivo binario con posicionamiento, leyendo como máximo
+    'buffer_size' bytes por cada GET por rangos.
+    """
+    reader = S3RangeReader(s3_client, bucket_name, key, size, max_request_size=buffer_size)
+    return io.BufferedReader(reader, buffer_size=buffer_size)
+
+
+class MmapReader(io.RawIOBase):
+    """
+    Adaptador de archivo binario con posicionamiento sobre un mmap, ya que mmap no implementa
+    la interfaz completa de archivo que necesita ZipFile. Las lecturas copian directamente
+    desde las páginas mapeadas al buffer del llamador.
+    """
+
+    def __init__(self, mapped: mmap.mmap):
+        super().__init__()
+        self._mapped = mapped
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._mapped.tell()
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._mapped.seek(offset, whence)
+        return self._mapped.tell()
+
+    def readinto(self, buffer) -> int:
+        position = self._mapped.tell()
+        read_size = max(0, min(len(buffer), len(self._mapped) - position))
+        buffer[:read_size] = self._mapped[position:position + read_size]
+        self._mapped.seek(position + read_size)
+        return read_size
+
+
+@contextmanager
+def open_s3_object_on_disk(s3_client, bucket_name: str, key: str, tmp_dir: str,
+                           transfer_config: TransferConfig = None):
+    """
+    Descarga un objeto de S3 al almacenamiento efímero (partes por rangos en paralelo con
+    download_fileobj) y lo expone como un archivo mapeado en memoria. El archivo temporal
+    se elimina al salir del contexto.
+    """
+    fd, path = tempfile.mkstemp(dir=tmp_dir, suffix=".zip")
+    try:
+        with os.fdopen(fd, "w+b") as tmp_file:
+            s3_client.download_fileobj(bucket_name, key, tmp_file, Config=transfer_config)
+            tmp_file.flush()
+            if os.fstat(tmp_file.fileno()).st_size == 0:
+                # mmap no admite archivos vacíos; ZipFile reportará el archivo como corrupto
+                yield io.BytesIO()
+                return
+            with mmap.mmap(tmp_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with MmapReader(mapped) as reader:
+                    yield reader
+    finally:
+        os.remove(path)
+
+
+def build_bounded_transfer_config(buffer_size: int) -> TransferConfig:
+    """
+    Configuración de transferencia para subir flujos no posicionables con memoria acotada:
+    las partes de la carga multiparte tienen el tamaño del buffer y se suben de una en una.
+    """
+    part_size = max(buffer_size, S3_MIN_PART_SIZE)
+    return TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        use_threads=False,
+    )
@@ -1,5 +1,6 @@
+import time
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 from src.services.aws_clients_service import AWSClients
 from src.utils.logger_utils import get_logger
 from src.config.config import env
@@ -8,6 +9,13 @@ import json
 
 logger = get_logger(env.DEBUG_MODE)
 
+# Retraso máximo permitido por SQS para DelaySeconds
+MAX_SQS_DELAY_SECONDS = 900
+# Máximo de mensajes por llamada a send_message_batch
+MAX_SQS_BATCH_SIZE = 10
+# Intentos de envío de las entradas que fallan dentro de un lote
+SQS_BATCH_MAX_ATTEMPTS = 3
+
 
 def delete_message_from_sqs(receipt_handle: str, queue_url: str, filename: str):
     """
@@ -41,6 +49,54 @@ def send_message_to_sqs(queue_url: str, message_body: dict, filename: str):
         logger.error("Error al enviar mensaje a SQS: %s", e, extra={"event_filename": filename})
 
 
+def send_messages_to_sqs_in_batches(queue_url: str, messages: List[Tuple[dict, str]]) -> List[bool]:
+    """
+    Envía varios mensajes a una cola SQS agrupándolos en llamadas a send_message_batch de hasta
+    MAX_SQS_BATCH_SIZE mensajes. Las entradas que fallan por un error del servicio se reintentan
+    hasta SQS_BATCH_MAX_ATTEMPTS veces; las rechazadas por error del remitente no se reintentan.
+
+    :param queue_url: URL de la cola SQS.
+    :param messages: Lista de tuplas (cuerpo del mensaje, nombre del archivo que generó el evento).
+    :return: Lista con el resultado del envío de cada mensaje, en el mismo orden de messages.
+    """
+    sqs = AWSClients.get_sqs_client()
+    results = [False] * len(messages)
+
+    for start in range(0, len(messages), MAX_SQS_BATCH_SIZE):
+        pending = {
+            str(index): {"Id": str(index), "MessageBody": json.dumps(message_body, ensure_ascii=False)}
+            for index, (message_body, _) in enumerate(messages[start:start + MAX_SQS_BATCH_SIZE], start)
+        }
+
+        for attempt in range(SQS_BATCH_MAX_ATTEMPTS):
+            if attempt:
+                time.sleep(0.1 * 2 ** attempt)
+            try:
+                response = sqs.send_message_batch(QueueUrl=queue_url, Entries=list(pending.values()))
+            except Exception as e:
+                logger.error("Error al enviar el lote de mensajes a SQS: %s", e)
+                continue
+
+            for entry in response.get("Successful", []):
+                results[int(entry["Id"])] = True
+                pending.pop(entry["Id"], None)
+
+            for entry in response.get("Failed", []):
+                filename = messages[int(entry["Id"])][1]
+                logger.error(
+                    "Error al enviar mensaje a SQS: %s", entry.get("Message", entry.get("Code")),
+                    extra={"event_filename": filename},
+                )
+                if entry.get("SenderFault"):
+                    pending.pop(entry["Id"], None)
+
+            if not pending:
+                break
+
+    logger.debug(f"Mensajes enviados a SQS en lote: {sum(results)} de {len(messages)}")
+    return results
+
+
 def build_email_message(
         id_plantilla: str,
         error_data: Dict[str, str],
@@ -88,6 +144,7 @@ def send_message_to_sqs_with_delay(queue_url: str, message_body: dict, filename:
     :param message_body: Cuerpo del mensaje a enviar.
     :param filename: Nombre del archivo que generó el evento.
     :param delay_seconds: Tiempo en segundos que se espera antes de enviar el mensaje.
+    :return: True si el mensaje se envió, False en caso contrario.
     """
     sqs = AWSClients.get_sqs_client()
     try:
@@ -97,5 +154,27 @@ def send_message_to_sqs_with_delay(queue_url: str, message_body: dict, filename:
             DelaySeconds=delay_seconds
         )
         logger.debug("Mensaje enviado a SQS con éxito", extra={"event_filename": filename})
+        return True
+    except Exception as e:
+        logger.error("Error al enviar mensaje a SQS: %s", e, extra={"event_filename": filename})
+        return False
+
+def change_message_visibility(receipt_handle: str, queue_url: str, filename: str, visibility_timeout: int):
+    """
+    Modifica el tiempo de visibilidad de un mensaje de una cola SQS, difiriendo su reintento.
+
+    :param receipt_handle: Identificador del mensaje.
+    :param queue_url: URL de la cola SQS.
+    :param filename: Nombre del archivo que generó el evento.
+    :param visibility_timeout: Tiempo en segundos durante el cual el mensaje permanecerá oculto.
+    """
+    sqs = AWSClients.get_sqs_client()
+    try:
+        sqs.change_message_visibility(
+            QueueUrl=queue_url,
+            ReceiptHandle=receipt_handle,
+            VisibilityTimeout=visibility_timeout
+        )
+        logger.debug("Visibilidad del mensaje actualizada en SQS", extra={"event_filename": filename})
     except Exception as e:
-        logger.error("Error al enviar mensaje a SQS: %s", e, extra={"event_filename": filename})
\ No newline at end of file
+        logger.error("Error al cambiar la visibilidad del mensaje en SQS: %s", e, extra={"event_filename": filename})
@@ -0,0 +1,90 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from src.utils.logger_utils import get_logger
+from src.config.config import env
+
+logger = get_logger(env.DEBUG_MODE)
+
+
+class TTLCache:
+    """
+    Caché en memoria, segura entre hilos, cuyos valores expiran pasado un tiempo de vida (TTL).
+    Al ser un objeto de módulo, se conserva entre invocaciones mientras el contenedor de la
+    Lambda permanezca caliente.
+
+    Si se define una ventana de obsolescencia (stale_seconds), un valor expirado dentro de esa
+    ventana se sigue entregando mientras se recarga en un hilo en segundo plano
+    (stale-while-revalidate), de modo que la invocación no espera a la consulta remota.
+    """
+
+    def __init__(self, ttl_seconds: float, stale_seconds: float = 0):
+        """
+        :param ttl_seconds: Tiempo de vida, en segundos, de cada valor almacenado.
+        :param stale_seconds: Tiempo, en segundos, durante el cual un valor expirado puede
+            entregarse mientras se recarga en segundo plano.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, loader: Callable[[], Any], force_refresh: bool = False) -> Any:
+        """
+        Obtiene el valor de la clave; si no existe o expiró, lo carga con 'loader' y lo almacena.
+        Si 'loader' lanza una excepción, no se almacena nada y la excepción se propaga.
+
+        :param key: Clave del valor.
+        :param loader: Función sin argumentos que obtiene el valor desde su origen.
+        :param force_refresh: Si es True, ignora el valor almacenado y lo recarga.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not force_refresh:
+                value, expires_at = entry
+                now = time.monotonic()
+                if now < expires_at:
+                    return value
+                if now < expires_at + self.stale_seconds:
+                    self._refresh_in_background(key, loader)
+                    return value
+
+            # La carga se hace con el bloqueo tomado para que solo un hilo consulte el origen
+            value = loader()
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            return value
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """
+        Elimina una clave de la caché o, si no se indica ninguna, todas las claves.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _refresh_in_background(self, key: Hashable, loader: Callable[[], Any]):
+        """
+        Lanza la recarga de la clave en un hilo en segundo plano, si no hay otra en curso.
+        Debe llamarse con el bloqueo tomado.
+        """
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]):
+        """
+        Recarga el valor de la clave; si falla, se conserva el valor anterior.
+        """
+        try:
+            value = loader()
+            with self._lock:
+                self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"No se pudo refrescar el valor en caché {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
@@ -4,8 +4,11 @@ from fileinput import filename
 from unittest.mock import patch, MagicMock
 from src.config.config import env
 from src.services.archivo_service import ArchivoService
+from src.services.s3_service import S3ObjectNotFoundError
 from src.core.validator import ArchivoValidator
+from src.core.process_event import SQSEventEnvelope
 from src.models.cgd_rta_pro_archivos import CGDRtaProArchivos
+from src.repositories.rta_procesamiento_repository import RtaProcesamientoResumen
 
 
 class TestValidateEventData(unittest.TestCase):
@@ -57,13 +60,7 @@ class TestValidateEventData(unittest.TestCase):
         result = self.service.validate_event_data(None, None, None)
         self.assertFalse(result)
 
-    @patch("src.core.process_event.extract_filename_from_body")
-    @patch("src.core.process_event.extract_bucket_from_body")
-    def test_extract_event_details_valid_event(self, mock_extract_bucket, mock_extract_filename):
-        # Configurar el mock para las funciones de extracción
-        mock_extract_filename.return_value = "test_file.txt"
-        mock_extract_bucket.return_value = "test_bucket"
-
+    def test_extract_event_details_valid_event(self):
         # Simular un evento con datos válidos
         event = {
             "Records": [
@@ -75,8 +72,8 @@ class TestValidateEventData(unittest.TestCase):
             ]
         }
 
-        # Crear instancia de la clase y llamar al método
-        result = self.service.extract_event_details(event)
+        # Crear instancia de la clase y llamar al método con el registro
+        result = self.service.extract_event_details(SQSEventEnvelope(event["Records"][0]))
 
         # Verificar el resultado esperado
         expected_file_name = "RE_ESP_TUTGMF0001003920241002-0001.zip"
@@ -153,6 +150,43 @@ class TestValidateFileExistenceInBucket(unittest.TestCase):
 
         #
 
+    @patch("src.services.archivo_service.env")
+    @patch("src.services.s3_service.S3Utils.check_file_exists_in_s3")
+    def test_validate_file_existence_optimistic_mode(self, mock_check_file_exists, mock_env):
+        """
+        Con el modo optimista se usan los metadatos del evento y no se consulta S3.
+        """
+        mock_env.S3_OPTIMISTIC_EXISTENCE_CHECK = True
+        self.service.object_etags["test_file.zip"] = '"etag"'
+
+        result = self.service.validate_file_existence_in_bucket("test_file.zip", "test_bucket", "test_receipt_handle")
+
+        self.assertTrue(result)
+        mock_check_file_exists.assert_not_called()
+
+    @patch("src.utils.sqs_utils.AWSClients.get_sqs_client")
+    def test_procesar_registro_file_gone(self, mock_get_sqs_client):
+        """
+        Si la copia detecta que el archivo ya no existe, el registro se da por consumido.
+        """
+        envelope = SQSEventEnvelope({
+            "messageId": "msg-1",
+            "receiptHandle": "test_receipt_handle",
+            "body": json.dumps({"Records": [{"s3": {
+                "bucket": {"name": "test_bucket"},
+                "object": {"key": "Recibidos/test_file.zip", "size": 10, "eTag": '"etag"'},
+            }}]}),
+        })
+        self.service.validate_file_existence_in_bucket = MagicMock(return_value=True)
+        self.service._handle_new_file = MagicMock(
+            side_effect=S3ObjectNotFoundError("test_bucket", "Recibidos/test_file.zip"))
+
+        self.assertTrue(self.service.procesar_registro(envelope))
+        self.assertEqual(self.service.object_etags["test_file.zip"], '"etag"')
+        self.mock_db.rollback.assert_called_once()
+        # Lambda elimina el mensaje a partir de la respuesta de fallos parciales
+        mock_get_sqs_client.return_value.delete_message.assert_not_called()
+
 
 class TestProcessSpecialFile(unittest.TestCase):
     def setUp(self):
@@ -194,7 +228,7 @@ class TestProcessSpecialFile(unittest.TestCase):
         Caso en el que el archivo es especial y ya existe.
         """
         # Configurar los mocks
-        self.service.archivo_repository.get_archivo_by_nombre_archivo.return_value.id_archivo = 123
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.return_value.id_archivo = 123
         self.service.archivo_validator.is_special_file.return_value = True
         self.service.check_existing_special_file.return_value = True
         self.service.validar_estado_special_file.return_value = True
@@ -234,7 +268,7 @@ class TestProcessSpecialFile(unittest.TestCase):
             """
             # Configurar los mocks
             mock_archivo_validator.is_special_file.return_value = True
-            mock_archivo_repository.get_archivo_by_nombre_archivo.return_value.id_archivo = 123
+            mock_archivo_repository.get_archivo_resumen_by_nombre_archivo.return_value.id_archivo = 123
             self.service.check_existing_special_file.return_value = False
 
             # Datos de entrada
@@ -308,8 +342,10 @@ class TestCheckExistingSpecialFile(unittest.TestCase):
         """
         Caso en el que el archivo especial ya existe en la base de datos.
         """
-        # Configurar el mock para que devuelva True, indicando que el archivo existe
-        self.service.archivo_repository.check_special_file_exists.return_value = True
+        # Configurar el mock para que devuelva un archivo especial, indicando que el archivo existe
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.return_value.tipo_archivo = (
+            env.CONST_TIPO_ARCHIVO_ESPECIAL
+        )
 
         # Datos de entrada
         acg_nombre_archivo = "RE_ESP_FILE"
@@ -325,8 +361,8 @@ class TestCheckExistingSpecialFile(unittest.TestCase):
         """
         Caso en el que el archivo especial no existe en la base de datos.
         """
-        # Configurar el mock para que devuelva False, indicando que el archivo no existe
-        self.service.archivo_repository.check_special_file_exists.return_value = False
+        # Configurar el mock para que devuelva None, indicando que el archivo no existe
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.return_value = None
 
         # Datos de entrada
         acg_nombre_archivo = "RE_ESP_FILE"
@@ -340,6 +376,20 @@ class TestCheckExistingSpecialFile(unittest.TestCase):
         # Verificar que no se registró ningún mensaje de advertencia
         mock_logger.warning.assert_not_called()
 
+    def test_check_existing_special_file_other_tipo_archivo(self):
+        """
+        Caso en el que existe un archivo con el mismo nombre que no es especial.
+        """
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.return_value.tipo_archivo = (
+            env.CONST_TIPO_ARCHIVO_GENERAL
+        )
+
+        self.assertFalse(self.service.check_existing_special_file("RE_ESP_FILE"))
+
+        # La consulta queda en el contexto del mensaje para las siguientes etapas
+        self.service.get_archivo("RE_ESP_FILE")
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.assert_called_once_with("RE_ESP_FILE")
+
 
 class TestValidarEstadoSpecialFile(unittest.TestCase):
     def setUp(self):
@@ -373,7 +423,7 @@ class TestValidarEstadoSpecialFile(unittest.TestCase):
         """
         # Configurar el mock para que devuelva un estado válido
         estado_valido = "EN_PROCESO"
-        self.service.archivo_repository.get_archivo_by_nombre_archivo.return_value.estado = estado_valido
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.return_value.estado = estado_valido
         self.service.archivo_validator.is_valid_state.return_value = True
 
         # Datos de entrada
@@ -394,7 +444,7 @@ class TestValidarEstadoSpecialFile(unittest.TestCase):
         """
         # Configurar el mock para que devuelva un estado no válido
         estado_invalido = "INVALIDO"
-        self.service.archivo_repository.get_archivo_by_nombre_archivo.return_value.estado = estado_invalido
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.return_value.estado = estado_invalido
         self.service.archivo_validator.is_valid_state.return_value = False
 
         # Datos de entrada
@@ -418,7 +468,7 @@ class TestValidarEstadoSpecialFile(unittest.TestCase):
         Caso en el que el archivo no tiene estado.
         """
         # Configurar el mock para que devuelva None como estado
-        self.service.archivo_repository.get_archivo_by_nombre_archivo.return_value.estado = None
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.return_value.estado = None
 
         # Datos de entrada
         acg_nombre_archivo = "RE_ESP_FILE"
@@ -462,7 +512,7 @@ class TestGetEstadoArchivo(unittest.TestCase):
         """
         # Configurar el mock para que devuelva un estado válido
         estado_esperado = "EN_PROCESO"
-        self.service.archivo_repository.get_archivo_by_nombre_archivo.return_value.estado = estado_esperado
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.return_value.estado = estado_esperado
 
         # Datos de entrada
         acg_nombre_archivo = "RE_ESP_FILE"
@@ -481,7 +531,7 @@ class TestGetEstadoArchivo(unittest.TestCase):
         Caso en el que el archivo no tiene un estado.
         """
         # Configurar el mock para que devuelva None como estado
-        self.service.archivo_repository.get_archivo_by_nombre_archivo.return_value.estado = None
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.return_value.estado = None
 
         # Datos de entrada
         acg_nombre_archivo = "RE_ESP_FILE"
@@ -541,13 +591,17 @@ class TestMoveFileAndUpdateState(unittest.TestCase):
         self.assertEqual(result, new_file_key)
 
         # Verificar que se llamó a move_file_to_procesando con los argumentos correctos
-        self.service.s3_utils.move_file_to_procesando.assert_called_once_with(bucket, file_name)
+        self.service.s3_utils.move_file_to_procesando.assert_called_once_with(bucket, file_name, etag=None, size=None)
 
-        # Verificar que se actualizó el estado en la base de datos
-        self.service.archivo_repository.update_estado_archivo.assert_called_once_with(
-            acg_nombre_archivo, env.CONST_ESTADO_LOAD_RTA_PROCESSING, 0
+        # Verificar que se actualizó el estado en la base de datos con el registro ya consultado
+        self.service.archivo_repository.update_estado_archivo_by_id.assert_called_once_with(
+            self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.return_value.id_archivo,
+            env.CONST_ESTADO_LOAD_RTA_PROCESSING, 0,
         )
 
+        # El nuevo estado se confirma junto con el movimiento del archivo
+        self.mock_db.commit.assert_called_once()
+
 
 class TestInsertFileStates(unittest.TestCase):
     def setUp(self):
@@ -581,12 +635,10 @@ class TestInsertFileStates(unittest.TestCase):
         # Configurar los mocks para devolver valores simulados
         archivo_id = 123
         fecha_recepcion = "2024-11-07"
-        contador_intentos = 2
         type_response = "01"
 
-        self.service.archivo_repository.get_archivo_by_nombre_archivo.return_value.id_archivo = archivo_id
-        self.service.archivo_repository.get_archivo_by_nombre_archivo.return_value.fecha_recepcion = fecha_recepcion
-        self.service.rta_procesamiento_repository.get_last_contador_intentos_cargue.return_value = contador_intentos
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.return_value.id_archivo = archivo_id
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.return_value.fecha_recepcion = fecha_recepcion
         self.service.archivo_validator.get_type_response.return_value = type_response
 
         # Datos de entrada
@@ -594,15 +646,11 @@ class TestInsertFileStates(unittest.TestCase):
         estado = "EN_PROCESO"
         file_name = "RE_ESP_FILE.zip"
 
-        # Simular que get_last_rta_procesamiento devuelve el último id_rta_procesamiento
-        self.service.rta_procesamiento_repository.get_last_rta_procesamiento.return_value = MagicMock(
-            id_rta_procesamiento=1)
-
         # Llamar a la función
         self.service.insert_file_states_and_rta_processing(acg_nombre_archivo, estado, file_name)
 
-        # Verificar que se llamó a get_archivo_by_nombre_archivo correctamente
-        self.service.archivo_repository.get_archivo_by_nombre_archivo.assert_called_with(acg_nombre_archivo)
+        # Verificar que se llamó a get_archivo_resumen_by_nombre_archivo correctamente
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.assert_called_with(acg_nombre_archivo)
 
         # Verificar que se insertó en CGD_ARCHIVO_ESTADOS
         self.service.estado_archivo_repository.insert_estado_archivo.assert_called_once_with(
@@ -612,14 +660,12 @@ class TestInsertFileStates(unittest.TestCase):
             fecha_cambio_estado=fecha_recepcion
         )
 
-        # Verificar que se insertó en CGD_RTA_PROCESAMIENTO
-        self.service.rta_procesamiento_repository.insert_rta_procesamiento.assert_called_once_with(
+        # Verificar que se insertó en CGD_RTA_PROCESAMIENTO asignando el ID y el contador en la base de datos
+        self.service.rta_procesamiento_repository.insert_next_rta_procesamiento.assert_called_once_with(
             id_archivo=archivo_id,
-            id_rta_procesamiento=2,
             nombre_archivo_zip=file_name,
             tipo_respuesta=type_response,
             estado=env.CONST_ESTADO_INICIADO,
-            contador_intentos_cargue=contador_intentos + 1
         )
 
 
@@ -674,6 +720,7 @@ class TestUnzipFile(unittest.TestCase):
             new_counter,
             receipt_handle,
             error_handling_service,
+            object_size=None,
         )
 
         # Verificar que no se registraron mensajes de error
@@ -702,8 +749,9 @@ class TestProcessSqsResponse(unittest.TestCase):
         """
         Caso en el que el estado ya está marcado como enviado.
         """
-        # Configurar el mock para que `is_estado_enviado` devuelva True
-        self.service.rta_procesamiento_repository.is_estado_enviado.return_value = True
+        # Configurar el mock para que la última respuesta ya esté enviada
+        self.service.rta_procesamiento_repository.get_latest_rta_procesamiento.return_value = \
+            RtaProcesamientoResumen(456, env.CONST_ESTADO_SEND, 1)
 
         # Datos de entrada
         archivo_id = 123
@@ -713,6 +761,9 @@ class TestProcessSqsResponse(unittest.TestCase):
         # Llamar a la función
         self.service.process_sqs_response(archivo_id, file_name, receipt_handle)
 
+        # No se vuelve a enviar ni a actualizar la respuesta
+        self.service.rta_procesamiento_repository.update_state_rta_procesamiento_by_id.assert_not_called()
+
     @patch("src.utils.sqs_utils.delete_message_from_sqs")
     @patch("src.utils.sqs_utils.send_message_to_sqs")
     @patch("src.utils.logger_utils")
@@ -721,8 +772,8 @@ class TestProcessSqsResponse(unittest.TestCase):
         Caso en el que el estado no está marcado como enviado.
         """
         # Configurar los mocks
-        self.service.rta_procesamiento_repository.is_estado_enviado.return_value = False
-        self.service.rta_procesamiento_repository.get_last_rta_procesamiento_without_archivos.return_value = 456
+        self.service.rta_procesamiento_repository.get_latest_rta_procesamiento.return_value = \
+            RtaProcesamientoResumen(456, env.CONST_ESTADO_INICIADO, 1)
 
         # Datos de entrada
         archivo_id = 123
@@ -732,10 +783,50 @@ class TestProcessSqsResponse(unittest.TestCase):
         # Llamar a la función
         self.service.process_sqs_response(archivo_id, file_name, receipt_handle)
 
-        # Verificar que se actualizó el estado a "enviado"
-        self.service.rta_procesamiento_repository.update_state_rta_procesamiento.assert_called_once_with(
-            id_archivo=archivo_id, estado=env.CONST_ESTADO_SEND
+        # La respuesta se consulta una sola vez y se actualiza a "enviado" por su ID
+        self.service.rta_procesamiento_repository.get_latest_rta_procesamiento.assert_called_once_with(
+            archivo_id, file_name
         )
+        self.service.rta_procesamiento_repository.update_state_rta_procesamiento_by_id.assert_called_once_with(
+            archivo_id, 456, env.CONST_ESTADO_SEND
+        )
+
+
+    @patch("src.services.archivo_service.change_message_visibility")
+    @patch("src.utils.sqs_utils.AWSClients.get_sqs_client")
+    @patch("src.services.archivo_service.send_message_to_sqs")
+    def test_process_sqs_response_sin_rta_procesamiento(
+            self, mock_send_message, mock_get_sqs_client, mock_change_visibility):
+        """
+        Caso en el que no existe respuesta de procesamiento para el archivo ZIP: el registro
+        se reporta como fallido para que SQS lo reintente.
+        """
+        self.service.rta_procesamiento_repository.get_latest_rta_procesamiento.return_value = None
+        self.service.s3_utils = MagicMock()
+        self.service.s3_utils.unzip_file_in_s3.return_value = "Procesando/test_file"
+        self.service.validate_file_existence_in_bucket = MagicMock(return_value=True)
+        self.service._handle_new_file = MagicMock(side_effect=lambda *args: self.service.unzip_file(
+            "test_bucket", "Procesando/test_file.zip", 123, "test_file", 0,
+            "test_receipt_handle", self.service.error_handling_service,
+        ))
+        envelope = SQSEventEnvelope({
+            "messageId": "msg-1",
+            "receiptHandle": "test_receipt_handle",
+            "attributes": {"ApproximateReceiveCount": "1"},
+            "body": json.dumps({"Records": [{"s3": {
+                "bucket": {"name": "test_bucket"},
+                "object": {"key": "Recibidos/test_file.zip"},
+            }}]}),
+        })
+
+        self.assertFalse(self.service.procesar_registro(envelope))
+
+        # No se envía a consolidación, no se actualiza el estado y el mensaje queda para reintento
+        mock_send_message.assert_not_called()
+        mock_get_sqs_client.return_value.delete_message.assert_not_called()
+        self.service.rta_procesamiento_repository.update_state_rta_procesamiento_by_id.assert_not_called()
+        self.mock_db.rollback.assert_called_once()
+        self.mock_db.commit.assert_not_called()
 
 
 class TestHandleInvalidSpecialFile(unittest.TestCase):
@@ -792,6 +883,7 @@ class TestProcessGeneralFile(unittest.TestCase):
         self.mock_db = MagicMock()
         self.service = ArchivoService(self.mock_db)
         self.service.archivo_repository = MagicMock()
+        self.service.rta_procesamiento_repository = MagicMock()
         self.service.archivo_validator = MagicMock()
         self.service.error_handling_service = MagicMock()
         self.service.s3_utils = MagicMock()
@@ -802,7 +894,7 @@ class TestProcessGeneralFile(unittest.TestCase):
         Caso en el que el archivo no existe en la base de datos.
         """
         # Configurar el mock para que el archivo no exista
-        self.service.archivo_repository.check_file_exists.return_value = False
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.return_value = None
 
         # Datos de entrada
         file_name = "general_file.txt"
@@ -829,8 +921,7 @@ class TestProcessGeneralFile(unittest.TestCase):
         Caso en el que el archivo tiene un estado no válido.
         """
         # Configurar los mocks
-        self.service.archivo_repository.check_file_exists.return_value = True
-        self.service.archivo_repository.get_archivo_by_nombre_archivo.return_value.estado = "INVALIDO"
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.return_value.estado = "INVALIDO"
         self.service.archivo_validator.is_valid_state.return_value = False
 
         # Datos de entrada
@@ -858,8 +949,7 @@ class TestProcessGeneralFile(unittest.TestCase):
         Caso en el que el archivo existe y tiene un estado válido.
         """
         # Configurar los mocks para que el archivo exista y el estado sea válido
-        self.service.archivo_repository.check_file_exists.return_value = True
-        self.service.archivo_repository.get_archivo_by_nombre_archivo.return_value.estado = "VALIDO"
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.return_value.estado = "VALIDO"
         self.service.archivo_validator.is_valid_state.return_value = True
 
         # Datos de entrada
@@ -867,16 +957,25 @@ class TestProcessGeneralFile(unittest.TestCase):
         bucket = "test_bucket"
         receipt_handle = "test_receipt_handle"
         acg_nombre_archivo = "GENERAL_FILE"
+        self.service.archivo_validator.parse_filename.return_value.filename = file_name
+        self.service.archivo_validator.parse_filename.return_value.acg_nombre_archivo = acg_nombre_archivo
 
         # Llamar a la función
         self.service.process_general_file(file_name, bucket, receipt_handle, acg_nombre_archivo)
 
+        # El nombre del archivo se clasifica una sola vez
+        self.service.archivo_validator.parse_filename.assert_called_once_with(file_name)
+
+        # El registro del archivo se consulta una sola vez para todo el mensaje
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.assert_called_once_with(acg_nombre_archivo)
+
         # Verificar que se llamó a move_file_to_procesando
-        self.service.s3_utils.move_file_to_procesando.assert_called_once_with(bucket, file_name)
+        self.service.s3_utils.move_file_to_procesando.assert_called_once_with(bucket, file_name, etag=None, size=None)
 
-        # Verificar que se actualizó el estado en la base de datos
-        self.service.archivo_repository.update_estado_archivo.assert_called_once_with(
-            acg_nombre_archivo, env.CONST_ESTADO_LOAD_RTA_PROCESSING, 0
+        # Verificar que se actualizó el estado en la base de datos con el registro ya consultado
+        self.service.archivo_repository.update_estado_archivo_by_id.assert_called_once_with(
+            self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.return_value.id_archivo,
+            env.CONST_ESTADO_LOAD_RTA_PROCESSING, 0,
         )
 
 
@@ -909,7 +1008,7 @@ class TestValidarYProcesarArchivo(unittest.TestCase):
         mock_extract_event_details.return_value = (None, None, None, None)
         self.service.validate_event_data.return_value = False
 
-        event = {"Records": []}
+        event = {"Records": [{"receiptHandle": "receipt_handle"}]}
 
         # Llamar a la función
         self.service.validar_y_procesar_archivo(event)
@@ -925,7 +1024,7 @@ class TestValidarYProcesarArchivo(unittest.TestCase):
         self.service.validate_event_data.return_value = True
         self.service.validate_file_existence_in_bucket.return_value = False
 
-        event = {"Records": []}
+        event = {"Records": [{"receiptHandle": "receipt_handle"}]}
 
         # Llamar a la función
         self.service.validar_y_procesar_archivo(event)
@@ -945,9 +1044,9 @@ class TestValidarYProcesarArchivo(unittest.TestCase):
         mock_extract_event_details.return_value = ("special_file.txt", "test_bucket", "receipt_handle", "ARCHIVO")
         self.service.validate_event_data.return_value = True
         self.service.validate_file_existence_in_bucket.return_value = True
-        self.service.archivo_validator.is_special_prefix.return_value = True
+        self.service.archivo_validator.parse_filename.return_value.tipo_respuesta = env.CONST_TIPO_ARCHIVO_ESPECIAL
 
-        event = {"Records": []}
+        event = {"Records": [{"receiptHandle": "receipt_handle"}]}
 
         # Llamar a la función
         self.service.validar_y_procesar_archivo(event)
@@ -962,13 +1061,191 @@ class TestValidarYProcesarArchivo(unittest.TestCase):
         mock_extract_event_details.return_value = ("general_file.txt", "test_bucket", "receipt_handle", "ARCHIVO")
         self.service.validate_event_data.return_value = True
         self.service.validate_file_existence_in_bucket.return_value = True
-        self.service.archivo_validator.is_special_prefix.return_value = False
+        self.service.archivo_validator.parse_filename.return_value.tipo_respuesta = env.CONST_TIPO_ARCHIVO_GENERAL
+
+        event = {"Records": [{"receiptHandle": "receipt_handle"}]}
+
+        # Llamar a la función
+        self.service.validar_y_procesar_archivo(event)
+
+    @patch("src.services.archivo_service.ArchivoService.extract_event_details")
+    @patch("src.utils.logger_utils")
+    def test_procesa_todos_los_registros_del_lote(self, mock_logger, mock_extract_event_details):
+        """
+        Caso en el que el lote contiene varios registros y todos deben procesarse.
+        """
+        mock_extract_event_details.side_effect = [
+            ("file1.zip", "test_bucket", "receipt_1", "file1"),
+            ("file2.zip", "test_bucket", "receipt_2", "file2"),
+        ]
+        self.service.validate_event_data.return_value = True
+        self.service.validate_file_existence_in_bucket.return_value = False
+
+        event = {"Records": [{"receiptHandle": "receipt_1"}, {"receiptHandle": "receipt_2"}]}
+
+        # Llamar a la función
+        self.service.validar_y_procesar_archivo(event)
+
+        # Verificar que se validaron ambos registros
+        self.assertEqual(self.service.validate_file_existence_in_bucket.call_count, 2)
+        self.service.validate_file_existence_in_bucket.assert_any_call("file2.zip", "test_bucket", "receipt_2")
+
+    @patch("src.services.archivo_service.ArchivoService.extract_event_details")
+    @patch("src.utils.logger_utils")
+    def test_error_en_un_registro_no_afecta_al_resto(self, mock_logger, mock_extract_event_details):
+        """
+        Caso en el que un registro falla y el siguiente registro del lote se procesa igualmente.
+        """
+        mock_extract_event_details.side_effect = [
+            Exception("Error en el primer registro"),
+            ("file2.zip", "test_bucket", "receipt_2", "file2"),
+        ]
+        self.service.validate_event_data.return_value = True
+        self.service.validate_file_existence_in_bucket.return_value = False
+        self.service._handle_exception = MagicMock()
 
-        event = {"Records": []}
+        event = {"Records": [{"receiptHandle": "receipt_1"}, {"receiptHandle": "receipt_2"}]}
 
         # Llamar a la función
         self.service.validar_y_procesar_archivo(event)
 
+        # Verificar que se manejó el error del primer registro y se procesó el segundo
+        self.service._handle_exception.assert_called_once()
+        self.mock_db.rollback.assert_called_once()
+        self.service.validate_file_existence_in_bucket.assert_called_once_with("file2.zip", "test_bucket",
+                                                                               "receipt_2")
+
+    @patch("src.services.archivo_service.ArchivoService.extract_event_details")
+    @patch("src.utils.logger_utils")
+    def test_retorna_registros_fallidos(self, mock_logger, mock_extract_event_details):
+        """
+        Caso en el que un registro falla y debe reportarse en la respuesta de fallos parciales.
+        """
+        mock_extract_event_details.side_effect = [
+            Exception("Error en el primer registro"),
+            ("file2.zip", "test_bucket", "receipt_2", "file2"),
+        ]
+        self.service.validate_event_data.return_value = True
+        self.service.validate_file_existence_in_bucket.return_value = False
+        self.service._handle_exception = MagicMock(return_value=False)
+
+        event = {"Records": [
+            {"messageId": "msg-1", "receiptHandle": "receipt_1"},
+            {"messageId": "msg-2", "receiptHandle": "receipt_2"},
+        ]}
+
+        # Llamar a la función
+        result = self.service.validar_y_procesar_archivo(event)
+
+        # Verificar que solo se reporta el registro fallido
+        self.assertEqual(result, ["msg-1"])
+
+    @patch("src.services.archivo_service.send_message_to_sqs_with_delay")
+    def test_mensaje_con_varios_archivos(self, mock_send_with_delay):
+        """
+        Caso en el que un mensaje trae varios objetos de S3 y uno de ellos falla.
+        """
+        body = json.dumps({"Records": [
+            {"s3": {"bucket": {"name": "test_bucket"}, "object": {"key": "Recibidos/file1.zip"}}},
+            {"s3": {"bucket": {"name": "test_bucket"}, "object": {"key": "Recibidos/file2.zip"}}},
+        ]})
+        event = {"Records": [{"messageId": "msg-1", "receiptHandle": "receipt_1", "body": body}]}
+        self.service.procesar_registro = MagicMock(side_effect=[True, False])
+        mock_send_with_delay.return_value = True
+
+        # Llamar a la función
+        result = self.service.validar_y_procesar_archivo(event)
+
+        # Cada archivo se procesa por separado y solo el fallido se reenvía a la cola
+        self.assertEqual(result, [])
+        self.assertEqual(self.service.procesar_registro.call_count, 2)
+        mock_send_with_delay.assert_called_once()
+        queue_url, message_body, filename, _ = mock_send_with_delay.call_args.args
+        self.assertEqual(queue_url, env.SQS_URL_PRO_RESPONSE_TO_PROCESS)
+        self.assertEqual(filename, "file2.zip")
+        self.assertEqual(len(message_body["Records"]), 1)
+
+    @patch("src.services.archivo_service.send_message_to_sqs_with_delay")
+    def test_mensaje_con_varios_archivos_reenvio_fallido(self, mock_send_with_delay):
+        """
+        Caso en el que no se logra reenviar el archivo fallido y el mensaje debe reintentarse.
+        """
+        body = json.dumps({"Records": [
+            {"s3": {"bucket": {"name": "test_bucket"}, "object": {"key": "Recibidos/file1.zip"}}},
+            {"s3": {"bucket": {"name": "test_bucket"}, "object": {"key": "Recibidos/file2.zip"}}},
+        ]})
+        event = {"Records": [{"messageId": "msg-1", "receiptHandle": "receipt_1", "body": body}]}
+        self.service.procesar_registro = MagicMock(side_effect=[False, True])
+        mock_send_with_delay.return_value = False
+
+        # Llamar a la función
+        result = self.service.validar_y_procesar_archivo(event)
+
+        self.assertEqual(result, ["msg-1"])
+
+    @patch("src.services.archivo_service.change_message_visibility")
+    def test_handle_exception_con_reintentos_disponibles(self, mock_change_visibility):
+        """
+        Caso en el que el registro aún tiene reintentos disponibles y se reporta como fallido.
+        """
+        event = {"Records": [{"messageId": "msg-1", "attributes": {"ApproximateReceiveCount": "1"}}]}
+
+        # Llamar a la función
+        result = self.service._handle_exception(
+            SQSEventEnvelope(event["Records"][0]), "file.zip", "test_bucket", "receipt_handle"
+        )
+
+        # Verificar que se difiere el reintento y no se rechaza el archivo
+        self.assertFalse(result)
+        mock_change_visibility.assert_called_once_with(
+            "receipt_handle", env.SQS_URL_PRO_RESPONSE_TO_PROCESS, "file.zip", self.service.retry_delay
+        )
+        self.service.error_handling_service.handle_error_master.assert_not_called()
+
+    @patch("src.services.archivo_service.change_message_visibility")
+    def test_handle_exception_unidad_de_mensaje_con_varios_archivos(self, mock_change_visibility):
+        """
+        Caso en el que falla una de varias unidades del mismo mensaje: la unidad se reenvía
+        como mensaje propio, por lo que no se cambia la visibilidad del mensaje original.
+        """
+        body = json.dumps({"Records": [
+            {"s3": {"bucket": {"name": "test_bucket"}, "object": {"key": "Recibidos/file1.zip"}}},
+            {"s3": {"bucket": {"name": "test_bucket"}, "object": {"key": "Recibidos/file2.zip"}}},
+        ]})
+        record = {"messageId": "msg-1", "receiptHandle": "receipt_handle", "body": body,
+                  "attributes": {"ApproximateReceiveCount": "1"}}
+        unit = SQSEventEnvelope(record).split()[1]
+
+        result = self.service._handle_exception(unit, "file2.zip", "test_bucket", "receipt_handle")
+
+        self.assertFalse(result)
+        mock_change_visibility.assert_not_called()
+
+    @patch("src.services.archivo_service.change_message_visibility")
+    def test_handle_exception_sin_reintentos_disponibles(self, mock_change_visibility):
+        """
+        Caso en el que se superó el número máximo de reintentos y el archivo se rechaza.
+        """
+        receive_count = str(self.service.max_retries)
+        event = {"Records": [{"messageId": "msg-1", "attributes": {"ApproximateReceiveCount": receive_count}}]}
+
+        # Llamar a la función
+        result = self.service._handle_exception(
+            SQSEventEnvelope(event["Records"][0]), "file.zip", "test_bucket", "receipt_handle"
+        )
+
+        # Verificar que el registro se da por consumido y se maneja el error
+        self.assertTrue(result)
+        mock_change_visibility.assert_not_called()
+        self.service.error_handling_service.handle_error_master.assert_called_once_with(
+            id_plantilla=env.CONST_ID_PLANTILLA_EMAIL,
+            filekey=f"{env.DIR_RECEPTION_FILES}/file.zip",
+            bucket="test_bucket",
+            receipt_handle="receipt_handle",
+            codigo_error=env.CONST_COD_ERROR_TECHNICAL,
+            filename="file.zip",
+        )
+
 
 class TestValidateIsReprocessing(unittest.TestCase):
     @patch("src.services.aws_clients_service.AWSClients.get_ssm_client")
@@ -1001,7 +1278,7 @@ class TestValidateIsReprocessing(unittest.TestCase):
         }]}
 
         # Llamar a la función
-        result = self.service.validate_is_reprocessing(event)
+        result = self.service.validate_is_reprocessing(SQSEventEnvelope(event["Records"][0]))
 
         # Verificar que la función devuelve True
         self.assertTrue(result)
@@ -1017,7 +1294,7 @@ class TestValidateIsReprocessing(unittest.TestCase):
         }]}
 
         # Llamar a la función
-        result = self.service.validate_is_reprocessing(event)
+        result = self.service.validate_is_reprocessing(SQSEventEnvelope(event["Records"][0]))
 
         # Verificar que la función devuelve False
         self.assertFalse(result)
@@ -1033,7 +1310,7 @@ class TestValidateIsReprocessing(unittest.TestCase):
         }]}
 
         # Llamar a la función
-        result = self.service.validate_is_reprocessing(event)
+        result = self.service.validate_is_reprocessing(SQSEventEnvelope(event["Records"][0]))
 
         # Verificar que la función devuelve False
         self.assertFalse(result)
@@ -1049,7 +1326,7 @@ class TestValidateIsReprocessing(unittest.TestCase):
         }]}
 
         # Llamar a la función
-        result = self.service.validate_file_id_and_response_processing_id(event)
+        result = self.service.validate_file_id_and_response_processing_id(SQSEventEnvelope(event["Records"][0]))
 
         # Verificar que la función devuelve True
         self.assertTrue(result)
@@ -1065,7 +1342,7 @@ class TestValidateIsReprocessing(unittest.TestCase):
         }]}
 
         # Llamar a la función
-        result = self.service.validate_file_id_and_response_processing_id(event)
+        result = self.service.validate_file_id_and_response_processing_id(SQSEventEnvelope(event["Records"][0]))
 
         # Verificar que la función devuelve False
         self.assertFalse(result)
@@ -1098,7 +1375,7 @@ class TestValidateIsReprocessing(unittest.TestCase):
 
         # Llamar a la función
         result = self.service.process_existing_files(
-            event, "test_bucket", "test_receipt_handle")
+            SQSEventEnvelope(event["Records"][0]), "test_bucket", "test_receipt_handle")
 
         # Verificar que la función devuelve True
         self.assertTrue(result)
@@ -1122,6 +1399,8 @@ class TestValidateIsReprocessing(unittest.TestCase):
         """
 
         mock_get_estado_archivo.return_value = "EN_PROCESO"
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo = MagicMock()
+        self.service.rta_procesamiento_repository = MagicMock()
         # Datos de entrada
         event = {"Records": [{
             "body": "{\"file_id\": 1, \"response_processing_id\": 2 }",
@@ -1129,5 +1408,10 @@ class TestValidateIsReprocessing(unittest.TestCase):
         }]}
 
         # Llamar a la función
-        result = self.service.handle_reprocessing_with_ids(event, "test")
+        result = self.service.handle_reprocessing_with_ids(SQSEventEnvelope(event["Records"][0]), "test")
+
+        # El estado y el contador de la última respuesta se actualizan en una sola sentencia
+        self.service.rta_procesamiento_repository.restart_last_rta_procesamiento.assert_called_once_with(
+            1, env.CONST_ESTADO_INICIADO
+        )
 
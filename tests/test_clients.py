@@ -2,7 +2,8 @@ import json
 import unittest
 from unittest.mock import patch, MagicMock
 from botocore.exceptions import ClientError
-from src.services.aws_clients_service import AWSClients
+from src.services.aws_clients_service import AWSClients, remote_config_cache
+from src.utils.ttl_cache import TTLCache
 
 
 class TestAWSClients(unittest.TestCase):
@@ -106,3 +107,58 @@ class TestAWSClients(unittest.TestCase):
         secret = AWSClients.get_secret('test_secret')
         self.assertEqual(secret, {})
         mock_client.get_secret_value.assert_called_once_with(SecretId='test_secret')
+
+    @patch('src.services.aws_clients_service.AWSClients.get_secrets_manager_client')
+    def test_get_cached_secret(self, mock_get_client):
+        remote_config_cache.invalidate()
+        mock_client = MagicMock()
+        mock_get_client.return_value = mock_client
+        mock_client.get_secret_value.side_effect = [
+            {"SecretString": json.dumps({"PASSWORD": "old"})},
+            {"SecretString": json.dumps({"PASSWORD": "new"})},
+        ]
+
+        # Las lecturas sucesivas se sirven desde la caché
+        self.assertEqual(AWSClients.get_cached_secret("db_secret"), {"PASSWORD": "old"})
+        self.assertEqual(AWSClients.get_cached_secret("db_secret"), {"PASSWORD": "old"})
+        mock_client.get_secret_value.assert_called_once_with(SecretId="db_secret")
+
+        # El refresco forzado vuelve a consultar Secrets Manager
+        self.assertEqual(AWSClients.get_cached_secret("db_secret", force_refresh=True), {"PASSWORD": "new"})
+        self.assertEqual(AWSClients.get_cached_secret("db_secret"), {"PASSWORD": "new"})
+
+    @patch('src.services.aws_clients_service.AWSClients.get_ssm_client')
+    def test_get_cached_parameter_client_error(self, mock_get_client):
+        remote_config_cache.invalidate()
+        mock_client = MagicMock()
+        mock_get_client.return_value = mock_client
+        mock_client.get_parameter.side_effect = [
+            ClientError({"Error": {"Code": "ThrottlingException"}}, "GetParameter"),
+            {"Parameter": {"Value": "valor"}},
+        ]
+
+        # El error se propaga y no queda almacenado en la caché
+        with self.assertRaises(ClientError):
+            AWSClients.get_cached_parameter("my_parameter")
+        self.assertEqual(AWSClients.get_cached_parameter("my_parameter"), "valor")
+
+    @patch('src.utils.ttl_cache.threading.Thread')
+    @patch('src.utils.ttl_cache.time.monotonic')
+    def test_ttl_cache_stale_while_revalidate(self, mock_monotonic, mock_thread):
+        cache = TTLCache(ttl_seconds=10, stale_seconds=30)
+        loader = MagicMock(side_effect=["v1", "v2"])
+
+        mock_monotonic.return_value = 100
+        cache.get("key", loader)
+
+        # Dentro de la ventana de obsolescencia se entrega el valor anterior y se recarga en segundo plano
+        mock_monotonic.return_value = 115
+        self.assertEqual(cache.get("key", loader), "v1")
+        self.assertEqual(cache.get("key", loader), "v1")
+        mock_thread.assert_called_once()
+        mock_thread.return_value.start.assert_called_once()
+
+        # El hilo de recarga actualiza el valor
+        cache._refresh("key", loader)
+        self.assertEqual(cache.get("key", loader), "v2")
+
@@ -1,6 +1,6 @@
 import unittest
 from unittest.mock import MagicMock
-from src.core.archivo_controller import process_sqs_message
+from src.core.archivo_controller import process_sqs_message, process_sqs_message_concurrently
 from src.services.archivo_service import ArchivoService
 from sqlalchemy.orm import Session
 
@@ -41,3 +41,37 @@ class TestArchivoController(unittest.TestCase):
                 process_sqs_message(self.event, self.db_mock)
 
             self.assertIn("Error en el procesamiento del archivo", str(context.exception))
+
+    def test_process_sqs_message_concurrently_sesion_por_registro(self):
+        event = {"Records": [{"messageId": "msg-1"}, {"messageId": "msg-2"}, {"messageId": "msg-3"}]}
+        dal_mock = MagicMock()
+        self.archivo_service_mock.procesar_mensaje.side_effect = (
+            lambda envelope: envelope.message_id != "msg-2"
+        )
+
+        with unittest.mock.patch('src.core.archivo_controller.ArchivoService',
+                                 return_value=self.archivo_service_mock):
+            failed = process_sqs_message_concurrently(event, dal_mock, max_workers=2)
+
+        # Cada registro se procesa con una sesión propia y solo se reporta el fallido
+        self.assertEqual(dal_mock.new_session_scope.call_count, 3)
+        self.assertEqual(self.archivo_service_mock.procesar_mensaje.call_count, 3)
+        self.assertEqual(failed, ["msg-2"])
+
+    def test_process_sqs_message_concurrently_error_en_sesion(self):
+        event = {"Records": [{"messageId": "msg-1"}, {"messageId": "msg-2"}]}
+        dal_mock = MagicMock()
+        dal_mock.new_session_scope.return_value.__exit__.side_effect = [Exception("commit fallido"), False]
+        self.archivo_service_mock.procesar_mensaje.return_value = True
+
+        with unittest.mock.patch('src.core.archivo_controller.ArchivoService',
+                                 return_value=self.archivo_service_mock):
+            failed = process_sqs_message_concurrently(event, dal_mock, max_workers=1)
+
+        self.assertEqual(failed, ["msg-1"])
+
+    def test_process_sqs_message_concurrently_sin_registros(self):
+        dal_mock = MagicMock()
+
+        self.assertEqual(process_sqs_message_concurrently({"Records": []}, dal_mock, max_workers=4), [])
+        dal_mock.new_session_scope.assert_not_called()
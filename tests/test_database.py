@@ -1,6 +1,10 @@
 import unittest
 from unittest.mock import patch, MagicMock
-from src.services.database_service import DataAccessLayer
+from sqlalchemy.exc import DisconnectionError, SQLAlchemyError
+from src.services.database_service import (
+    DataAccessLayer, UnitOfWork, PoolCheckoutMetrics, TimedNullPool, TimedQueuePool, get_pool_options,
+    ping_if_idle, bootstrap_schema, check_schema_version,
+)
 
 
 class TestDataAccessLayer(unittest.TestCase):
@@ -12,10 +16,13 @@ class TestDataAccessLayer(unittest.TestCase):
         'DB_NAME': 'test_db',
         'SECRETS_DB': 'test_secret'
     })
-    @patch('src.services.aws_clients_service.AWSClients.get_secret')
+    @patch('src.services.aws_clients_service.AWSClients.get_cached_secret')
+    @patch('src.services.database_service.check_schema_version')
+    @patch('src.services.database_service.event')
     @patch('src.services.database_service.create_engine')
     @patch('src.services.database_service.sessionmaker')
-    def test_connection_success(self, mock_sessionmaker, mock_create_engine, mock_get_secret):
+    def test_connection_success(self, mock_sessionmaker, mock_create_engine, mock_event, mock_check_schema_version,
+                                mock_get_secret):
         # Configura el secreto simulado
         mock_get_secret.return_value = {
             "USERNAME": 'test_user',
@@ -37,6 +44,9 @@ class TestDataAccessLayer(unittest.TestCase):
         self.assertIsNotNone(dal.engine)
         self.assertIsNotNone(dal.session)
 
+        # En el arranque solo se verifica la versión del esquema, sin crear tablas
+        mock_check_schema_version.assert_called_once_with(mock_engine)
+
         # Cierra la sesión
         dal.close_session()
 
@@ -48,7 +58,7 @@ class TestDataAccessLayer(unittest.TestCase):
         'DB_NAME': 'test_db',
         'SECRETS_DB': 'test_secret'
     })
-    @patch('src.services.aws_clients_service.AWSClients.get_secret')
+    @patch('src.services.aws_clients_service.AWSClients.get_cached_secret')
     def test_connection_failure(self, mock_get_secret):
         # Simula que se produce un error al obtener secretos
         mock_get_secret.side_effect = Exception("Failed to get secrets")
@@ -74,3 +84,131 @@ class TestDataAccessLayer(unittest.TestCase):
             # Verifica que se haya llamado el método commit
             yield self.mock_session
             self.mock_session.commit.assert_called_once()
+
+    @patch('src.services.aws_clients_service.AWSClients.get_cached_secret')
+    def test_connect_refreshes_credentials_on_authentication_failure(self, mock_get_secret):
+        # La primera conexión falla con las credenciales en caché y la segunda usa el secreto refrescado
+        mock_get_secret.side_effect = [
+            {"USERNAME": "user", "PASSWORD": "old_password"},
+            {"USERNAME": "user", "PASSWORD": "new_password"},
+        ]
+        mock_dialect = MagicMock()
+        mock_connection = MagicMock()
+        mock_dialect.connect.side_effect = [
+            Exception('FATAL: password authentication failed for user "user"'),
+            mock_connection,
+        ]
+        cparams = {"host": "localhost"}
+
+        connection = DataAccessLayer._connect_with_current_credentials(mock_dialect, MagicMock(), [], cparams)
+
+        self.assertIs(connection, mock_connection)
+        self.assertEqual(mock_get_secret.call_args_list[1].kwargs, {"force_refresh": True})
+        self.assertEqual(mock_dialect.connect.call_args.kwargs["password"], "new_password")
+
+    @patch('src.services.aws_clients_service.AWSClients.get_cached_secret')
+    def test_connect_does_not_refresh_on_other_errors(self, mock_get_secret):
+        mock_get_secret.return_value = {"USERNAME": "user", "PASSWORD": "password"}
+        mock_dialect = MagicMock()
+        mock_dialect.connect.side_effect = Exception("could not connect to server")
+
+        with self.assertRaises(Exception):
+            DataAccessLayer._connect_with_current_credentials(mock_dialect, MagicMock(), [], {})
+
+        mock_get_secret.assert_called_once()
+
+
+class TestUnitOfWork(unittest.TestCase):
+    def test_checkpoint_commits_pending_changes(self):
+        session = MagicMock()
+
+        UnitOfWork(session).checkpoint("prueba")
+
+        session.commit.assert_called_once()
+        session.rollback.assert_not_called()
+
+    def test_checkpoint_rolls_back_on_error(self):
+        session = MagicMock()
+        session.commit.side_effect = SQLAlchemyError("commit fallido")
+
+        with self.assertRaises(SQLAlchemyError):
+            UnitOfWork(session).checkpoint("prueba")
+
+        session.rollback.assert_called_once()
+
+
+class TestPoolOptions(unittest.TestCase):
+    def test_null_strategy(self):
+        self.assertEqual(get_pool_options("null"), {"poolclass": TimedNullPool})
+
+    @patch('src.services.database_service.env')
+    def test_single_strategy_sizes_overflow_for_concurrent_records(self, mock_env):
+        mock_env.MAX_CONCURRENT_RECORDS = 4
+        mock_env.DB_POOL_RECYCLE_SECONDS = 300
+
+        options = get_pool_options("single")
+
+        self.assertIs(options["poolclass"], TimedQueuePool)
+        self.assertEqual(options["pool_size"], 1)
+        self.assertEqual(options["max_overflow"], 3)
+        self.assertEqual(options["pool_recycle"], 300)
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            get_pool_options("otro")
+
+    @patch('src.services.database_service.env')
+    def test_ping_skipped_for_recently_used_connection(self, mock_env):
+        mock_env.DB_POOL_PRE_PING_IDLE_SECONDS = 60
+        dbapi_connection = MagicMock()
+        connection_record = MagicMock(info={"idle_since": 10**9})
+
+        with patch('src.services.database_service.time.monotonic', return_value=10**9 + 5):
+            ping_if_idle(dbapi_connection, connection_record, MagicMock())
+
+        dbapi_connection.cursor.assert_not_called()
+
+    @patch('src.services.database_service.env')
+    def test_ping_idle_connection_discards_broken_one(self, mock_env):
+        mock_env.DB_POOL_PRE_PING_IDLE_SECONDS = 60
+        dbapi_connection = MagicMock()
+        dbapi_connection.cursor.return_value.execute.side_effect = Exception("server closed the connection")
+        connection_record = MagicMock(info={"idle_since": 10**9})
+
+        with patch('src.services.database_service.time.monotonic', return_value=10**9 + 120):
+            with self.assertRaises(DisconnectionError):
+                ping_if_idle(dbapi_connection, connection_record, MagicMock())
+
+        dbapi_connection.cursor.return_value.close.assert_called_once()
+
+    def test_checkout_metrics(self):
+        metrics = PoolCheckoutMetrics()
+        metrics.record(0.5)
+        metrics.record(0.25)
+
+        self.assertEqual(metrics.snapshot(reset=True),
+                         {"checkouts": 2, "total_wait_seconds": 0.75, "max_wait_seconds": 0.5})
+        self.assertEqual(metrics.snapshot()["checkouts"], 0)
+
+
+class TestSchemaBootstrap(unittest.TestCase):
+    def setUp(self):
+        from sqlalchemy import create_engine
+        self.engine = create_engine("sqlite://")
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def test_check_fails_before_bootstrap(self):
+        self.assertFalse(check_schema_version(self.engine))
+
+    def test_bootstrap_creates_schema_and_indexes(self):
+        from sqlalchemy import inspect
+
+        bootstrap_schema(self.engine)
+        # Una segunda ejecución no falla ni duplica la versión
+        bootstrap_schema(self.engine)
+
+        self.assertTrue(check_schema_version(self.engine))
+        index_names = {index["name"] for index in inspect(self.engine).get_indexes("cgd_rta_procesamiento")}
+        self.assertIn("ix_cgd_rta_procesamiento_id_archivo_zip", index_names)
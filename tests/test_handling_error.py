@@ -34,7 +34,8 @@ class TestErrorHandlingService(unittest.TestCase):
         self.service.s3_utils.move_file_to_rechazados = MagicMock()
         self.service.archivo_validator.is_not_processed_state = MagicMock()
         self.service.rta_procesamiento_repository.update_state_rta_procesamiento = MagicMock()
-        self.service.archivo_repository.update_estado_archivo = MagicMock()
+        self.service.archivo_repository.update_estado_archivo_by_id = MagicMock()
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo = MagicMock()
 
     @patch("src.utils.sqs_utils.send_message_to_sqs")
     @patch("src.utils.sqs_utils.delete_message_from_sqs")
@@ -74,6 +75,9 @@ class TestErrorHandlingService(unittest.TestCase):
         # Verificar que se movió el archivo a la carpeta de rechazados
         self.service.s3_utils.move_file_to_rechazados.assert_called_once_with(bucket, filekey)
 
+        # Los cambios pendientes se confirman junto con el movimiento del archivo
+        self.mock_db.commit.assert_called_once()
+
         # Verificar que se obtuvo el error del catálogo
         self.service.catalogo_error_repository.get_error_by_code.assert_called_once_with(codigo_error)
 
@@ -106,8 +110,11 @@ class TestErrorHandlingService(unittest.TestCase):
         )
 
         # Verificar que se actualizó el estado del archivo a "PROCESAMIENTO_RECHAZADO"
-        self.service.archivo_repository.update_estado_archivo.assert_called_once_with(
-            file_name,
+        self.service.archivo_repository.update_estado_archivo_by_id.assert_called_once_with(
+            id_archivo,
             env.CONST_ESTADO_PROCESAMIENTO_RECHAZADO,
-            contador_intentos_cargue=contador_intentos_cargue
+            contador_intentos_cargue=contador_intentos_cargue,
         )
+
+        # El ID recibido basta para actualizar el archivo, sin volver a consultarlo
+        self.service.archivo_repository.get_archivo_resumen_by_nombre_archivo.assert_not_called()
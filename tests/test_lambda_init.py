@@ -20,6 +20,7 @@ class TestLambdaInit(unittest.TestCase):
         # Configurar los mocks
         mock_env.APP_ENV = "dev"
         mock_env.DEBUG_MODE = True
+        mock_env.MAX_CONCURRENT_RECORDS = 1
         mock_logger = MagicMock()
         mock_get_logger.return_value = mock_logger
         mock_dal_instance = MagicMock()
@@ -46,6 +47,7 @@ class TestLambdaInit(unittest.TestCase):
         # Configurar los mocks
         mock_env.APP_ENV = "production"
         mock_env.DEBUG_MODE = False
+        mock_env.MAX_CONCURRENT_RECORDS = 1
         mock_logger = MagicMock()
         mock_get_logger.return_value = mock_logger
         mock_dal_instance = MagicMock()
@@ -73,6 +75,7 @@ class TestLambdaInit(unittest.TestCase):
         # Configurar los mocks
         mock_env.APP_ENV = "dev"
         mock_env.DEBUG_MODE = True
+        mock_env.MAX_CONCURRENT_RECORDS = 1
         mock_logger = MagicMock()
         mock_get_logger.return_value = mock_logger
         mock_dal_instance = MagicMock()
@@ -90,3 +93,71 @@ class TestLambdaInit(unittest.TestCase):
             initialize_lambda(event, context)
 
         mock_logger.error.assert_called_once_with("Error al inicializar la Lambda: Error processing message")
+
+    @patch('src.config.lambda_init.env')
+    @patch('src.config.lambda_init.DataAccessLayer')
+    @patch('src.config.lambda_init.process_sqs_message')
+    @patch('src.config.lambda_init.get_logger')
+    def test_initialize_lambda_batch_item_failures(self, mock_get_logger, mock_process_sqs_message,
+                                                   mock_DataAccessLayer, mock_env):
+        # Configurar los mocks
+        mock_env.APP_ENV = "production"
+        mock_env.DEBUG_MODE = False
+        mock_env.MAX_CONCURRENT_RECORDS = 1
+        mock_get_logger.return_value = MagicMock()
+        mock_DataAccessLayer.return_value = MagicMock()
+        mock_process_sqs_message.return_value = ["msg-2"]
+
+        # Ejecutar la función
+        event = {"Records": [{"messageId": "msg-1"}, {"messageId": "msg-2"}]}
+        response = initialize_lambda(event, {})
+
+        # Verificar que solo se reportan los registros fallidos
+        self.assertEqual(response, {"batchItemFailures": [{"itemIdentifier": "msg-2"}]})
+
+    @patch('src.utils.sqs_utils.AWSClients.get_sqs_client')
+    @patch('src.config.lambda_init.env')
+    @patch('src.config.lambda_init.DataAccessLayer')
+    @patch('src.config.lambda_init.process_sqs_message')
+    @patch('src.config.lambda_init.get_logger')
+    def test_initialize_lambda_no_manual_deletes(self, mock_get_logger, mock_process_sqs_message,
+                                                 mock_DataAccessLayer, mock_env, mock_get_sqs_client):
+        mock_env.APP_ENV = "production"
+        mock_env.DEBUG_MODE = False
+        mock_env.MAX_CONCURRENT_RECORDS = 1
+        mock_process_sqs_message.return_value = ["msg-2"]
+
+        event = {"Records": [{"messageId": "msg-1", "receiptHandle": "rh-1"},
+                             {"messageId": "msg-2", "receiptHandle": "rh-2"}]}
+        response = initialize_lambda(event, {})
+
+        # Los registros consumidos los elimina Lambda a partir de la respuesta de fallos parciales
+        self.assertEqual(response, {"batchItemFailures": [{"itemIdentifier": "msg-2"}]})
+        mock_get_sqs_client.return_value.delete_message.assert_not_called()
+        mock_get_sqs_client.return_value.delete_message_batch.assert_not_called()
+
+    @patch('src.config.lambda_init.env')
+    @patch('src.config.lambda_init.DataAccessLayer')
+    @patch('src.config.lambda_init.process_sqs_message_concurrently')
+    @patch('src.config.lambda_init.process_sqs_message')
+    @patch('src.config.lambda_init.get_logger')
+    def test_initialize_lambda_concurrent_mode(self, mock_get_logger, mock_process_sqs_message,
+                                               mock_process_concurrently, mock_DataAccessLayer, mock_env):
+        # Configurar los mocks
+        mock_env.APP_ENV = "production"
+        mock_env.DEBUG_MODE = False
+        mock_env.MAX_CONCURRENT_RECORDS = 4
+        mock_get_logger.return_value = MagicMock()
+        mock_dal_instance = MagicMock()
+        mock_DataAccessLayer.return_value = mock_dal_instance
+        mock_process_concurrently.return_value = ["msg-1"]
+
+        # Ejecutar la función
+        event = {"Records": [{"messageId": "msg-1"}, {"messageId": "msg-2"}]}
+        response = initialize_lambda(event, {})
+
+        # Verificar que se usa el modo concurrente
+        mock_process_concurrently.assert_called_once_with(event, mock_dal_instance, 4)
+        mock_process_sqs_message.assert_not_called()
+        mock_dal_instance.session_scope.assert_not_called()
+        self.assertEqual(response, {"batchItemFailures": [{"itemIdentifier": "msg-1"}]})
@@ -5,14 +5,14 @@ from src.models.cgd_error_catalogo import CGDCatalogoErrores
 from src.models.cgd_correo_parametro import CGDCorreosParametros
 from src.models.cgd_rta_pro_archivos import CGDRtaProArchivos
 from src.repositories.archivo_estado_repository import ArchivoEstadoRepository
-from src.repositories.archivo_repository import ArchivoRepository
+from src.repositories.archivo_repository import ArchivoRepository, ArchivoResumen
 from src.repositories.catalogo_error_repository import CatalogoErrorRepository
 from datetime import datetime
 from src.repositories.cgd_rta_pro_archivos_repository import CGDRtaProArchivosRepository
 from src.repositories.correo_parametro_repository import CorreoParametroRepository
 from unittest.mock import patch, MagicMock
 from sqlalchemy.orm import Session
-from src.repositories.rta_procesamiento_repository import RtaProcesamientoRepository
+from src.repositories.rta_procesamiento_repository import RtaProcesamientoRepository, ProcessingResponseNotFoundError
 from src.models.cgd_rta_procesamiento import CGDRtaProcesamiento
 
 
@@ -34,11 +34,24 @@ class TestArchivoEstadoRepository(unittest.TestCase):
         # Insertar un nuevo estado de archivo
         self.repo.insert_estado_archivo(1, 'PENDIENTE', 'PROCESANDO')
 
-        # Verificar que se haya llamado a add, commit y refresh
+        # Verificar que se haya llamado a add, flush y refresh, sin confirmar la transacción
         self.mock_db.add.assert_called_once()
-        self.mock_db.commit.assert_called_once()
+        self.mock_db.flush.assert_called_once()
+        self.mock_db.commit.assert_not_called()
         self.mock_db.refresh.assert_called_once()
 
+    def test_insert_estado_archivo_duplicate_key(self):
+        from sqlalchemy.exc import IntegrityError
+
+        self.mock_db.flush.side_effect = IntegrityError(
+            "INSERT", {}, Exception("duplicate key value violates unique constraint DETAIL: id_archivo=1"))
+
+        with self.assertRaises(ValueError):
+            self.repo.insert_estado_archivo(1, 'PENDIENTE', 'PROCESANDO')
+
+        # La unidad de trabajo decide si se descartan los cambios pendientes
+        self.mock_db.rollback.assert_not_called()
+
 
 class TestArchivoRepository(unittest.TestCase):
     def setUp(self):
@@ -104,33 +117,46 @@ class TestArchivoRepository(unittest.TestCase):
         self.assertEqual(archivo_existente.estado, estado_nuevo)
         self.assertEqual(archivo_existente.contador_intentos_cargue, contador_intentos_cargue)
 
-        # Verificar que se haya hecho un commit en la base de datos
-        self.mock_db.commit.assert_called_once()
+        # Verificar que se enviaron los cambios sin confirmar la transacción
+        self.mock_db.flush.assert_called_once()
+        self.mock_db.commit.assert_not_called()
 
-    def test_check_special_file_exists_true(self):
-        acg_nombre_archivo = "special_file.txt"
-        tipo_archivo = "01"
-        expected_archivo = CGDArchivo(id_archivo=1, acg_nombre_archivo=acg_nombre_archivo, tipo_archivo=tipo_archivo)
+    def test_get_archivo_resumen_by_nombre_archivo_found(self):
+        nombre_archivo = "test_file.txt"
+        fecha_recepcion = datetime(2024, 1, 1)
+        row = (1, nombre_archivo, "ENVIADO", fecha_recepcion, "01", 0)
 
-        self.mock_db.query.return_value.filter.return_value.first.return_value = expected_archivo
+        self.mock_db.query.return_value.filter.return_value.first.return_value = row
 
-        result = self.repo.check_special_file_exists(acg_nombre_archivo, tipo_archivo)
+        result = self.repo.get_archivo_resumen_by_nombre_archivo(nombre_archivo)
 
-        # Verificar que el resultado sea True
-        self.assertTrue(result)
-
-    def test_check_special_file_exists_false(self):
-        acg_nombre_archivo = "non_existent_special_file.txt"
-        tipo_archivo = "01"
+        # Verificar que solo se consultan las columnas del resumen
+        self.assertEqual(len(self.mock_db.query.call_args.args), len(ArchivoResumen._fields))
+        self.assertEqual(result, ArchivoResumen(1, nombre_archivo, "ENVIADO", fecha_recepcion, "01", 0))
+        self.assertEqual(result.id_archivo, 1)
 
-        # Simular el comportamiento del método de consulta
+    def test_get_archivo_resumen_by_nombre_archivo_not_found(self):
         self.mock_db.query.return_value.filter.return_value.first.return_value = None
 
-        # Llamar al método que estamos probando
-        result = self.repo.check_special_file_exists(acg_nombre_archivo, tipo_archivo)
+        self.assertIsNone(self.repo.get_archivo_resumen_by_nombre_archivo("non_existent_file.txt"))
 
-        # Verificar que el resultado sea False
-        self.assertFalse(result)
+    def test_update_estado_archivo_by_id(self):
+        self.repo.update_estado_archivo_by_id(1, "CARGADO", 2)
+
+        # Verificar que se ejecuta un único UPDATE sin consultar la entidad ni confirmar la transacción
+        self.mock_db.execute.assert_called_once()
+        self.mock_db.query.assert_not_called()
+        self.mock_db.commit.assert_not_called()
+
+    def test_archivo_resumen_from_archivo(self):
+        archivo = CGDArchivo(id_archivo=1, acg_nombre_archivo="test_file.txt", estado="INICIADO",
+                             tipo_archivo="01", contador_intentos_cargue=1)
+
+        resumen = ArchivoResumen.from_archivo(archivo)
+
+        self.assertEqual(resumen.id_archivo, 1)
+        self.assertEqual(resumen.estado, "INICIADO")
+        self.assertEqual(resumen.contador_intentos_cargue, 1)
 
     def test_insert_archivo(self):
         archivo = CGDArchivo(id_archivo=1, acg_nombre_archivo="new_file.txt")
@@ -141,8 +167,9 @@ class TestArchivoRepository(unittest.TestCase):
         # Verificar que se agregó el archivo a la base de datos
         self.mock_db.add.assert_called_once_with(archivo)
 
-        # Verificar que se hizo commit a la base de datos
-        self.mock_db.commit.assert_called_once()
+        # Verificar que se enviaron los cambios sin confirmar la transacción
+        self.mock_db.flush.assert_called_once()
+        self.mock_db.commit.assert_not_called()
 
 
 class TestCatalogoErrorRepository(unittest.TestCase):
@@ -173,30 +200,6 @@ class TestCGDRtaProArchivosRepository(unittest.TestCase):
         self.mock_db = MagicMock(spec=Session)
         self.repo = CGDRtaProArchivosRepository(self.mock_db)
 
-    def test_insert(self):
-        # Configura un archivo de prueba
-        archivo = CGDRtaProArchivos(
-            id_archivo=1,
-            id_rta_procesamiento=1,
-            nombre_archivo="archivo_prueba.txt",
-            tipo_archivo_rta="tipo_1",
-            estado=env.CONST_ESTADO_INIT_PENDING,  # Asegúrate de que el estado sea correcto
-            contador_intentos_cargue=0,
-            nro_total_registros=100,
-            nro_registros_error=0,
-            nro_registros_validos=100,
-            codigo_error=None,
-            detalle_error=None
-        )
-
-        # Inserta el archivo de prueba
-        self.repo.insert(archivo)
-
-        # Verifica que se haya llamado a add, commit y refresh
-        self.mock_db.add.assert_called_once()
-        self.mock_db.commit.assert_called_once()
-        self.mock_db.refresh.assert_called_once()
-
     def test_get_pending_files_by_id_archivo(self):
         id_archivo = 1
         expected_file = CGDRtaProArchivos(id_archivo=id_archivo)
@@ -207,17 +210,58 @@ class TestCGDRtaProArchivosRepository(unittest.TestCase):
 
         self.assertEqual(result, expected_file)
 
-    def test_update_estado_to_enviado(self):
-        id_archivo = 1
-        nombre_archivo = "archivo_prueba.txt"
-        expected_file = CGDRtaProArchivos(id_archivo=id_archivo, nombre_archivo=nombre_archivo)
+    def test_insert_many(self):
+        archivos = [
+            {"id_archivo": 1, "id_rta_procesamiento": 1, "nombre_archivo": f"file{index}-01.txt",
+             "tipo_archivo_rta": "01", "estado": env.CONST_ESTADO_INIT_PENDING, "contador_intentos_cargue": 0}
+            for index in range(3)
+        ]
+
+        self.repo.insert_many(archivos)
+
+        # Todos los registros se insertan con una sola sentencia de varias filas
+        self.mock_db.execute.assert_called_once()
+        statement = self.mock_db.execute.call_args.args[0].compile()
+        self.assertTrue(str(statement).startswith("INSERT INTO cgd_rta_pro_archivos"))
+        self.assertEqual(statement.params["nombre_archivo_m2"], "file2-01.txt")
+        self.mock_db.commit.assert_not_called()
+
+    def test_insert_many_empty(self):
+        self.repo.insert_many([])
+
+        self.mock_db.execute.assert_not_called()
+
+    def test_update_estados_to_enviado(self):
+        self.repo.update_estados_to_enviado(1, ["file1-01.txt", "file2-02.txt"])
 
-        self.mock_db.query.return_value.filter.return_value.first.return_value = expected_file
+        self.mock_db.execute.assert_called_once()
+        statement = self.mock_db.execute.call_args.args[0].compile()
+        self.assertTrue(str(statement).startswith("UPDATE cgd_rta_pro_archivos SET estado"))
+        self.assertEqual(statement.params["estado"], env.CONST_ESTADO_SEND)
 
-        self.repo.update_estado_to_enviado(id_archivo, nombre_archivo)
+    def test_update_estados_to_enviado_only_pending_attempt(self):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from src.models.base import Base
+        from src.models.cgd_correos_plantilla import CGDCorreosPlantillas  # noqa: F401
 
-        self.assertEqual(expected_file.estado, env.CONST_ESTADO_SEND)
-        self.mock_db.commit.assert_called_once()
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        # El mismo archivo existe en un intento anterior ya procesado y en el intento pendiente
+        for id_rta_procesamiento, estado in ((1, env.CONST_ESTADO_PROCESSED), (2, env.CONST_ESTADO_INIT_PENDING)):
+            db.add(CGDRtaProArchivos(
+                id_archivo=1, id_rta_procesamiento=id_rta_procesamiento, nombre_archivo="file1-01.txt",
+                tipo_archivo_rta="01", estado=estado, contador_intentos_cargue=0))
+        db.flush()
+
+        CGDRtaProArchivosRepository(db).update_estados_to_enviado(1, ["file1-01.txt"])
+
+        estados = db.query(CGDRtaProArchivos.id_rta_procesamiento, CGDRtaProArchivos.estado).order_by(
+            CGDRtaProArchivos.id_rta_procesamiento).all()
+        self.assertEqual(estados, [(1, env.CONST_ESTADO_PROCESSED), (2, env.CONST_ESTADO_SEND)])
+        db.close()
+        engine.dispose()
 
 
 class TestCorreoParametroRepository(unittest.TestCase):
@@ -244,7 +288,7 @@ class TestCorreoParametroRepository(unittest.TestCase):
         self.assertEqual(result, expected_parameters)
 
 
-class TestCGDRtaProArchivosRepository(unittest.TestCase):
+class TestCGDRtaProArchivosRepositoryFilesLoaded(unittest.TestCase):
     def setUp(self):
         # Crear un mock de la sesión de la base de datos
         self.db_mock = MagicMock(spec=Session)
@@ -291,29 +335,143 @@ class TestRtaProcesamientoRepository(unittest.TestCase):
         self.db_mock = MagicMock(spec=Session)
         self.repository = RtaProcesamientoRepository(self.db_mock)
 
-    def test_update_contador_intentos_cargue(self):
-        # Datos de prueba
-        id_archivo = 123
-        contador_intentos_cargue = 5
+    def test_insert_next_rta_procesamiento_retries_on_duplicate_id(self):
+        from sqlalchemy.exc import IntegrityError
 
-        # Crear un mock del objeto CGDRtaProcesamiento
-        mock_rta_procesamiento = MagicMock(spec=CGDRtaProcesamiento)
-        mock_rta_procesamiento.id_archivo = id_archivo
-        mock_rta_procesamiento.contador_intentos_cargue = 3  # Valor inicial
+        # El primer intento choca con el ID asignado por otro consumidor
+        self.db_mock.execute.side_effect = [
+            IntegrityError("INSERT", {}, Exception("duplicate key")),
+            MagicMock(first=MagicMock(return_value=(2, "INICIADO", 1))),
+        ]
 
-        # Configurar el mock para get_last_rta_procesamiento
-        self.repository.get_last_rta_procesamiento = MagicMock(return_value=mock_rta_procesamiento)
+        result = self.repository.insert_next_rta_procesamiento(1, "a.zip", "01", "INICIADO")
 
-        # Llamar a la función
-        self.repository.update_contador_intentos_cargue(id_archivo, contador_intentos_cargue)
+        self.assertEqual(result.id_rta_procesamiento, 2)
+        self.assertEqual(self.db_mock.begin_nested.call_count, 2)
+        self.db_mock.rollback.assert_not_called()
 
-        # Verificar que se actualizó el valor
-        self.assertEqual(mock_rta_procesamiento.contador_intentos_cargue, contador_intentos_cargue)
+    def test_insert_next_rta_procesamiento_gives_up(self):
+        from sqlalchemy.exc import IntegrityError
 
-        # Verificar que se llamaron commit y refresh
-        self.db_mock.commit.assert_called_once()
-        self.db_mock.refresh.assert_called_once_with(mock_rta_procesamiento)
+        self.db_mock.execute.side_effect = IntegrityError("INSERT", {}, Exception("duplicate key"))
 
-        # Verificar que get_last_rta_procesamiento fue llamado con el id correcto
-        self.repository.get_last_rta_procesamiento.assert_called_once_with(id_archivo)
+        with self.assertRaises(IntegrityError):
+            self.repository.insert_next_rta_procesamiento(1, "a.zip", "01", "INICIADO")
 
+
+class TestRepositoryQueryPlans(unittest.TestCase):
+    """
+    Verifica con EXPLAIN QUERY PLAN de SQLite que las consultas de los repositorios usan índices
+    en lugar de recorrer las tablas completas.
+    """
+
+    def setUp(self):
+        from sqlalchemy import create_engine, event
+        from sqlalchemy.orm import sessionmaker
+        from src.models.base import Base
+        from src.models.cgd_correos_plantilla import CGDCorreosPlantillas  # noqa: F401
+
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        self.statements = []
+
+        @event.listens_for(self.engine, "before_cursor_execute")
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if not statement.startswith("EXPLAIN"):
+                self.statements.append((statement, parameters))
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+
+    def assert_uses_index(self, index_name):
+        statement, parameters = self.statements[-1]
+        with self.engine.connect() as conn:
+            plan = " ".join(
+                str(row[-1]) for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            )
+        self.assertIn(index_name, plan)
+        self.assertNotRegex(plan, r"SCAN (TABLE )?cgd_\w+$")
+
+    def test_archivo_by_nombre_uses_index(self):
+        ArchivoRepository(self.db).get_archivo_resumen_by_nombre_archivo("file.zip")
+        self.assert_uses_index("ix_cgd_archivos_acg_nombre_archivo_tipo_archivo")
+
+    @patch(
+        'src.core.validator.ArchivoValidator._get_file_config_name',
+        return_value=("dummy_config", "dummy_dir", "dummy_prefix", "dummy_suffix"))
+    def test_last_rta_procesamiento_uses_primary_key(self, mock_get_file_config_name):
+        RtaProcesamientoRepository(self.db).get_latest_rta_procesamiento(1)
+        self.assert_uses_index("sqlite_autoindex_cgd_rta_procesamiento_1")
+
+    @patch(
+        'src.core.validator.ArchivoValidator._get_file_config_name',
+        return_value=("dummy_config", "dummy_dir", "dummy_prefix", "dummy_suffix"))
+    def test_rta_procesamiento_by_zip_uses_index(self, mock_get_file_config_name):
+        RtaProcesamientoRepository(self.db).get_latest_rta_procesamiento(1, "file.zip")
+        self.assert_uses_index("ix_cgd_rta_procesamiento_id_archivo_zip")
+
+    def test_pending_files_uses_index(self):
+        CGDRtaProArchivosRepository(self.db).get_pending_files_by_id_archivo(1)
+        self.assert_uses_index("ix_cgd_rta_pro_archivos_id_archivo_estado")
+
+
+class TestRtaProcesamientoRepositoryLatest(unittest.TestCase):
+    @patch(
+        'src.core.validator.ArchivoValidator._get_file_config_name',
+        return_value=("dummy_config", "dummy_dir", "dummy_prefix", "dummy_suffix"))
+    def setUp(self, mock_get_file_config_name):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from src.models.base import Base
+        from src.models.cgd_correos_plantilla import CGDCorreosPlantillas  # noqa: F401
+
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        self.repository = RtaProcesamientoRepository(self.db)
+        for id_rta_procesamiento, nombre_archivo_zip in ((1, "a.zip"), (2, "b.zip")):
+            self.db.add(CGDRtaProcesamiento(
+                id_archivo=1, id_rta_procesamiento=id_rta_procesamiento, nombre_archivo_zip=nombre_archivo_zip,
+                tipo_respuesta="01", fecha_recepcion=datetime.now(), estado=env.CONST_ESTADO_SEND,
+                contador_intentos_cargue=id_rta_procesamiento))
+        self.db.flush()
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+
+    def test_get_latest_rta_procesamiento(self):
+        self.assertEqual(self.repository.get_latest_rta_procesamiento(1).id_rta_procesamiento, 2)
+        self.assertEqual(self.repository.get_latest_rta_procesamiento(1, "a.zip").id_rta_procesamiento, 1)
+        self.assertIsNone(self.repository.get_latest_rta_procesamiento(2))
+
+    def test_restart_last_rta_procesamiento(self):
+        cargada = self.db.query(CGDRtaProcesamiento).filter_by(id_archivo=1, id_rta_procesamiento=2).one()
+
+        result = self.repository.restart_last_rta_procesamiento(1, env.CONST_ESTADO_INICIADO)
+
+        # Solo cambia la última respuesta y la entidad cargada en la sesión queda sincronizada
+        self.assertEqual(result, (2, env.CONST_ESTADO_INICIADO, 3))
+        self.assertEqual(cargada.contador_intentos_cargue, 3)
+        self.assertEqual(self.repository.get_latest_rta_procesamiento(1, "a.zip").estado, env.CONST_ESTADO_SEND)
+
+    def test_restart_last_rta_procesamiento_not_found(self):
+        with self.assertRaises(ProcessingResponseNotFoundError):
+            self.repository.restart_last_rta_procesamiento(2, env.CONST_ESTADO_INICIADO)
+
+    def test_insert_next_rta_procesamiento(self):
+        result = self.repository.insert_next_rta_procesamiento(1, "c.zip", "01", env.CONST_ESTADO_INICIADO)
+        primera = self.repository.insert_next_rta_procesamiento(2, "c.zip", "01", env.CONST_ESTADO_INICIADO)
+
+        # El ID y el contador continúan la última respuesta del archivo, o empiezan en 1
+        self.assertEqual(result, (3, env.CONST_ESTADO_INICIADO, 3))
+        self.assertEqual(primera, (1, env.CONST_ESTADO_INICIADO, 1))
+        self.assertEqual(self.repository.get_latest_rta_procesamiento(1, "c.zip").id_rta_procesamiento, 3)
+
+    def test_update_state_rta_procesamiento_by_id(self):
+        self.repository.update_state_rta_procesamiento_by_id(1, 1, env.CONST_ESTADO_INICIADO)
+
+        self.assertEqual(self.repository.get_latest_rta_procesamiento(1, "a.zip").estado, env.CONST_ESTADO_INICIADO)
+        self.assertEqual(self.repository.get_latest_rta_procesamiento(1, "b.zip").estado, env.CONST_ESTADO_SEND)
@@ -13,7 +13,7 @@ class TestRegisterExtractedFiles(unittest.TestCase):
 
         self.service = CGDRtaProArchivosService(self.mock_db)
         # Mock del repositorio
-        self.service.cgd_rta_pro_archivos_repository.insert = MagicMock()
+        self.service.cgd_rta_pro_archivos_repository.insert_many = MagicMock()
 
     @patch("src.utils.logger_utils")
     def test_register_extracted_files(self, mock_logger):
@@ -33,36 +33,20 @@ class TestRegisterExtractedFiles(unittest.TestCase):
             extracted_files=extracted_files
         )
 
-        # # Verificar que el método insert fue llamado tres veces
-        # self.assertEqual(self.service.cgd_rta_pro_archivos_repository.insert.call_count, 3)
-
-        # Verificar que los datos insertados son correctos
-        expected_calls = [
-            CGDRtaProArchivos(
-                id_archivo=123,
-                id_rta_procesamiento=456,
-                nombre_archivo="file1-01.txt",
-                tipo_archivo_rta="01",
-                estado=env.CONST_ESTADO_INIT_PENDING,
-                contador_intentos_cargue=0
-            ),
-            CGDRtaProArchivos(
-                id_archivo=123,
-                id_rta_procesamiento=456,
-                nombre_archivo="file2-02.txt",
-                tipo_archivo_rta="02",
-                estado=env.CONST_ESTADO_INIT_PENDING,
-                contador_intentos_cargue=0
-            ),
-            CGDRtaProArchivos(
-                id_archivo=123,
-                id_rta_procesamiento=456,
-                nombre_archivo="file3-03.txt",
-                tipo_archivo_rta="03",
-                estado=env.CONST_ESTADO_INIT_PENDING,
-                contador_intentos_cargue=0
-            ),
+        # Verificar que los archivos se insertaron en una sola llamada con los datos correctos
+        expected_entries = [
+            {
+                "id_archivo": 123,
+                "id_rta_procesamiento": 456,
+                "nombre_archivo": f"file{index}-0{index}.txt",
+                "tipo_archivo_rta": f"0{index}",
+                "estado": env.CONST_ESTADO_INIT_PENDING,
+                "contador_intentos_cargue": 0,
+            }
+            for index in (1, 2, 3)
         ]
+        self.service.cgd_rta_pro_archivos_repository.insert_many.assert_called_once_with(expected_entries)
+
 
 class TestSendPendingFilesToQueue(unittest.TestCase):
 
@@ -73,11 +57,11 @@ class TestSendPendingFilesToQueue(unittest.TestCase):
 
         # Mock del repositorio
         self.service.cgd_rta_pro_archivos_repository.get_pending_files_by_id_archivo = MagicMock()
-        self.service.cgd_rta_pro_archivos_repository.update_estado_to_enviado = MagicMock()
+        self.service.cgd_rta_pro_archivos_repository.update_estados_to_enviado = MagicMock()
 
-    @patch("src.utils.sqs_utils.send_message_to_sqs")
+    @patch("src.services.cgd_rta_pro_archivo_service.send_messages_to_sqs_in_batches")
     @patch("src.utils.logger_utils")
-    def test_send_pending_files_to_queue(self, mock_logger, mock_send_message_to_sqs):
+    def test_send_pending_files_to_queue(self, mock_logger, mock_send_messages_in_batches):
         # Datos de entrada
         id_archivo = 123
         queue_url = "https://sqs.us-east-1.amazonaws.com/123456789012/my-queue"
@@ -105,6 +89,7 @@ class TestSendPendingFilesToQueue(unittest.TestCase):
 
         # Configurar el mock para que devuelva los archivos pendientes
         self.service.cgd_rta_pro_archivos_repository.get_pending_files_by_id_archivo.return_value = pending_files
+        mock_send_messages_in_batches.return_value = [True, True]
 
         # Ejecutar la función que se está probando
         self.service.send_pending_files_to_queue_by_id(
@@ -118,6 +103,7 @@ class TestSendPendingFilesToQueue(unittest.TestCase):
 
 
 
+        expected_messages = []
         for file in pending_files:
             expected_message = {
                 "bucket_name": env.S3_BUCKET_NAME,
@@ -126,16 +112,29 @@ class TestSendPendingFilesToQueue(unittest.TestCase):
                 "file_id": int(file.id_archivo),
                 "response_processing_id": int(file.id_rta_procesamiento),
             }
+            expected_messages.append((expected_message, file.nombre_archivo))
 
-
-        # Verificar que se actualizó el estado de los archivos a "ENVIADO"
-        self.assertEqual(self.service.cgd_rta_pro_archivos_repository.update_estado_to_enviado.call_count, len(pending_files))
-        for file in pending_files:
-            self.service.cgd_rta_pro_archivos_repository.update_estado_to_enviado.assert_any_call(file.id_archivo, file.nombre_archivo)
-
-
+        # Todos los mensajes se envían en una sola llamada por lotes
+        mock_send_messages_in_batches.assert_called_once_with(queue_url, expected_messages)
 
 
+        # Verificar que se actualizó el estado de los archivos a "ENVIADO" en una sola sentencia
+        self.service.cgd_rta_pro_archivos_repository.update_estados_to_enviado.assert_called_once_with(
+            id_archivo, [file.nombre_archivo for file in pending_files]
+        )
 
+    @patch("src.services.cgd_rta_pro_archivo_service.send_messages_to_sqs_in_batches")
+    def test_send_pending_files_to_queue_partial_failure(self, mock_send_messages_in_batches):
+        pending_files = [
+            CGDRtaProArchivos(id_archivo=123, id_rta_procesamiento=456, nombre_archivo="file1-01.txt"),
+            CGDRtaProArchivos(id_archivo=123, id_rta_procesamiento=456, nombre_archivo="file2-02.txt"),
+        ]
+        self.service.cgd_rta_pro_archivos_repository.get_pending_files_by_id_archivo.return_value = pending_files
+        mock_send_messages_in_batches.return_value = [False, True]
 
+        self.service.send_pending_files_to_queue_by_id(123, "queue-url", "destination-folder")
 
+        # Solo el archivo cuyo mensaje se envió pasa a 'ENVIADO'
+        self.service.cgd_rta_pro_archivos_repository.update_estados_to_enviado.assert_called_once_with(
+            123, ["file2-02.txt"]
+        )
@@ -1,29 +1,31 @@
 import json
+import os
+from datetime import datetime
 from io import BytesIO
 from zipfile import ZipFile, BadZipFile
 
 from src.config.config import env
 from src.core.process_event import (
-    extract_filename_from_body,
-    extract_bucket_from_body,
-    extract_date_from_filename,
     create_file_id,
-    extract_consecutivo_plataforma_origen,
-    build_acg_name_if_general_file,
-    extract_and_validate_event_data,
+    SQSEventEnvelope,
 )
 from src.utils.sqs_utils import (
     delete_message_from_sqs,
     send_message_to_sqs,
+    send_messages_to_sqs_in_batches,
     build_email_message,
     send_message_to_sqs_with_delay,
+    change_message_visibility,
 )
 from src.utils.singleton import SingletonMeta
 from src.services.error_handling_service import ErrorHandlingService
 import unittest
 from unittest.mock import MagicMock, patch
 from botocore.exceptions import ClientError
-from src.services.s3_service import S3Utils
+from src.services.s3_service import S3Utils, S3ObjectNotFoundError
+from src.core.archivo_context import ArchivoContext
+from src.repositories.archivo_repository import ArchivoResumen
+from src.utils.s3_stream_utils import S3RangeReader, open_s3_object_stream, open_s3_object_on_disk
 
 
 class Singleton(metaclass=SingletonMeta):
@@ -32,119 +34,10 @@ class Singleton(metaclass=SingletonMeta):
 
 class TestEventUtils(unittest.TestCase):
 
-    def test_extract_filename_from_body(self):
-        # Test con un cuerpo de mensaje válido
-        body = json.dumps({
-            "Records": [
-                {
-                    "s3": {
-                        "object": {
-                            "key": "Recibidos/test_file.zip"
-                        },
-                        "bucket": {
-                            "name": "01-bucketrtaprocesa-d01"
-                        }
-                    }
-                }
-            ]
-        })
-
-        expected_filename = "test_file.zip"
-        actual_filename = extract_filename_from_body(body)
-        self.assertEqual(actual_filename, expected_filename)
-
-    def test_extract_bucket_from_body(self):
-        # Test con un cuerpo de mensaje válido
-        body = json.dumps({
-            "Records": [
-                {
-                    "s3": {
-                        "object": {
-                            "key": "Recibidos/test_file.zip"
-                        },
-                        "bucket": {
-                            "name": "01-bucketrtaprocesa-d01"
-                        }
-                    }
-                }
-            ]
-        })
-
-        expected_bucket_name = "01-bucketrtaprocesa-d01"
-        actual_bucket_name = extract_bucket_from_body(body)
-        self.assertEqual(actual_bucket_name, expected_bucket_name)
-
-    def test_extract_filename_from_body_invalid_json(self):
-        # Test con un cuerpo de mensaje no válido (no es JSON)
-        body = "invalid_json"
-        with self.assertRaises(json.JSONDecodeError):
-            extract_filename_from_body(body)
-
-    def test_extract_bucket_from_body_invalid_json(self):
-        # Test con un cuerpo de mensaje no válido (no es JSON)
-        body = "invalid_json"
-        with self.assertRaises(json.JSONDecodeError):
-            extract_bucket_from_body(body)
-
-    def test_extract_filename_from_body_missing_key(self):
-        # Test con un cuerpo de mensaje sin la clave 'key'
-        body = json.dumps({
-            "Records": [
-                {
-                    "s3": {
-                        "object": {},
-                        "bucket": {
-                            "name": "01-bucketrtaprocesa-d01"
-                        }
-                    }
-                }
-            ]
-        })
-        with self.assertRaises(KeyError):
-            extract_filename_from_body(body)
-
-    def test_extract_bucket_from_body_missing_bucket_name(self):
-        # Test con un cuerpo de mensaje sin el nombre del bucket
-        body = json.dumps({
-            "Records": [
-                {
-                    "s3": {
-                        "object": {
-                            "key": "Recibidos/test_file.zip"
-                        },
-                        "bucket": {}
-                    }
-                }
-            ]
-        })
-        with self.assertRaises(KeyError):
-            extract_bucket_from_body(body)
-
-    @patch('src.core.process_event.env')
-    def test_extract_date_from_filename_valid(self, mock_env):
-        # Configurar el prefijo del archivo especial en la variable de entorno
-        mock_env.CONST_PRE_SPECIAL_FILE = "RE_ESP"
-        filename = "RE_ESP_TUTGMF0001003920241002-0001.zip"
-
-        # Ejecutar y verificar que la fecha extraída es correcta
-        result = extract_date_from_filename(filename)
-        self.assertEqual(result, "20241002")
-
-    @patch('src.core.process_event.env')
-    def test_extract_date_from_filename_invalid(self, mock_env):
-        # Configurar el prefijo del archivo especial en la variable de entorno
-        mock_env.CONST_PRE_SPECIAL_FILE = "RE_ESP"
-        filename = "RE_ESP_WRONG_FORMAT.zip"
-
-        # Ejecutar y verificar que devuelve una cadena vacía para formato incorrecto
-        result = extract_date_from_filename(filename)
-        self.assertEqual(result, "")
-
     @patch('src.core.validator.AWSClients.get_ssm_client')  # Mock del cliente SSM
     @patch('src.core.validator.ArchivoValidator')  # Mock de la clase ArchivoValidator
     @patch('src.core.process_event.env')  # Mock de las variables de entorno
-    @patch('src.core.process_event.extract_date_from_filename')  # Mock de la función extract_date_from_filename
-    def test_create_file_id_with_valid_date(self, mock_extract_date, mock_env, mock_validator, mock_get_ssm_client):
+    def test_create_file_id_with_valid_date(self, mock_env, mock_validator, mock_get_ssm_client):
         """
         Test que verifica la creación de un ID de archivo con una fecha válida.
         """
@@ -172,35 +65,91 @@ class TestEventUtils(unittest.TestCase):
         mock_validator_instance = mock_validator.return_value
         mock_validator_instance.special_end = '0001'
 
-        # Mock de la función extract_date_from_filename
-        filename = "RE_ESP_TUTGMF0001003920241002-0001.zip"
-        mock_extract_date.return_value = '20241002'  # Simulando una fecha válida extraída del nombre del archivo
+        # Nombre del archivo ya clasificado, con una fecha válida
+        parsed = MagicMock(filename="RE_ESP_TUTGMF0001003920241002-0001.zip", fecha='20241002')
 
         # Ejecutar la función que estamos probando
-        result = create_file_id(filename)
+        result = create_file_id(parsed)
 
         # Verificar que el ID de archivo generado es correcto
         self.assertEqual(result, 2024100201030000)
 
-    @patch('src.core.process_event.env')
-    def test_extract_consecutivo_plataforma_origen(self, mock_env):
-        # Configurar el prefijo del archivo especial en la variable de entorno
-        mock_env.CONST_PRE_SPECIAL_FILE = "RE_ESP"
-        filename = "RE_ESP_TUTGMF0001003920241002-0001.zip"
+    def test_create_file_id_without_date(self):
+        parsed = MagicMock(filename="RE_ESP_WRONG_FORMAT.zip", fecha="")
+
+        # Sin fecha en el nombre del archivo no se puede construir el ID
+        self.assertIsNone(create_file_id(parsed))
 
-        # Ejecutar y verificar que el consecutivo extraído es correcto
-        result = extract_consecutivo_plataforma_origen(filename)
-        self.assertEqual(result, "0001")
+    def test_sqs_event_envelope(self):
+        record = {
+            "messageId": "msg-1",
+            "receiptHandle": "receipt_handle",
+            "attributes": {"ApproximateReceiveCount": "3"},
+            "body": json.dumps({
+                "Records": [{
+                    "s3": {
+                        "bucket": {"name": "test-bucket"},
+                        "object": {"key": "Recibidos/test_file.zip", "size": 1024, "eTag": "abc123"},
+                    }
+                }],
+                "is_processing": True,
+                "file_id": 1,
+                "response_processing_id": 2,
+            }),
+        }
+
+        with patch('src.core.process_event.json.loads', wraps=json.loads) as mock_loads:
+            envelope = SQSEventEnvelope(record)
+            self.assertEqual(envelope.message_id, "msg-1")
+            self.assertEqual(envelope.receipt_handle, "receipt_handle")
+            self.assertEqual(envelope.receive_count, 3)
+            self.assertEqual(envelope.bucket, "test-bucket")
+            self.assertEqual(envelope.key, "Recibidos/test_file.zip")
+            self.assertEqual(envelope.file_name, "test_file.zip")
+            self.assertEqual(envelope.size, 1024)
+            self.assertEqual(envelope.etag, "abc123")
+            self.assertTrue(envelope.is_processing)
+            self.assertEqual((envelope.file_id, envelope.response_processing_id), (1, 2))
+            self.assertTrue(envelope.has_keys("file_id", "response_processing_id"))
+
+        # El body se decodifica una única vez
+        mock_loads.assert_called_once()
+
+    def test_sqs_event_envelope_split(self):
+        record = {
+            "messageId": "msg-1",
+            "receiptHandle": "receipt_handle",
+            "body": json.dumps({
+                "Records": [
+                    {"s3": {"bucket": {"name": "test-bucket"}, "object": {"key": "Recibidos/file1.zip"}}},
+                    {"s3": {"bucket": {"name": "test-bucket"}, "object": {"key": "Recibidos/file2.zip"}}},
+                ]
+            }),
+        }
 
-    @patch('src.core.process_event.env')
-    def test_build_acg_name_if_general_file(self, mock_env):
-        # Configurar el prefijo del archivo general en la variable de entorno
-        mock_env.CONST_PRE_GENERAL_FILE = "RE_GEN"
-        acg_nombre_archivo = "RE_GEN_TUTGMF0001003920241002-0001.zip"
+        units = SQSEventEnvelope(record).split()
 
-        # Ejecutar y verificar que el nombre del archivo ACG generado es correcto
-        result = build_acg_name_if_general_file(acg_nombre_archivo)
-        self.assertEqual(result, "TUTGMF0001003920241002-0001.zip")
+        self.assertEqual([unit.file_name for unit in units], ["file1.zip", "file2.zip"])
+        self.assertTrue(all(unit.receipt_handle == "receipt_handle" for unit in units))
+        self.assertIs(units[0].body, units[1].body)
+        self.assertEqual(units[1].unit_body()["Records"][0]["s3"]["object"]["key"], "Recibidos/file2.zip")
+        self.assertEqual(len(units[1].unit_body()["Records"]), 1)
+        self.assertTrue(all(unit.is_split_unit for unit in units))
+
+        # Un mensaje con un solo objeto no se separa en unidades
+        single = {**record, "body": json.dumps({"Records": [
+            {"s3": {"bucket": {"name": "test-bucket"}, "object": {"key": "Recibidos/file1.zip"}}},
+        ]})}
+        self.assertFalse(SQSEventEnvelope(single).is_split_unit)
+
+    def test_sqs_event_envelope_invalid_body(self):
+        envelope = SQSEventEnvelope({"messageId": "msg-1", "body": "invalid json"})
+
+        self.assertEqual(envelope.body, {})
+        self.assertIsNone(envelope.bucket)
+        self.assertIsNone(envelope.file_name)
+        self.assertFalse(envelope.is_processing)
+        self.assertEqual(envelope.receive_count, 1)
 
 
 class TestSingleton(unittest.TestCase):
@@ -318,6 +267,34 @@ class TestSQSUtils(unittest.TestCase):
             MessageBody=json.dumps(message_body, ensure_ascii=False)
         )
 
+    @patch('src.utils.sqs_utils.time.sleep')
+    @patch('src.services.aws_clients_service.AWSClients.get_sqs_client')
+    def test_send_messages_to_sqs_in_batches(self, mock_get_sqs_client, mock_sleep):
+        mock_sqs = MagicMock()
+        mock_get_sqs_client.return_value = mock_sqs
+        messages = [({'index': index}, f'file{index}.txt') for index in range(12)]
+
+        def send_message_batch(QueueUrl, Entries):
+            ids = [entry['Id'] for entry in Entries]
+            # El mensaje 1 falla una vez por error del servicio y el 11 por error del remitente
+            if '1' in ids and mock_sqs.send_message_batch.call_count == 1:
+                return {'Successful': [{'Id': i} for i in ids if i != '1'],
+                        'Failed': [{'Id': '1', 'SenderFault': False, 'Code': 'InternalError'}]}
+            return {'Successful': [{'Id': i} for i in ids if i != '11'],
+                    'Failed': [{'Id': i, 'SenderFault': True, 'Code': 'InvalidParameterValue'}
+                               for i in ids if i == '11']}
+
+        mock_sqs.send_message_batch.side_effect = send_message_batch
+
+        results = send_messages_to_sqs_in_batches('http://example.com/sqs', messages)
+
+        self.assertEqual(results, [True] * 11 + [False])
+        # Primer lote de 10, reintento de la entrada fallida y segundo lote de 2
+        self.assertEqual(mock_sqs.send_message_batch.call_count, 3)
+        self.assertEqual(len(mock_sqs.send_message_batch.call_args_list[0].kwargs['Entries']), 10)
+        self.assertEqual(mock_sqs.send_message_batch.call_args_list[1].kwargs['Entries'],
+                         [{'Id': '1', 'MessageBody': json.dumps({'index': 1})}])
+
     def test_build_email_message(self):
         message = {
             "id_plantilla": "PC009",
@@ -353,6 +330,22 @@ class TestSQSUtils(unittest.TestCase):
             DelaySeconds=delay_seconds
         )
 
+    @patch('src.services.aws_clients_service.AWSClients.get_sqs_client')
+    def test_change_message_visibility(self, mock_get_sqs_client):
+        # Configura el mock
+        mock_sqs = MagicMock()
+        mock_get_sqs_client.return_value = mock_sqs
+
+        # Llama a la función
+        change_message_visibility('test_receipt_handle', 'http://example.com/sqs', 'test_file.txt', 900)
+
+        # Afirmaciones
+        mock_sqs.change_message_visibility.assert_called_once_with(
+            QueueUrl='http://example.com/sqs',
+            ReceiptHandle='test_receipt_handle',
+            VisibilityTimeout=900
+        )
+
 
 class TestS3Utils(unittest.TestCase):
     @patch('boto3.client')
@@ -417,9 +410,6 @@ class TestS3Utils(unittest.TestCase):
         self.assertFalse(result)
 
     def test_move_file_to_rechazados_success(self):
-        # Simular que el archivo existe
-        self.s3_utils.check_file_exists_in_s3 = MagicMock(return_value=True)
-
         # Resetear los mocks para asegurarse de que no hay llamadas previas
         self.s3_utils.s3.copy_object.reset_mock()
         self.s3_utils.s3.delete_object.reset_mock()
@@ -438,12 +428,57 @@ class TestS3Utils(unittest.TestCase):
         self.s3_utils.s3.copy_object.assert_called_once_with(
             Bucket='test-bucket',
             CopySource={'Bucket': 'test-bucket', 'Key': 'test-key'},
-            Key=f"{env.DIR_REJECTED_FILES}/202411/test-key"
+            Key=f"{env.DIR_REJECTED_FILES}/{datetime.now().strftime('%Y%m')}/test-key"
         )
         self.s3_utils.s3.delete_object.assert_called_once_with(
             Bucket='test-bucket',
             Key='test-key'
         )
+        # La existencia del origen se detecta con la copia, sin HEAD previo
+        self.s3_utils.s3.head_object.assert_not_called()
+
+    def test_move_file_to_rechazados_missing_source(self):
+        self.s3_utils.s3.copy_object.side_effect = ClientError(
+            {"Error": {"Code": "NoSuchKey", "Message": "Not Found"}}, "CopyObject"
+        )
+
+        with self.assertRaises(S3ObjectNotFoundError):
+            self.s3_utils.move_file_to_rechazados('test-bucket', 'test-key')
+        self.s3_utils.s3.delete_object.assert_not_called()
+
+    def test_move_object_conditional_copy(self):
+        self.s3_utils.s3.copy_object.side_effect = ClientError(
+            {"Error": {"Code": "PreconditionFailed", "Message": "At least one of the pre-conditions failed"}},
+            "CopyObject"
+        )
+
+        with self.assertRaises(S3ObjectNotFoundError):
+            self.s3_utils.move_object('test-bucket', 'src-key', 'dst-key', etag='"abc"')
+        self.assertEqual(self.s3_utils.s3.copy_object.call_args.kwargs["CopySourceIfMatch"], '"abc"')
+
+    def test_move_object_large_object_uses_multipart_copy(self):
+        self.s3_utils.s3.copy = MagicMock()
+
+        self.s3_utils.move_object('test-bucket', 'src-key', 'dst-key', size=6 * 1024 ** 3)
+
+        self.s3_utils.s3.copy_object.assert_not_called()
+        self.s3_utils.s3.copy.assert_called_once_with(
+            {'Bucket': 'test-bucket', 'Key': 'src-key'}, 'test-bucket', 'dst-key', ExtraArgs=None
+        )
+
+    def test_move_object_batched_deletes(self):
+        self.s3_utils.s3.delete_objects.return_value = {}
+
+        with self.s3_utils.batch_deletes():
+            self.s3_utils.move_object('test-bucket', 'src-1', 'dst-1')
+            self.s3_utils.move_object('test-bucket', 'src-2', 'dst-2')
+            self.s3_utils.s3.delete_objects.assert_not_called()
+
+        self.s3_utils.s3.delete_object.assert_not_called()
+        self.s3_utils.s3.delete_objects.assert_called_once_with(
+            Bucket='test-bucket',
+            Delete={'Objects': [{'Key': 'src-1'}, {'Key': 'src-2'}], 'Quiet': True},
+        )
 
     def test_move_file_to_procesando_success(self):
         file_name = 'test-file.txt'
@@ -543,6 +578,22 @@ class TestS3UtilsZip(unittest.TestCase):
         self.s3_utils.s3.upload_fileobj.assert_called()
         self.s3_utils.s3.delete_object.assert_called_once_with(Bucket='test-bucket', Key='test-file.zip')
 
+    def test_unzip_file_in_s3_checkpoint_after_delete(self):
+        self.s3_utils.s3.get_object.return_value = {'Body': self.mock_zip_content}
+        steps = MagicMock()
+        self.s3_utils.cgd_rta_pro_archivos_service = steps.service
+        self.s3_utils.unit_of_work = steps.unit_of_work
+        self.s3_utils.s3.delete_object = steps.delete_object
+
+        self.s3_utils.unzip_file_in_s3(
+            'test-bucket', 'test-file.zip', 1, 'test-file', 1, 'receipt_handle', self.error_handling_service
+        )
+
+        # Los archivos se registran antes de eliminar el .zip y ambos cambios se confirman juntos
+        names = [name for name, _, _ in steps.mock_calls]
+        self.assertLess(names.index('service.register_extracted_files'), names.index('delete_object'))
+        self.assertEqual(names.index('delete_object') + 1, names.index('unit_of_work.checkpoint'))
+
     #
     def test_unzip_file_in_s3_bad_zip(self):
         # Configurar el mock para lanzar un error de archivo inválido
@@ -565,10 +616,10 @@ class TestS3UtilsZip(unittest.TestCase):
     def test_unzip_file_in_s3_invalid_filename_structure(self):
         # Configurar el mock para devolver un archivo zip válido con nombres incorrectos
         self.s3_utils.s3.get_object.return_value = {'Body': self.mock_zip_content}
-        self.s3_utils.validator.is_valid_extracted_filename = MagicMock(return_value=False)
+        self.s3_utils.validator.validar_archivos_in_zip = MagicMock(side_effect=[True, False])
 
         # Ejecutar la función
-        self.s3_utils.unzip_file_in_s3(
+        result = self.s3_utils.unzip_file_in_s3(
             'test-bucket',
             'test-file.zip',
             1,
@@ -578,6 +629,12 @@ class TestS3UtilsZip(unittest.TestCase):
             self.error_handling_service
         )
 
+        # Un archivo inválido rechaza el .zip antes de subir cualquiera de sus archivos
+        self.assertIsNone(result)
+        self.error_handling_service.handle_generic_error.assert_called_once()
+        self.s3_utils.s3.upload_fileobj.assert_not_called()
+        self.s3_utils.s3.delete_object.assert_not_called()
+
     def test_unzip_file_in_s3_unexpected_file_count(self):
         # Configurar el mock para devolver un archivo zip con un número inesperado de archivos
         self.s3_utils.get_cantidad_de_archivos_esperados_en_el_zip.return_value = (3, '01')
@@ -597,60 +654,187 @@ class TestS3UtilsZip(unittest.TestCase):
 
         # Verificar que se manejó el error de cantidad de archivos inesperada
         self.error_handling_service.handle_generic_error.assert_called_once()
+        self.s3_utils.s3.upload_fileobj.assert_not_called()
+        self.s3_utils.validator.validar_archivos_in_zip.assert_not_called()
 
+    def test_build_zip_manifest(self):
+        with ZipFile(self.mock_zip_content) as zip_file:
+            manifest = S3Utils.build_zip_manifest(zip_file, 'Procesando/dest/')
 
-class TestExtractAndValidateEventData(unittest.TestCase):
-    def setUp(self):
-        self.valid_event = {
-            "Records": [
-                {"body": json.dumps({"file_id": 123, "response_processing_id": 456})},
-                {"body": json.dumps({"file_id": 789, "response_processing_id": 101})},
-            ]
-        }
+        self.assertEqual([entry.key for entry in manifest],
+                         ['Procesando/dest/file1-01.txt', 'Procesando/dest/file2-01.txt'])
+        self.assertEqual(manifest[0].suffix, '01')
+        self.assertEqual(manifest[0].file_size, len('Contenido del archivo 1'))
 
-        self.invalid_event = {
-            "Records": [
-                {"body": json.dumps({"file_id": 123})},  # Falta response_processing_id
-                {"body": "INVALID_JSON"},  # Body mal formado
-            ]
-        }
 
-        self.empty_event = {"Records": []}
-
-    @patch("src.utils.logger_utils.logging.warning")
-    @patch("src.utils.logger_utils.logging.error")
-    def test_valid_event(self, mock_error, mock_warning):
-        result = extract_and_validate_event_data(self.valid_event, required_keys=["file_id", "response_processing_id"])
-        self.assertEqual(len(result), 2)
-        self.assertEqual(result[0]["file_id"], 123)
-        self.assertEqual(result[0]["response_processing_id"], 456)
-        self.assertEqual(result[1]["file_id"], 789)
-        self.assertEqual(result[1]["response_processing_id"], 101)
-        mock_error.assert_not_called()
-        mock_warning.assert_not_called()
-
-    @patch("src.utils.logger_utils.logging.warning")
-    @patch("src.utils.logger_utils.logging.error")
-    def test_empty_event(self, mock_error, mock_warning):
-        result = extract_and_validate_event_data(self.empty_event, required_keys=["file_id", "response_processing_id"])
-        self.assertEqual(result, [])
-        mock_error.assert_not_called()
-        mock_warning.assert_not_called()
-
-    @patch("src.utils.logger_utils.logging.warning")
-    @patch("src.utils.logger_utils.logging.error")
-    def test_no_required_keys(self, mock_error, mock_warning):
-        result = extract_and_validate_event_data(self.valid_event)
-        self.assertEqual(len(result), 2)  # Sin claves requeridas, acepta todo
-        mock_error.assert_not_called()
-        mock_warning.assert_not_called()
-
-    @patch("src.core.process_event.logger.warning")
-    @patch("src.core.process_event.logger.error")
-    def test_invalid_event(self, mock_warning, mock_error):
-        result = extract_and_validate_event_data(
-            self.invalid_event, required_keys=["file_id", "response_processing_id"]
+    def test_upload_extracted_files_keeps_order_and_reports_errors(self):
+        uploaded = {}
+
+        def upload_fileobj(fileobj, Bucket, Key):
+            if Key.endswith('file1-01.txt'):
+                raise IOError("fallo de red")
+            uploaded[Key] = fileobj.read()
+
+        self.s3_utils.s3.upload_fileobj.side_effect = upload_fileobj
+
+        with ZipFile(self.mock_zip_content) as zip_file:
+            members = zip_file.infolist()
+            with self.assertRaises(IOError):
+                self.s3_utils.upload_extracted_files(zip_file, members, 'test-bucket', 'Procesando/dest/')
+
+        # Los demás archivos se suben aunque uno falle
+        self.assertEqual(uploaded, {'Procesando/dest/file2-01.txt': b'Contenido del archivo 2'})
+
+        self.s3_utils.s3.upload_fileobj.side_effect = None
+        with ZipFile(self.mock_zip_content) as zip_file:
+            results = self.s3_utils.upload_extracted_files(
+                zip_file, zip_file.infolist(), 'test-bucket', 'Procesando/dest/'
+            )
+        self.assertEqual(results, [('Procesando/dest/file1-01.txt', None), ('Procesando/dest/file2-01.txt', None)])
+
+
+class TestS3StreamUtils(unittest.TestCase):
+    def setUp(self):
+        buffer = BytesIO()
+        with ZipFile(buffer, 'w') as zip_file:
+            zip_file.writestr('file1-01.txt', 'Contenido del archivo 1' * 100)
+            zip_file.writestr('file2-01.txt', 'Contenido del archivo 2' * 100)
+        self.zip_bytes = buffer.getvalue()
+
+        # Cliente S3 simulado que responde a GET por rangos
+        self.s3 = MagicMock()
+        self.s3.head_object.return_value = {"ContentLength": len(self.zip_bytes)}
+
+        def get_object(Bucket, Key, Range):
+            start, end = (int(value) for value in Range.replace("bytes=", "").split("-"))
+            return {"Body": BytesIO(self.zip_bytes[start:end + 1])}
+
+        self.s3.get_object.side_effect = get_object
+
+    def test_range_reader_reads_zip_with_ranged_gets(self):
+        with open_s3_object_stream(self.s3, 'test-bucket', 'test-file.zip', buffer_size=256) as stream:
+            with ZipFile(stream) as zip_file:
+                self.assertEqual([info.filename for info in zip_file.infolist()], ['file1-01.txt', 'file2-01.txt'])
+                self.assertEqual(zip_file.read('file2-01.txt'), b'Contenido del archivo 2' * 100)
+
+        # Ninguna lectura supera el tamaño del buffer
+        for call in self.s3.get_object.call_args_list:
+            start, end = (int(value) for value in call.kwargs["Range"].replace("bytes=", "").split("-"))
+            self.assertLessEqual(end - start + 1, 256)
+
+    def test_range_reader_seek_and_eof(self):
+        reader = S3RangeReader(self.s3, 'test-bucket', 'test-file.zip')
+
+        reader.seek(-4, 2)
+        self.assertEqual(reader.read(10), self.zip_bytes[-4:])
+        self.assertEqual(reader.read(10), b'')
+        with self.assertRaises(ValueError):
+            reader.seek(-1)
+
+    @patch('src.services.s3_service.env')
+    def test_unzip_file_in_s3_stream_mode(self, mock_env):
+        mock_env.ZIP_EXTRACTION_MODE = "stream"
+        mock_env.ZIP_STREAM_BUFFER_SIZE = 1024
+        mock_env.ZIP_UPLOAD_CONCURRENCY = 2
+        with patch('src.services.aws_clients_service.AWSClients.get_s3_client', return_value=self.s3), \
+                patch('src.services.aws_clients_service.AWSClients.get_ssm_client'):
+            s3_utils = S3Utils(MagicMock())
+        s3_utils.validator = MagicMock()
+        s3_utils.get_cantidad_de_archivos_esperados_en_el_zip = MagicMock(return_value=(2, '01'))
+        uploaded = {}
+        self.s3.upload_fileobj.side_effect = lambda fileobj, Bucket, Key, Config: uploaded.update({Key: fileobj.read()})
+
+        s3_utils.unzip_file_in_s3(
+            'test-bucket', 'Procesando/test-file.zip', 1, 'test-file', 1, 'receipt_handle', MagicMock()
         )
-        self.assertEqual(result, [])
-        mock_error.assert_called_once()
-        mock_warning.assert_called_once()
+
+        # El archivo nunca se descarga completo y cada archivo se sube con la configuración acotada
+        self.assertTrue(all("Range" in call.kwargs for call in self.s3.get_object.call_args_list))
+        self.assertEqual(sorted(content for content in uploaded.values()),
+                         [b'Contenido del archivo 1' * 100, b'Contenido del archivo 2' * 100])
+        self.assertEqual(self.s3.upload_fileobj.call_args.kwargs["Config"].use_threads, False)
+
+    def test_open_s3_object_on_disk(self):
+        self.s3.download_fileobj.side_effect = lambda bucket, key, fileobj, Config: fileobj.write(self.zip_bytes)
+
+        with open_s3_object_on_disk(self.s3, 'test-bucket', 'test-file.zip', tmp_dir=None) as mapped:
+            with ZipFile(mapped) as zip_file:
+                self.assertEqual(zip_file.read('file1-01.txt'), b'Contenido del archivo 1' * 100)
+            tmp_path = self.s3.download_fileobj.call_args.args[2].name
+
+        # El archivo temporal se elimina al terminar
+        self.assertFalse(os.path.exists(tmp_path))
+        self.s3.get_object.assert_not_called()
+
+    @patch('src.services.s3_service.env')
+    def test_resolve_zip_extraction_mode_auto(self, mock_env):
+        mock_env.ZIP_EXTRACTION_MODE = "auto"
+        mock_env.ZIP_DISK_THRESHOLD_BYTES = 1000
+        with patch('src.services.aws_clients_service.AWSClients.get_s3_client', return_value=self.s3), \
+                patch('src.services.aws_clients_service.AWSClients.get_ssm_client'):
+            s3_utils = S3Utils(MagicMock())
+
+        # El tamaño del evento de S3 evita la consulta HEAD
+        self.assertEqual(s3_utils.resolve_zip_extraction_mode('test-bucket', 'test-file.zip', 5000), "disk")
+        self.assertEqual(s3_utils.resolve_zip_extraction_mode('test-bucket', 'test-file.zip', 500), "memory")
+        self.s3.head_object.assert_not_called()
+
+        # Sin tamaño en el evento se consulta el objeto
+        self.s3.head_object.return_value = {"ContentLength": 5000}
+        self.assertEqual(s3_utils.resolve_zip_extraction_mode('test-bucket', 'test-file.zip'), "disk")
+
+
+class TestArchivoContext(unittest.TestCase):
+    def test_get_loads_each_archivo_once(self):
+        loader = MagicMock(side_effect=lambda nombre: None if nombre == "NO_EXISTE" else MagicMock(estado="ENVIADO"))
+        context = ArchivoContext()
+
+        archivo = context.get("ARCHIVO", loader)
+        self.assertIs(context.get("ARCHIVO", loader), archivo)
+        # Un archivo inexistente tampoco se vuelve a consultar
+        self.assertIsNone(context.get("NO_EXISTE", loader))
+        self.assertIsNone(context.get("NO_EXISTE", loader))
+        self.assertEqual(loader.call_count, 2)
+
+        context.clear()
+        context.get("ARCHIVO", loader)
+        self.assertEqual(loader.call_count, 3)
+
+    def test_set_registers_inserted_archivo(self):
+        loader = MagicMock()
+        context = ArchivoContext()
+        archivo = MagicMock(acg_nombre_archivo="NUEVO")
+
+        context.set(archivo)
+
+        self.assertIs(context.get("NUEVO", loader), archivo)
+        loader.assert_not_called()
+
+    def test_get_parsed_filename_parses_once_per_message(self):
+        parser = MagicMock(side_effect=lambda nombre: MagicMock(filename=nombre))
+        context = ArchivoContext()
+
+        parsed = context.get_parsed_filename("RE_ESP_ARCHIVO.zip", parser)
+        self.assertIs(context.get_parsed_filename("RE_ESP_ARCHIVO.zip", parser), parsed)
+        self.assertEqual(parser.call_count, 1)
+
+        # Otro nombre o un nuevo mensaje vuelven a clasificar el archivo
+        context.get_parsed_filename("RE_PRO_ARCHIVO.zip", parser)
+        context.clear()
+        context.get_parsed_filename("RE_PRO_ARCHIVO.zip", parser)
+        self.assertEqual(parser.call_count, 3)
+
+    def test_update_only_changes_cached_archivo(self):
+        loader = MagicMock(return_value=None)
+        context = ArchivoContext()
+        context.set(ArchivoResumen(1, "CARGADO", "ENVIADO", None, "01", 0))
+
+        context.update("CARGADO", estado="PROCESAMIENTO_RECHAZADO", contador_intentos_cargue=1)
+        archivo = context.get("CARGADO", loader)
+        self.assertEqual(archivo.estado, "PROCESAMIENTO_RECHAZADO")
+        self.assertEqual(archivo.contador_intentos_cargue, 1)
+
+        # Un archivo que no se consultó sigue leyéndose de la base de datos
+        context.update("NO_CONSULTADO", estado="PROCESAMIENTO_RECHAZADO")
+        context.get("NO_CONSULTADO", loader)
+        loader.assert_called_once_with("NO_CONSULTADO")
@@ -1,4 +1,5 @@
 import json
+from datetime import datetime
 import os
 import unittest
 from unittest.mock import patch, MagicMock
@@ -7,7 +8,9 @@ from assertpy import assert_that
 from botocore.exceptions import ClientError
 
 from src.config.config import env, logger
-from src.core.validator import ArchivoValidator  # Ajusta la ruta según tu estructura
+from src.core.validator import ArchivoValidator, compile_filename_patterns  # Ajusta la ruta según tu estructura
+from src.services.aws_clients_service import remote_config_cache
+from src.utils.ttl_cache import TTLCache
 
 
 class TestArchivoValidator(unittest.TestCase):
@@ -28,6 +31,7 @@ class TestArchivoValidator(unittest.TestCase):
             }
         }
         # Crear una instancia del validador
+        remote_config_cache.invalidate()
         self.validator = ArchivoValidator()
         self.validator.valid_file_suffixes = {
             "01": ["001", "002"],
@@ -87,6 +91,7 @@ class TestArchivoValidator(unittest.TestCase):
         mock_get_ssm_client.return_value = mock_ssm  # Aquí estamos configurando el retorno del cliente
 
         # Llama a la función sin pasar el cliente directamente
+        remote_config_cache.invalidate()
         validator = ArchivoValidator()
 
         # Verificar que se llamó a get_parameter con el nombre correcto
@@ -133,6 +138,7 @@ class TestArchivoValidator(unittest.TestCase):
         mock_get_ssm_client.return_value = mock_ssm  # Configuramos el retorno del cliente
 
         # Llama a la función
+        remote_config_cache.invalidate()
         validator = ArchivoValidator()  # Se espera que este constructor llame internamente a get_ssm_client
 
         # Arrange
@@ -162,6 +168,7 @@ class TestArchivoValidator(unittest.TestCase):
         mock_get_ssm_client.return_value = mock_ssm
 
         # Instanciar el validador y probar la función
+        remote_config_cache.invalidate()
         validator = ArchivoValidator()
         result = validator._get_valid_states()
 
@@ -182,6 +189,7 @@ class TestArchivoValidator(unittest.TestCase):
         mock_get_ssm_client.return_value = mock_ssm
 
         # Instanciar el validador y probar la función
+        remote_config_cache.invalidate()
         validator = ArchivoValidator()
         result = validator._get_valid_states()
 
@@ -209,6 +217,7 @@ class TestArchivoValidator(unittest.TestCase):
         mock_get_ssm_client.return_value = mock_ssm
 
         # Instanciar el validador y probar la función
+        remote_config_cache.invalidate()
         validator = ArchivoValidator()
         result = validator._get_valid_states()
 
@@ -514,6 +523,128 @@ class TestArchivoValidator(unittest.TestCase):
         mock_logger.error.assert_called_once_with(f"El archivo {extracted_filename} no comienza con 'RE_'.")
 
 
+class TestParseFilename(unittest.TestCase):
+    @patch('src.services.aws_clients_service.AWSClients.get_ssm_client')
+    def setUp(self, mock_get_ssm_client):
+        remote_config_cache.invalidate()
+        mock_ssm = MagicMock()
+        mock_ssm.get_parameter.return_value = {'Parameter': {'Value': '{}'}}
+        mock_get_ssm_client.return_value = mock_ssm
+        self.validator = ArchivoValidator()
+        self.validator.special_start = "RE_ESP_TUTGMF00010039"
+        self.validator.special_end = "0001"
+        self.validator.general_start = "RE_PRO_TUTGMF00010039"
+        env.CONST_PRE_SPECIAL_FILE = "RE_ESP"
+        env.CONST_PRE_GENERAL_FILE = "RE_PRO"
+
+    def test_parse_special_file(self):
+        parsed = self.validator.parse_filename("RE_ESP_TUTGMF0001003920241002-0001.zip")
+
+        self.assertTrue(parsed.es_especial)
+        self.assertFalse(parsed.es_general)
+        self.assertEqual(parsed.fecha, "20241002")
+        self.assertEqual(parsed.consecutivo, "0001")
+        self.assertEqual(parsed.tipo_respuesta, env.CONST_TIPO_ARCHIVO_ESPECIAL)
+        self.assertEqual(parsed.acg_nombre_archivo, "RE_ESP_TUTGMF0001003920241002-0001")
+
+    def test_parse_general_reintegro_file(self):
+        parsed = self.validator.parse_filename("RE_PRO_TUTGMF0001003920241002-0005-R.zip")
+
+        self.assertTrue(parsed.es_general)
+        self.assertTrue(parsed.es_reintegro)
+        self.assertEqual(parsed.fecha, "20241002")
+        self.assertEqual(parsed.tipo_respuesta, env.CONST_TIPO_ARCHIVO_GENERAL_REINTEGROS)
+        self.assertEqual(parsed.acg_nombre_archivo, "TUTGMF0001003920241002-0005-R")
+
+    def test_parsed_filename_is_reused(self):
+        filename = "RE_ESP_TUTGMF0001003920241002-0001.zip"
+        parsed = self.validator.parse_filename(filename)
+
+        # Con el nombre ya clasificado, las validaciones no vuelven a evaluar los patrones
+        with patch.object(ArchivoValidator, 'parse_filename') as mock_parse:
+            self.assertTrue(self.validator.is_special_file(filename, parsed=parsed))
+            self.assertFalse(self.validator.validate_filename_structure_for_general_file(filename, parsed=parsed))
+            self.assertEqual(self.validator.get_type_response(filename, parsed=parsed), parsed.tipo_respuesta)
+        mock_parse.assert_not_called()
+
+    def test_patterns_compiled_once_per_config(self):
+        compile_filename_patterns.cache_clear()
+        filename = "RE_ESP_TUTGMF0001003920241002-0001.zip"
+
+        self.validator.parse_filename(filename)
+        self.validator.is_special_file(filename)
+        self.validator.validate_filename_structure_for_general_file("RE_PRO_TUTGMF0001003920241002-0005.zip")
+        self.assertEqual(compile_filename_patterns.cache_info().misses, 1)
+
+        # Un cambio en la configuración genera una nueva versión de los patrones
+        self.validator.special_end = "0002"
+        self.assertFalse(self.validator.parse_filename(filename).es_especial)
+        self.assertEqual(compile_filename_patterns.cache_info().misses, 2)
+
+    @patch('src.core.validator.datetime')
+    def test_date_validity_is_evaluated_on_each_call(self, mock_datetime):
+        mock_datetime.strptime = datetime.strptime
+        filename = "RE_ESP_TUTGMF0001003920241002-0001.zip"
+
+        mock_datetime.now.return_value = datetime(2024, 10, 1)
+        self.assertFalse(self.validator.is_special_file(filename))
+
+        mock_datetime.now.return_value = datetime(2024, 10, 2)
+        self.assertTrue(self.validator.is_special_file(filename))
+
+
+class TestParameterCache(unittest.TestCase):
+
+    def setUp(self):
+        remote_config_cache.invalidate()
+
+    @patch('src.services.aws_clients_service.AWSClients.get_ssm_client')
+    def test_validators_share_parameter_cache(self, mock_get_ssm_client):
+        mock_ssm = MagicMock()
+        mock_ssm.get_parameter.return_value = {
+            'Parameter': {'Value': json.dumps({env.VALID_STATES_FILES: ['PENDIENTE']})}
+        }
+        mock_get_ssm_client.return_value = mock_ssm
+
+        # Varias instancias y consultas de estados solo consultan Parameter Store una vez
+        ArchivoValidator()
+        validator = ArchivoValidator()
+        self.assertTrue(validator.is_valid_state('PENDIENTE'))
+        self.assertTrue(validator.is_valid_state('PENDIENTE'))
+        mock_ssm.get_parameter.assert_called_once()
+
+        # Tras invalidar la caché se vuelve a consultar
+        remote_config_cache.invalidate(("parameter", env.PARAMETER_STORE_FILE_CONFIG))
+        validator.is_valid_state('PENDIENTE')
+        self.assertEqual(mock_ssm.get_parameter.call_count, 2)
+
+    @patch('src.services.aws_clients_service.AWSClients.get_ssm_client')
+    def test_client_error_is_not_cached(self, mock_get_ssm_client):
+        mock_ssm = MagicMock()
+        mock_ssm.get_parameter.side_effect = [
+            ClientError(error_response={'Error': {'Code': 'ThrottlingException'}}, operation_name='GetParameter'),
+            {'Parameter': {'Value': json.dumps({env.VALID_STATES_FILES: ['PENDIENTE']})}},
+        ]
+        mock_get_ssm_client.return_value = mock_ssm
+
+        validator = ArchivoValidator()
+
+        self.assertEqual(validator._get_valid_states(), ['PENDIENTE'])
+
+    @patch('src.utils.ttl_cache.time.monotonic')
+    def test_ttl_cache_expiration(self, mock_monotonic):
+        cache = TTLCache(ttl_seconds=10)
+        loader = MagicMock(side_effect=["v1", "v2"])
+
+        mock_monotonic.return_value = 100
+        self.assertEqual(cache.get("key", loader), "v1")
+        mock_monotonic.return_value = 105
+        self.assertEqual(cache.get("key", loader), "v1")
+        mock_monotonic.return_value = 111
+        self.assertEqual(cache.get("key", loader), "v2")
+        self.assertEqual(loader.call_count, 2)
+
+
 class TestValidarArchivosInZip(unittest.TestCase):
 
     @patch('src.services.aws_clients_service.AWSClients.get_ssm_client')
@@ -539,6 +670,7 @@ class TestValidarArchivosInZip(unittest.TestCase):
         mock_env.CONST_PRE_GENERAL_FILE = "PRO"
 
         # Inicializar la clase que queremos probar
+        remote_config_cache.invalidate()
         self.validator = ArchivoValidator()
         self.validator.valid_file_suffixes = {
             "tipo_1": ["sufijo1", "sufijo2"]
@@ -616,6 +748,7 @@ class TestIsSpecialFile(unittest.TestCase):
         }
         mock_ssm_client_instance.get_parameter.return_value = mock_response
 
+        remote_config_cache.invalidate()
         self.validator = ArchivoValidator()
         self.validator.special_start = "PREFIX"
         self.validator.special_end = "SUFFIX"